@@ -0,0 +1,61 @@
+"""
+Per-call latency of the calendar tools' client setup against a local fake Calendar server.
+
+    python benchmarks/calendar_client.py --calls 50
+
+"before" rebuilds credentials, the service object and the access token on every call
+(the old get_calendar_service behaviour); "after" uses the cached, pooled client.
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from fakes import FakeCalendarServer
+
+def freebusy(service, calendar_id: str):
+    body = {"timeMin": "2026-02-12T09:00:00Z", "timeMax": "2026-02-12T17:00:00Z", "items": [{"id": calendar_id}]}
+    return service.freebusy().query(body=body).execute()
+
+def timed(fn, calls: int):
+    samples = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+def report(label: str, samples):
+    print(f"{label:>7}: mean={statistics.mean(samples):.2f}ms p50={statistics.median(samples):.2f}ms "
+          f"max={max(samples):.2f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=50)
+    parser.add_argument("--latency", type=float, default=0.005, help="Simulated server latency (s)")
+    args = parser.parse_args()
+
+    server = FakeCalendarServer(latency=args.latency).start()
+    os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = server.api_endpoint
+    os.environ["GCP_SERVICE_ACCOUNT_JSON"] = server.service_account_json()
+
+    import google_calender_tools as gct
+
+    def uncached():
+        freebusy(gct.build_calendar_service(gct.load_credentials()), gct.PERSONAL_CALENDAR_ID)
+
+    def cached():
+        freebusy(gct.get_calendar_service(), gct.PERSONAL_CALENDAR_ID)
+
+    before = timed(uncached, args.calls)
+    token_requests_before = server.requests["token"]
+    after = timed(cached, args.calls)
+
+    report("before", before)
+    report("after", after)
+    print(f"token fetches: before={token_requests_before} after={server.requests['token'] - token_requests_before}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
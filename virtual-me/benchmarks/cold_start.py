@@ -0,0 +1,121 @@
+"""
+Cold start of the app: import time of `main` and time until a fresh worker is live/ready.
+
+    python benchmarks/cold_start.py --runs 3 --top 15
+
+Imports: `python -X importtime -c "import main"` in src/, reporting the total and the
+slowest top-level packages by cumulative time.
+
+Startup: `uvicorn fake_app:app` (fake LLM/embeddings, see fake_app.py) is started from
+scratch; the script polls /health/live and /health/ready and prints the worker's own
+/health/startup profile (import and warm-up phases).
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import subprocess
+import statistics
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+def import_profile(top: int) -> dict:
+    """Cumulative import times (ms) of `main` and its slowest top-level packages."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=ROOT / "src", capture_output=True, text=True, check=True)
+    packages = {}
+    total = 0.0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line[12:]:
+            continue
+        _, cumulative, name = (part.strip() for part in line[12:].split("|"))
+        if not cumulative.isdigit():
+            continue
+        package = name.split(".")[0]
+        ms = int(cumulative) / 1000
+        if name == "main":
+            total = ms
+        elif name == package:
+            packages[package] = max(packages.get(package, 0.0), ms)
+    slowest = sorted(packages.items(), key=lambda item: -item[1])[:top]
+    return {"import_main_ms": round(total, 1), "slowest": [{"module": n, "ms": round(ms, 1)} for n, ms in slowest]}
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _status(url: str) -> int:
+    try:
+        with urllib.request.urlopen(url, timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+def startup_run(args) -> dict:
+    """Spawn a worker and time /health/live and /health/ready from process start."""
+    port = _free_port()
+    base = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PYTHONPATH=str(ROOT / "benchmarks"), LOG_LEVEL="WARNING",
+               FAKE_LLM_LATENCY=str(args.llm_latency), FAKE_EMBED_LATENCY=str(args.embed_latency))
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    live_ms = ready_ms = None
+    try:
+        deadline = started + args.timeout
+        while time.perf_counter() < deadline and ready_ms is None:
+            if live_ms is None and _status(f"{base}/health/live") == 200:
+                live_ms = (time.perf_counter() - started) * 1000
+            if live_ms is not None and _status(f"{base}/health/ready") == 200:
+                ready_ms = (time.perf_counter() - started) * 1000
+            else:
+                time.sleep(0.02)
+        with urllib.request.urlopen(f"{base}/health/startup", timeout=5) as response:
+            worker_profile = json.load(response)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {"live_ms": live_ms, "ready_ms": ready_ms, "worker": worker_profile}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--top", type=int, default=10, help="Slowest imported packages to list")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Simulated seconds per embedding call")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    imports = import_profile(args.top)
+    print(f"import main: {imports['import_main_ms']:.0f}ms")
+    for item in imports["slowest"]:
+        print(f"  {item['module']:<32} {item['ms']:8.1f}ms")
+
+    runs = [startup_run(args) for _ in range(args.runs)]
+    for i, run in enumerate(runs, 1):
+        phases = "  ".join(f"{name}={ms:.0f}" for name, ms in run["worker"]["phases_ms"].items())
+        ready = f"{run['ready_ms']:.0f}ms" if run["ready_ms"] is not None else "never"
+        print(f"run {i}: live={run['live_ms']:.0f}ms ready={ready}  worker phases (ms): {phases}")
+    ready = [run["ready_ms"] for run in runs if run["ready_ms"] is not None]
+    if ready:
+        print(f"median time to ready: {statistics.median(ready):.0f}ms")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"config": vars(args), "imports": imports, "runs": runs}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
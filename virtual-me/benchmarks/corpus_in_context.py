@@ -0,0 +1,82 @@
+"""
+LLM calls, prompt tokens and latency per portfolio question with retrieval vs the whole
+corpus in the system prompt (corpus_context.py).
+
+    python benchmarks/corpus_in_context.py --llm-latency 0.4 --search-latency 0.15
+
+Modes: "retrieval" (think -> retrieve_context -> think), "retrieval+router" (the intent
+router answers static questions from portfolio sections, the default before corpus mode)
+and "in-context" (the corpus block from data/processed_chunks.jsonl in the system prompt,
+no retrieve_context tool). Each question is a fresh single turn against fake models.
+Input tokens are the fakes' ~4 characters per token estimate of every prompt sent.
+"""
+import asyncio
+import argparse
+import statistics
+
+from fakes import install_fakes
+
+QUESTIONS = [
+    "What are his skills?",
+    "Tell me about his experience as a founding engineer",
+    "Which of his projects used Python?",
+    "What did he build at Adina Labs?",
+    "Where did he study?",
+    "Has he worked with Solidity?",
+    "What motivates him?",
+    "What does he work on at the moment?",
+]
+
+async def run_mode(la, questions, turns: int) -> dict:
+    from langchain_core.messages import HumanMessage
+    from metrics import TurnTimer
+    graph = la.build_agent_graph()
+    latencies, llm_calls, input_tokens = [], [], []
+    for _ in range(turns):
+        for question in questions:
+            timer = TurnTimer()
+            result = await graph.ainvoke({"messages": [HumanMessage(content=question)]}, timer.config())
+            summary = timer.summary()
+            latencies.append(summary["total_ms"])
+            llm_calls.append(result.get("llm_calls", 0))
+            input_tokens.append(summary["llm_tokens"]["input"])
+    return {
+        "llm_calls_per_turn": statistics.mean(llm_calls),
+        "input_tokens_per_turn": statistics.mean(input_tokens),
+        "latency_ms_mean": statistics.mean(latencies),
+        "latency_ms_p50": statistics.median(latencies),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=3, help="Passes over the question list per mode")
+    parser.add_argument("--llm-latency", type=float, default=0.4, help="Simulated seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.15, help="Simulated seconds per vector search")
+    args = parser.parse_args()
+
+    import langgraph_agent as la
+    from corpus_context import compile_corpus_context
+    from intent_router import IntentRouter
+    from Process_document import load_chunk_records
+
+    install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency)
+    compiled = compile_corpus_context(load_chunk_records())
+    print(f"corpus: {compiled['chunks']} chunks, ~{compiled['tokens']} tokens "
+          f"(fits the {compiled['budget']}-token budget: {compiled['fits']})")
+
+    modes = {
+        "retrieval": (None, None),
+        "retrieval+router": (IntentRouter.load(), None),
+        "in-context": (None, compiled),
+    }
+    for name, (router, corpus) in modes.items():
+        la.router = router
+        la.corpus_context = corpus
+        la.system_prompt = la.corpus_system_prompt(corpus) if corpus else la.SYSTEM_PROMPT
+        result = asyncio.run(run_mode(la, QUESTIONS, args.turns))
+        print(f"{name:<18} llm_calls/turn={result['llm_calls_per_turn']:.2f}  "
+              f"input_tokens/turn={result['input_tokens_per_turn']:.0f}  "
+              f"mean={result['latency_ms_mean']:.0f}ms  p50={result['latency_ms_p50']:.0f}ms")
+
+if __name__ == "__main__":
+    main()
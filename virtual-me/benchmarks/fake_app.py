@@ -0,0 +1,58 @@
+"""
+The FastAPI app wired to local fakes only: no Gemini, Pinecone or Google Calendar calls.
+
+    PYTHONPATH=benchmarks uvicorn fake_app:app --port 8000
+
+- LLM: ScriptedChatModel (emits retrieve_context / list_available_slots /
+  request_meeting_approval tool calls) with FAKE_LLM_LATENCY seconds per call
+- Embeddings: HashEmbeddings with FAKE_EMBED_LATENCY seconds per call
+- Vector store: an in-memory LocalVectorIndex over data/processed_chunks.jsonl, behind the
+  same HybridRetriever the app uses unless RETRIEVAL_MODE=dense
+- Calendar: a FakeCalendarServer on a local port (FAKE_CALENDAR_LATENCY seconds per request)
+
+Importing this module configures everything; load_test.py does the same in-process.
+"""
+import os
+
+from fakes import FakeCalendarServer, HashEmbeddings, ScriptedChatModel
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0.05"))
+FAKE_EMBED_LATENCY = float(os.getenv("FAKE_EMBED_LATENCY", "0.01"))
+FAKE_CALENDAR_LATENCY = float(os.getenv("FAKE_CALENDAR_LATENCY", "0.005"))
+
+# The calendar client reads its endpoint/credentials at import time
+calendar_server = FakeCalendarServer(latency=FAKE_CALENDAR_LATENCY).start()
+os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = calendar_server.api_endpoint
+os.environ["GCP_SERVICE_ACCOUNT_JSON"] = calendar_server.service_account_json()
+
+import numpy as np
+
+import langgraph_agent as la
+from hybrid_retriever import HybridRetriever, RETRIEVAL_MODE, load_corpus
+from intent_router import IntentRouter, INTENT_ROUTING
+from local_index import LocalVectorIndex
+from main import app
+
+def build_vector_store(embeddings):
+    """In-memory index of the processed chunks, embedded with `embeddings` (no latency at build time)."""
+    texts, metadatas = load_corpus()
+    if not texts:
+        raise SystemExit("No chunks found: run `python src/Process_document.py` first")
+    matrix = np.asarray(HashEmbeddings(size=embeddings.size).embed_documents(texts), dtype=np.float32)
+    store = LocalVectorIndex(texts, matrix, embeddings, model="hash", metadatas=metadatas)
+    if RETRIEVAL_MODE == "hybrid":
+        store = HybridRetriever(store, texts, metadatas=metadatas)
+    return store
+
+def install(llm_latency: float = FAKE_LLM_LATENCY, embed_latency: float = FAKE_EMBED_LATENCY):
+    """(Re)configure the agent's components with the fakes."""
+    la.embeddings = HashEmbeddings(latency=embed_latency)
+    la.vector_store = build_vector_store(la.embeddings)
+    la.llm = ScriptedChatModel(latency=llm_latency)
+    la.answer_llm = ScriptedChatModel(latency=llm_latency, use_tools=False)
+    la.router = IntentRouter.load() if INTENT_ROUTING else None
+    la.agent = None
+
+install()
+
+__all__ = ["app", "calendar_server", "install"]
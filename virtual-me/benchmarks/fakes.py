@@ -0,0 +1,241 @@
+"""Deterministic local stand-ins for Gemini and Pinecone used by the benchmarks."""
+import re
+import sys
+import time
+import asyncio
+import hashlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import List
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+if str(src_path) not in sys.path:
+    sys.path.insert(0, str(src_path))
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+SCHEDULING_WORDS = ("available", "availability", "free", "schedule", "meet")
+EMAIL_PATTERN = re.compile(r"[\w.+-]+@[\w-]+\.[\w.]+")
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Calls retrieve_context for each new question, then answers from the tool output.
+    Scheduling messages call list_available_slots (for the next three days), and a message
+    with an email address books tomorrow 10:00 UTC with request_meeting_approval.
+    With use_tools=False (the routed answer model) it answers from the PORTFOLIO CONTEXT
+    in the system prompt instead, and when the whole corpus is in the system prompt
+    (corpus-in-context mode) it answers portfolio questions from it without a tool call.
+    """
+    latency: float = 0.05
+    use_tools: bool = True
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _reply(self, messages) -> AIMessage:
+        last = messages[-1]
+        if not self.use_tools:
+            system = messages[0].content if isinstance(messages[0], SystemMessage) else ""
+            context = system.split("PORTFOLIO CONTEXT", 1)[-1] if "PORTFOLIO CONTEXT" in system else ""
+            if not context.strip():
+                return AIMessage(content="NEEDS_RETRIEVAL")
+            return AIMessage(content=f"From the portfolio: {context.split(':', 1)[-1].strip()[:120]}")
+        if isinstance(last, HumanMessage):
+            call = self._tool_call(last.content)
+            system = messages[0].content if isinstance(messages[0], SystemMessage) else ""
+            if call["name"] == "retrieve_context" and "PORTFOLIO (corpus version" in system:
+                corpus = system.split("PORTFOLIO (corpus version", 1)[1].split(":", 1)[1]
+                return AIMessage(content=f"From the portfolio: {corpus.strip()[:120]}")
+            return AIMessage(content="", tool_calls=[{**call, "id": f"call_{len(messages)}"}])
+        if isinstance(last, ToolMessage):
+            if last.name == "list_available_slots":
+                return AIMessage(content=f"{str(last.content)[:200]}\nWhich time works? Please share your email.")
+            if last.name == "request_meeting_approval":
+                return AIMessage(content=str(last.content))
+            return AIMessage(content=f"Based on the portfolio: {str(last.content)[:120]}")
+        return AIMessage(content="How else can I help?")
+
+    @staticmethod
+    def _tool_call(text: str) -> dict:
+        tomorrow = datetime.now(timezone.utc).date() + timedelta(days=1)
+        email = EMAIL_PATTERN.search(text)
+        if email:
+            return {"name": "request_meeting_approval", "args": {
+                "start_time_iso": f"{tomorrow.isoformat()}T10:00:00Z",
+                "guest_email": email.group(0),
+                "meeting_context": text[:200],
+            }}
+        if any(word in text.lower() for word in SCHEDULING_WORDS):
+            return {"name": "list_available_slots", "args": {
+                "date_str": tomorrow.isoformat(),
+                "end_date_str": (tomorrow + timedelta(days=2)).isoformat(),
+            }}
+        return {"name": "retrieve_context", "args": {"query": text}}
+
+    def _result(self, messages) -> ChatResult:
+        reply = self._reply(messages)
+        # Rough usage (~4 chars per token) so token metrics have something to count
+        input_tokens = sum(len(str(m.content)) for m in messages) // 4
+        output_tokens = len(str(reply.content)) // 4 + 1
+        reply.usage_metadata = {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                                "total_tokens": input_tokens + output_tokens}
+        return ChatResult(generations=[ChatGeneration(message=reply)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency)
+        return self._result(messages)
+
+class FakeVectorStore:
+    """Returns fixed documents after a simulated network round trip."""
+
+    def __init__(self, texts: List[str], latency: float = 0.02):
+        self.docs = [Document(page_content=t) for t in texts]
+        self.latency = latency
+
+    def similarity_search(self, query: str, k: int = 5, filter: dict = None):
+        time.sleep(self.latency)
+        return self.docs[:k]
+
+    async def asimilarity_search(self, query: str, k: int = 5, filter: dict = None):
+        await asyncio.sleep(self.latency)
+        return self.docs[:k]
+
+def install_fakes(llm_latency: float = 0.05, search_latency: float = 0.02):
+    """Swap the agent's LLM and vector store for local fakes."""
+    import langgraph_agent
+    from intent_router import IntentRouter, INTENT_ROUTING
+    langgraph_agent.llm = ScriptedChatModel(latency=llm_latency)
+    langgraph_agent.answer_llm = ScriptedChatModel(latency=llm_latency, use_tools=False)
+    langgraph_agent.router = IntentRouter.load() if INTENT_ROUTING else None
+    langgraph_agent.vector_store = FakeVectorStore(
+        ["Role: Founding Engineer\nCompany: Adina Labs", "Skill Category: languages\nSkills: Python, TypeScript"],
+        latency=search_latency,
+    )
+
+class FakeCalendarServer:
+    """
+    Local HTTP stand-in for the OAuth token endpoint and the Calendar freeBusy/events APIs.
+    Point GOOGLE_CALENDAR_API_ENDPOINT at `api_endpoint` and use `service_account_json()`
+    as GCP_SERVICE_ACCOUNT_JSON.
+    """
+
+    def __init__(self, latency: float = 0.005, busy=None):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        server = self
+        self.latency = latency
+        self.busy = busy or []
+        self.requests = {"token": 0, "freebusy": 0, "events": 0}
+        self.events = []
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                time.sleep(server.latency)
+                if self.path.startswith("/token"):
+                    server.requests["token"] += 1
+                    payload = {"access_token": "fake-token", "expires_in": 3600, "token_type": "Bearer"}
+                elif "freeBusy" in self.path:
+                    server.requests["freebusy"] += 1
+                    query = json.loads(body or b"{}")
+                    payload = {"calendars": {item["id"]: {"busy": server.busy_between(query["timeMin"], query["timeMax"])}
+                                             for item in query.get("items", [])}}
+                elif "/events" in self.path:
+                    server.requests["events"] += 1
+                    event = json.loads(body or b"{}")
+                    event["id"] = f"evt{len(server.events)}"
+                    server.events.append(event)
+                    payload = event
+                else:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.port = self.httpd.server_address[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.api_endpoint = f"{self.url}/calendar/v3/"
+
+    def busy_between(self, t_min: str, t_max: str):
+        return [b for b in self.busy + [{"start": e["start"]["dateTime"], "end": e["end"]["dateTime"]}
+                                         for e in self.events]
+                if b["end"] > t_min and b["start"] < t_max]
+
+    def start(self):
+        import threading
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+
+    def service_account_json(self) -> str:
+        """Service-account credentials with a throwaway key whose token_uri is this server."""
+        import json
+        import rsa
+        _, private_key = rsa.newkeys(1024)
+        return json.dumps({
+            "type": "service_account",
+            "project_id": "fake-project",
+            "private_key_id": "fake",
+            "private_key": private_key.save_pkcs1().decode(),
+            "client_email": "bench@fake-project.iam.gserviceaccount.com",
+            "client_id": "0",
+            "token_uri": f"{self.url}/token",
+        })
+
+class HashEmbeddings(Embeddings):
+    """Deterministic bag-of-words feature hashing: similar wording gives similar vectors."""
+
+    def __init__(self, size: int = 256, latency: float = 0.0):
+        self.size = size
+        self.latency = latency
+
+    def _vector(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for word in re.findall(r"[a-z0-9+#.]+", text.lower()):
+            digest = hashlib.md5(word.encode()).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.size] += 1.0 if digest[4] % 2 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        time.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        time.sleep(self.latency)
+        return self._vector(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        await asyncio.sleep(self.latency)
+        return [self._vector(t) for t in texts]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        await asyncio.sleep(self.latency)
+        return self._vector(text)
@@ -0,0 +1,96 @@
+"""
+Recall vs memory of the local index per embedding dimension and quantization.
+
+    python benchmarks/index_quantization.py --dimensions 3072 768 256 --k 5
+    python benchmarks/index_quantization.py --gemini        # real gemini-embedding-001 vectors
+
+Every chunk and question (benchmarks/portfolio_questions.json) is embedded once at full
+size; each setting truncates and renormalises those vectors (as EMBEDDING_DIMENSIONS does)
+and builds a LocalVectorIndex with that LOCAL_INDEX_QUANTIZATION. Quantized settings are
+measured both with the exact float32 re-scoring of the top k * --rescore candidates and
+without it ("approx").
+
+  recall@k   fraction of a question's relevant chunks (containing one of its markers) in the top k
+  overlap@k  fraction of the full-size float32 top k that the setting returns
+  scan B     bytes per chunk a search reads (compact matrix + int8 scales)
+  search us  mean search_by_vector time per question
+
+Without --gemini the deterministic HashEmbeddings stand-in is used. Its dimensions are hash
+buckets, not Matryoshka-ordered like Gemini's, so truncation costs it more recall than it
+would cost the real model; the quantization comparison is representative either way.
+"""
+import time
+import argparse
+import tempfile
+import statistics
+
+from fakes import HashEmbeddings
+from retrieval_eval import load_questions, relevant_chunks
+
+from hybrid_retriever import load_corpus
+from local_index import LocalVectorIndex, save_local_index, QUANTIZATIONS
+from reduced_embeddings import NATIVE_DIMENSIONS, reduce_vectors
+
+def build(texts, vectors, dimensions: int, quantization: str) -> LocalVectorIndex:
+    index_dir = tempfile.mkdtemp(prefix="virtual-me-quant-")
+    save_local_index(texts, reduce_vectors(vectors, dimensions), "bench", index_dir, quantization=quantization)
+    return LocalVectorIndex.load(None, index_dir)
+
+def evaluate(index, questions, query_vectors, baseline, k: int, repeat: int) -> dict:
+    recalls, overlaps, timings = [], [], []
+    for q, vector, expected in zip(questions, query_vectors, baseline):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            hits = index.search_by_vector(vector, k)
+        timings.append((time.perf_counter() - started) / repeat)
+        rows = [row for row, _ in hits]
+        gold = relevant_chunks(index.texts, q["relevant"])
+        found = {index.texts[row] for row in rows} & gold
+        recalls.append(len(found) / len(gold) if gold else 0.0)
+        overlaps.append(len(set(rows) & set(expected)) / len(expected) if expected else 1.0)
+    return {
+        "recall": statistics.mean(recalls),
+        "overlap": statistics.mean(overlaps),
+        "scan_bytes": index.nbytes / len(index),
+        "search_us": statistics.mean(timings) * 1e6,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dimensions", type=int, nargs="+", default=[NATIVE_DIMENSIONS, 1536, 768, 256])
+    parser.add_argument("--quantizations", nargs="+", default=list(QUANTIZATIONS), choices=QUANTIZATIONS)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rescore", type=int, default=4, help="Candidates re-scored per result (LOCAL_INDEX_RESCORE)")
+    parser.add_argument("--repeat", type=int, default=50, help="Searches per question for the timing")
+    parser.add_argument("--gemini", action="store_true", help="Embed with gemini-embedding-001 (through the embedding cache)")
+    args = parser.parse_args()
+
+    texts, _ = load_corpus()
+    questions = load_questions()
+    if args.gemini:
+        from reduced_embeddings import gemini_embeddings
+        embeddings = gemini_embeddings(dimensions=NATIVE_DIMENSIONS)
+    else:
+        embeddings = HashEmbeddings(size=NATIVE_DIMENSIONS)
+    vectors = embeddings.embed_documents(texts)
+    query_vectors = [embeddings.embed_query(q["question"]) for q in questions]
+
+    reference = build(texts, vectors, NATIVE_DIMENSIONS, "float32")
+    baseline = [[row for row, _ in reference.search_by_vector(v, args.k)] for v in query_vectors]
+    print(f"{len(texts)} chunks, {len(questions)} questions, k={args.k}")
+    print(f"{'dims':>5} {'quantization':<14} {'recall@k':>8} {'overlap@k':>9} {'scan B':>8} {'search us':>9}")
+    for dimensions in args.dimensions:
+        for quantization in args.quantizations:
+            index = build(texts, vectors, dimensions, quantization)
+            index.rescore = args.rescore
+            variants = [(quantization, index)]
+            if index.exact is not None:
+                variants.append((f"{quantization} approx", LocalVectorIndex(
+                    index.texts, index.matrix, None, scales=index.scales)))
+            for name, variant in variants:
+                result = evaluate(variant, questions, query_vectors, baseline, args.k, args.repeat)
+                print(f"{dimensions:>5} {name:<14} {result['recall']:>8.3f} {result['overlap']:>9.3f} "
+                      f"{result['scan_bytes']:>8.0f} {result['search_us']:>9.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Ingestion pipeline throughput with a simulated embedding API.
+
+    python benchmarks/ingest_throughput.py --copies 40 --workers 1 4 8
+
+Builds a synthetic corpus of `copies` portfolio files (each with distinct content), then
+streams it into an InMemoryIndex with HashEmbeddings standing in for Gemini
+(`--embed-latency` seconds per batch call, `--failure-rate` of calls failing once to
+exercise retry/backoff). Prints per-stage throughput for each worker count.
+"""
+import os
+import json
+import time
+import random
+import tempfile
+import argparse
+
+from fakes import HashEmbeddings
+
+from index_sync import InMemoryIndex
+from ingest import DEFAULT_SOURCES, ingest_to_index
+
+PORTFOLIO_PATH = DEFAULT_SOURCES[0]
+
+class FlakyEmbeddings(HashEmbeddings):
+    def __init__(self, latency: float, failure_rate: float):
+        super().__init__(latency=latency)
+        self.failure_rate = failure_rate
+
+    def embed_documents(self, texts):
+        if random.random() < self.failure_rate:
+            time.sleep(self.latency)
+            raise RuntimeError("simulated 429")
+        return super().embed_documents(texts)
+
+def build_corpus(copies: int) -> str:
+    with open(PORTFOLIO_PATH) as f:
+        portfolio = json.load(f)
+    corpus_dir = tempfile.mkdtemp(prefix="virtual-me-ingest-")
+    for i in range(copies):
+        variant = dict(portfolio, name=f"{portfolio.get('name', '')} #{i}")
+        variant["experience"] = [dict(e, description=f"{e.get('description', '')} (variant {i})")
+                                 for e in portfolio.get("experience", [])]
+        variant["projects"] = [dict(p, description=f"{p.get('description', '')} (variant {i})")
+                               for p in portfolio.get("projects", [])]
+        with open(os.path.join(corpus_dir, f"portfolio_{i:03d}.json"), "w") as f:
+            json.dump(variant, f)
+    return corpus_dir
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--copies", type=int, default=40, help="Synthetic portfolio files to ingest")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--embed-latency", type=float, default=0.1, help="Simulated seconds per embedding call")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Fraction of embedding calls that fail")
+    args = parser.parse_args()
+
+    corpus_dir = build_corpus(args.copies)
+    embeddings = FlakyEmbeddings(latency=args.embed_latency, failure_rate=args.failure_rate)
+    for workers in args.workers:
+        work_dir = tempfile.mkdtemp(prefix="virtual-me-ingest-out-")
+        started = time.perf_counter()
+        print(f"--- workers={workers}")
+        result = ingest_to_index(
+            InMemoryIndex(), "bench", embeddings, [corpus_dir], workers=workers, batch_size=args.batch_size,
+            chunks_path=os.path.join(work_dir, "chunks.jsonl"),
+            manifest_path=os.path.join(work_dir, "manifest.json"),
+        )
+        elapsed = time.perf_counter() - started
+        print(f"workers={workers}: {result['chunks']} chunks in {elapsed:.2f}s "
+              f"({result['chunks'] / elapsed:.0f} chunks/s)")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Intent routing vs the full tool loop on the portfolio question set.
+
+    python benchmarks/intent_routing.py --llm-latency 0.3
+
+Runs every question in portfolio_questions.json through the agent graph twice with the
+scripted LLM stand-in: once with the router disabled (every question goes
+think -> retrieve_context -> think) and once routed. Reports LLM calls and latency per
+labelled intent, plus how each question was classified.
+"""
+import time
+import asyncio
+import argparse
+from collections import defaultdict
+
+from fakes import install_fakes
+from retrieval_eval import load_questions
+
+import langgraph_agent as la
+from intent_router import IntentRouter
+from langchain_core.messages import HumanMessage
+
+async def run(questions) -> dict:
+    rows = []
+    agent = la.build_agent_graph()
+    for q in questions:
+        started = time.perf_counter()
+        result = await agent.ainvoke({"messages": [HumanMessage(content=q["question"])]})
+        rows.append({
+            "intent": q.get("intent", "general"),
+            "routed": result.get("intent"),
+            "llm_calls": result.get("llm_calls", 0),
+            "latency_ms": (time.perf_counter() - started) * 1000,
+        })
+    return rows
+
+def summarize(rows) -> dict:
+    by_intent = defaultdict(list)
+    for row in rows:
+        by_intent[row["intent"]].append(row)
+        by_intent["all"].append(row)
+    return {
+        intent: (sum(r["llm_calls"] for r in items) / len(items), sum(r["latency_ms"] for r in items) / len(items))
+        for intent, items in by_intent.items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="Simulated seconds per vector search")
+    parser.add_argument("--verbose", action="store_true", help="Print per-question routing")
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency)
+    questions = load_questions()
+    router = IntentRouter.load()
+
+    la.router = None
+    baseline = summarize(asyncio.run(run(questions)))
+    la.router = router
+    routed_rows = asyncio.run(run(questions))
+    routed = summarize(routed_rows)
+
+    print(f"{'intent':<12} {'llm calls (loop -> routed)':>28} {'latency ms (loop -> routed)':>30}")
+    for intent in sorted(baseline, key=lambda i: (i == "all", i)):
+        (b_calls, b_ms), (r_calls, r_ms) = baseline[intent], routed[intent]
+        print(f"{intent:<12} {b_calls:>13.2f} -> {r_calls:<12.2f} {b_ms:>14.0f} -> {r_ms:<13.0f}")
+
+    if args.verbose:
+        for q, row in zip(questions, routed_rows):
+            print(f"  {row['routed']:<11} {row['llm_calls']}  {q['question']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Offline load test: concurrent clients replay conversation scripts against /api/chat and
+/ws/chat on the app wired to local fakes (see fake_app.py), so no Google/Pinecone calls.
+
+    python benchmarks/load_test.py --endpoint both --concurrency 10 50 --output results.json
+    python benchmarks/load_test.py --concurrency 50 --compare results.json
+
+Each client runs `--conversations` scripts from conversations.json (round-robin, "{client}"
+in a turn is replaced by the client number), one session per conversation. Reports
+throughput, p50/p95/p99 turn latency and memory per session (process RSS growth and the
+serialized size of the stored history) for every endpoint/concurrency pair. `--output`
+writes the results with the git commit; `--compare` prints the change against an
+earlier results file.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import datetime
+import statistics
+import threading
+import subprocess
+from pathlib import Path
+
+BENCH_DIR = Path(__file__).resolve().parent
+SCRIPTS_PATH = BENCH_DIR / "conversations.json"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_server(app, port: int):
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+def rss_bytes() -> int:
+    """Resident set size of this process (server and clients share it)."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+def percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=BENCH_DIR, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+class Stats:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.sessions = []
+
+async def rest_conversation(client, base_url: str, turns, stats: Stats):
+    session_id = None
+    for text in turns:
+        started = time.perf_counter()
+        try:
+            response = await client.post(f"{base_url}/api/chat", json={"message": text, "session_id": session_id})
+            response.raise_for_status()
+            session_id = response.json()["session_id"]
+        except Exception:
+            stats.errors += 1
+            continue
+        stats.latencies.append(time.perf_counter() - started)
+    if session_id:
+        stats.sessions.append(session_id)
+
+async def ws_conversation(base_url: str, turns, stats: Stats, timeout: float, protocol: str = "json"):
+    import websockets
+    from wire import JsonCodec, MsgpackCodec
+    codec = MsgpackCodec() if protocol == "msgpack" else JsonCodec()
+    subprotocols = [codec.subprotocol] if codec.subprotocol else None
+    session_id = None
+    async with websockets.connect(f"{base_url.replace('http', 'ws', 1)}/ws/chat", subprotocols=subprotocols) as ws:
+        for text in turns:
+            started = time.perf_counter()
+            await ws.send(codec.encode({"text": text}))
+            while True:
+                frame = codec.decode(await asyncio.wait_for(ws.recv(), timeout))
+                if frame.get("type") in ("message", "error"):
+                    break
+            if frame["type"] == "error":
+                stats.errors += 1
+                continue
+            session_id = frame.get("session_id", session_id)
+            stats.latencies.append(time.perf_counter() - started)
+    if session_id:
+        stats.sessions.append(session_id)
+
+async def run_client(endpoint: str, client_no: int, args, scripts, base_url: str, http, stats: Stats):
+    for n in range(args.conversations):
+        script = scripts[(client_no + n) % len(scripts)]
+        turns = [turn.replace("{client}", str(client_no)) for turn in script["turns"]]
+        try:
+            if endpoint == "rest":
+                await rest_conversation(http, base_url, turns, stats)
+            else:
+                await ws_conversation(base_url, turns, stats, args.timeout, args.ws_protocol)
+        except Exception:
+            stats.errors += 1
+
+def session_bytes(session_ids) -> float:
+    """Mean serialized size of the stored histories."""
+    from langchain_core.messages import messages_to_dict
+    from session_store import get_session_store
+    store = get_session_store()
+    sizes = [len(json.dumps(messages_to_dict(history))) for history in map(store.get, session_ids) if history]
+    return statistics.mean(sizes) if sizes else 0.0
+
+async def drive(endpoint: str, concurrency: int, args, scripts, base_url: str):
+    """Run `concurrency` clients to completion; returns (Stats, wall seconds)."""
+    import httpx
+    stats = Stats()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=args.timeout, limits=limits) as http:
+        started = time.perf_counter()
+        await asyncio.gather(*(run_client(endpoint, i, args, scripts, base_url, http, stats)
+                               for i in range(concurrency)))
+        return stats, time.perf_counter() - started
+
+def summarize(endpoint: str, concurrency: int, stats: Stats, elapsed: float) -> dict:
+    latencies = stats.latencies or [0.0]
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "turns": len(stats.latencies),
+        "errors": stats.errors,
+        "wall_s": round(elapsed, 3),
+        "throughput_turns_s": round(len(stats.latencies) / elapsed, 2),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "mean": round(statistics.mean(latencies) * 1000, 1),
+            "max": round(max(latencies) * 1000, 1),
+        },
+        "sessions": len(stats.sessions),
+    }
+
+async def run(endpoint: str, concurrency: int, args, scripts, base_url: str) -> dict:
+    rss_before = rss_bytes()
+    stats, elapsed = await drive(endpoint, concurrency, args, scripts, base_url)
+    return {
+        **summarize(endpoint, concurrency, stats, elapsed),
+        "rss_kb_per_session": round(max(rss_bytes() - rss_before, 0) / 1024 / max(len(stats.sessions), 1), 1),
+        "session_bytes": round(session_bytes(stats.sessions)),
+    }
+
+def print_run(result: dict):
+    latency = result["latency_ms"]
+    print(f"{result['endpoint']:<5} c={result['concurrency']:<4} turns={result['turns']:<5} "
+          f"errors={result['errors']:<3} {result['throughput_turns_s']:>7.1f} turns/s  "
+          f"p50={latency['p50']:.0f}ms p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms  "
+          f"rss/session={result['rss_kb_per_session']:.1f}KB history={result['session_bytes']}B")
+
+COMPARED = [
+    ("throughput", lambda r: r["throughput_turns_s"]),
+    ("p50", lambda r: r["latency_ms"]["p50"]),
+    ("p95", lambda r: r["latency_ms"]["p95"]),
+    ("p99", lambda r: r["latency_ms"]["p99"]),
+    ("rss/session", lambda r: r["rss_kb_per_session"]),
+    ("history", lambda r: r["session_bytes"]),
+]
+
+def compare(baseline: dict, results: dict):
+    """Print each run's change against the matching endpoint/concurrency run in `baseline`."""
+    previous = {(r["endpoint"], r["concurrency"]): r for r in baseline["runs"]}
+    print(f"\nvs {baseline.get('commit', '?')} ({baseline.get('timestamp', '?')}):")
+    for result in results["runs"]:
+        old = previous.get((result["endpoint"], result["concurrency"]))
+        if old is None:
+            print(f"{result['endpoint']:<5} c={result['concurrency']:<4} no baseline run")
+            continue
+        parts = []
+        for name, value in COMPARED:
+            before, after = value(old), value(result)
+            change = f"{(after - before) / before * 100:+.0f}%" if before else "n/a"
+            parts.append(f"{name} {before:g}->{after:g} ({change})")
+        print(f"{result['endpoint']:<5} c={result['concurrency']:<4} " + "  ".join(parts))
+
+async def main(args):
+    import fake_app
+    fake_app.install(llm_latency=args.llm_latency, embed_latency=args.embed_latency)
+    fake_app.calendar_server.latency = args.calendar_latency
+    with open(args.scripts) as f:
+        scripts = json.load(f)
+
+    port = _free_port()
+    server = start_server(fake_app.app, port)
+    base_url = f"http://127.0.0.1:{port}"
+
+    endpoints = ["rest", "ws"] if args.endpoint == "both" else [args.endpoint]
+    runs = []
+    try:
+        for endpoint in endpoints:
+            for concurrency in args.concurrency:
+                result = await run(endpoint, concurrency, args, scripts, base_url)
+                print_run(result)
+                runs.append(result)
+    finally:
+        server.should_exit = True
+        fake_app.calendar_server.stop()
+
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "runs": runs,
+        "calendar_requests": dict(fake_app.calendar_server.requests),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", choices=["rest", "ws", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50], help="Concurrent clients (one run each)")
+    parser.add_argument("--conversations", type=int, default=2, help="Conversations per client")
+    parser.add_argument("--scripts", default=str(SCRIPTS_PATH), help="JSON list of {name, turns} conversation scripts")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Simulated seconds per embedding call")
+    parser.add_argument("--calendar-latency", type=float, default=0.005, help="Simulated seconds per Calendar request")
+    parser.add_argument("--response-cache", action="store_true", help="Keep the semantic response cache on")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-turn timeout (s)")
+    parser.add_argument("--ws-protocol", choices=["json", "msgpack"], default="json",
+                        help="Websocket frame format (msgpack negotiates the virtual-me.msgpack subprotocol)")
+    parser.add_argument("--output", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    # Read at import time by the app modules, so set before fake_app is imported
+    os.environ["RESPONSE_CACHE"] = "1" if args.response_cache else "0"
+    os.environ.setdefault("RATE_LIMIT_RPS", "0")  # every client comes from 127.0.0.1
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    sys.path.insert(0, str(BENCH_DIR))
+
+    results = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), results)
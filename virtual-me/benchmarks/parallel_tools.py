@@ -0,0 +1,96 @@
+"""
+Turn latency with several tool calls per LLM response, and with speculative retrieval.
+
+    python benchmarks/parallel_tools.py --llm-latency 0.3 --search-latency 0.15 --calendar-latency 0.15
+
+"multi-tool": the model answers a scheduling question with retrieve_context plus
+list_available_slots for two separate dates in one response. Compares langgraph's
+prebuilt ToolNode with ParallelToolExecutor.
+
+"retrieval": a plain portfolio question, with SPECULATIVE_RETRIEVAL off and on (the
+search for the raw question then runs during the first LLM call).
+"""
+import os
+import time
+import asyncio
+import argparse
+import itertools
+import statistics
+from datetime import date, timedelta
+
+from fakes import FakeCalendarServer, FakeVectorStore, ScriptedChatModel, install_fakes
+
+_turn_counter = itertools.count()
+
+class MultiToolChatModel(ScriptedChatModel):
+    """Asks for retrieval and two days of availability in a single response."""
+
+    def _reply(self, messages):
+        reply = super()._reply(messages)
+        if reply.tool_calls and reply.tool_calls[0]["name"] == "list_available_slots":
+            # A distinct pair of days per turn so the availability cache doesn't hide the calendar calls
+            first = date.today() + timedelta(days=1 + 2 * (next(_turn_counter) % 7))
+            reply.tool_calls = [
+                {"name": "retrieve_context", "args": {"query": messages[-1].content}, "id": "call_ctx"},
+                {"name": "list_available_slots", "args": {"date_str": first.isoformat()}, "id": "call_day1"},
+                {"name": "list_available_slots", "args": {"date_str": (first + timedelta(days=1)).isoformat()},
+                 "id": "call_day2"},
+            ]
+        return reply
+
+async def timed_turns(agent, question: str, turns: int):
+    from langchain_core.messages import HumanMessage
+    samples = []
+    for _ in range(turns):
+        started = time.perf_counter()
+        await agent.ainvoke({"messages": [HumanMessage(content=question)]})
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+def report(label: str, samples):
+    print(f"{label:<28} mean={statistics.mean(samples):7.1f}ms  p50={statistics.median(samples):7.1f}ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Simulated seconds per LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.15, help="Simulated seconds per vector search")
+    parser.add_argument("--calendar-latency", type=float, default=0.15, help="Simulated seconds per Calendar request")
+    args = parser.parse_args()
+
+    server = FakeCalendarServer(latency=args.calendar_latency).start()
+    os.environ["GOOGLE_CALENDAR_API_ENDPOINT"] = server.api_endpoint
+    os.environ["GCP_SERVICE_ACCOUNT_JSON"] = server.service_account_json()
+
+    import langgraph_agent as la
+    import tool_executor
+    from langgraph.prebuilt import ToolNode
+
+    install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency)
+    la.router = None  # every question goes through think -> tools
+    la.vector_store = FakeVectorStore([d.page_content for d in la.vector_store.docs], latency=args.search_latency)
+
+    print(f"multi-tool turn (3 calls: search {args.search_latency * 1000:.0f}ms, "
+          f"calendar {args.calendar_latency * 1000:.0f}ms each)")
+    la.llm = MultiToolChatModel(latency=args.llm_latency)
+    question = "Is Rishab available to meet on either of the next two days?"
+    original = la.ParallelToolExecutor
+    la.ParallelToolExecutor = lambda tools: ToolNode(tools)
+    prebuilt = la.build_agent_graph()
+    la.ParallelToolExecutor = original
+    report("ToolNode", asyncio.run(timed_turns(prebuilt, question, args.turns)))
+    report("ParallelToolExecutor", asyncio.run(timed_turns(la.build_agent_graph(), question, args.turns)))
+
+    print("\nretrieval turn")
+    la.llm = ScriptedChatModel(latency=args.llm_latency)
+    question = "What did he build at Adina Labs?"
+    agent = la.build_agent_graph()
+    for enabled in (False, True):
+        la.SPECULATIVE_RETRIEVAL = tool_executor.SPECULATIVE_RETRIEVAL = enabled
+        report(f"speculative retrieval {'on' if enabled else 'off'}", asyncio.run(timed_turns(agent, question, args.turns)))
+    print(f"speculations: used={tool_executor.SPECULATIVE_RETRIEVALS.value(outcome='used'):g} "
+          f"discarded={tool_executor.SPECULATIVE_RETRIEVALS.value(outcome='discarded'):g}")
+    server.stop()
+
+if __name__ == "__main__":
+    main()
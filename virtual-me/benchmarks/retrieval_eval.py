@@ -0,0 +1,89 @@
+"""
+Offline retrieval evaluation: dense-only vs hybrid (BM25 + dense, RRF) retrieve_context.
+
+    python benchmarks/retrieval_eval.py --k 5
+
+"hybrid+filter" passes each question's optional section/technology filter the way
+retrieve_context does (fewer results from the narrowed set).
+
+Uses the pre-built local index (data/local_index) with real Gemini query embeddings when
+--gemini is given; otherwise chunks are embedded with the deterministic HashEmbeddings
+stand-in, which keeps the comparison offline and repeatable.
+
+recall@k is the fraction of a question's relevant chunks (those containing one of its
+markers) in the top k. Tool calls per question are estimated from whether the first
+retrieval already contains a relevant chunk: 1 if so, 2 if the model has to search again.
+"""
+import json
+import argparse
+import tempfile
+from pathlib import Path
+
+from fakes import HashEmbeddings
+
+from hybrid_retriever import HybridRetriever, load_corpus, metadata_filter
+from local_index import LocalVectorIndex, save_local_index, LOCAL_INDEX_DIR
+
+QUESTIONS_PATH = Path(__file__).resolve().parent / "portfolio_questions.json"
+
+def load_questions(path=QUESTIONS_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+def relevant_chunks(texts, markers):
+    return {t for t in texts if any(m.lower() in t.lower() for m in markers)}
+
+def evaluate(retriever, texts, questions, k: int, filtered: bool = False, filtered_k: int = 3) -> dict:
+    recalls, tool_calls, context_tokens, rows = [], [], [], []
+    for q in questions:
+        gold = relevant_chunks(texts, q["relevant"])
+        flt = metadata_filter(**q["filter"]) if filtered and q.get("filter") else None
+        docs = retriever.similarity_search(q["question"], k=filtered_k, filter=flt) if flt else []
+        if not docs:
+            docs = retriever.similarity_search(q["question"], k=k)
+        found = {d.page_content for d in docs} & gold
+        recall = len(found) / len(gold) if gold else 0.0
+        recalls.append(recall)
+        tool_calls.append(1 if found else 2)
+        context_tokens.append(sum(len(d.page_content) // 4 + 1 for d in docs))
+        rows.append({"question": q["question"], "recall": round(recall, 2), "tool_calls": tool_calls[-1]})
+    n = len(questions)
+    return {
+        f"recall@{k}": round(sum(recalls) / n, 3),
+        "avg_tool_calls": round(sum(tool_calls) / n, 2),
+        "avg_context_tokens": round(sum(context_tokens) / n, 1),
+        "questions": rows,
+    }
+
+def build_index(use_gemini: bool, texts, metadatas):
+    if use_gemini:
+        from reduced_embeddings import gemini_embeddings
+        return LocalVectorIndex.load(gemini_embeddings(), LOCAL_INDEX_DIR)
+    embeddings = HashEmbeddings()
+    index_dir = tempfile.mkdtemp(prefix="virtual-me-eval-")
+    save_local_index(texts, embeddings.embed_documents(texts), "hash", index_dir, metadatas=metadatas)
+    return LocalVectorIndex.load(embeddings, index_dir)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--gemini", action="store_true", help="Use the built local index and Gemini query embeddings")
+    parser.add_argument("--verbose", action="store_true", help="Print per-question results")
+    args = parser.parse_args()
+
+    texts, metadatas = load_corpus()
+    questions = load_questions()
+    dense = build_index(args.gemini, texts, metadatas)
+    hybrid = HybridRetriever(dense, dense.texts, metadatas=dense.metadatas)
+
+    for name, retriever, filtered in (("dense", dense, False), ("hybrid", hybrid, False),
+                                      ("hybrid+filter", hybrid, True)):
+        result = evaluate(retriever, dense.texts, questions, args.k, filtered)
+        print(f"{name:>13}: recall@{args.k}={result[f'recall@{args.k}']:.3f} "
+              f"avg_tool_calls={result['avg_tool_calls']:.2f} avg_context_tokens={result['avg_context_tokens']:.0f}")
+        if args.verbose:
+            for row in result["questions"]:
+                print(f"        {row['recall']:.2f} {row['tool_calls']}  {row['question']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Serialization CPU and bytes per turn for long conversations, by wire format.
+
+    python benchmarks/wire_format.py --turns 10 50 100 --repeat 20
+
+Each synthetic turn is a question, a retrieve_context call, its tool output (real chunks
+from data/processed_chunks.jsonl) and an answer. For every turn of the conversation the
+benchmark encodes:
+
+  full/json        the whole history as messages_to_dict + json.dumps (what a stateless
+                   client sends back each turn, and what SQLiteSessionStore writes)
+  full/orjson      the same with orjson
+  delta/json       the final message frame plus the turn's message delta, json.dumps
+  delta/orjson     ... orjson (JSON text frames / ORJSONResponse)
+  delta/msgpack    ... MessagePack binary frame (virtual-me.msgpack subprotocol)
+  delta/msgpack+zstd  ... with per-message compression forced on
+
+and reports the mean encoded bytes and encode+decode microseconds per turn.
+"""
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+
+src_path = Path(__file__).resolve().parent.parent / "src"
+sys.path.insert(0, str(src_path))
+
+import orjson
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage, messages_to_dict
+from Process_document import load_chunk_texts
+from wire import MsgpackCodec, message_delta, dumps_json
+
+QUESTIONS = ["What are his skills?", "Tell me about his experience as a founding engineer",
+             "Which of his projects used Python?", "What did he build at Adina Labs?", "Where did he study?"]
+
+def conversation(turns: int, chunks):
+    """[(history before the turn, messages the turn added, final frame)] for `turns` turns."""
+    history, result = [], []
+    for n in range(turns):
+        question = QUESTIONS[n % len(QUESTIONS)]
+        context = "\n\n".join(chunks[(n * 3 + i) % len(chunks)] for i in range(3))
+        answer = f"Based on the portfolio: {context[:600]}"
+        added = [
+            HumanMessage(content=question),
+            AIMessage(content="", tool_calls=[{"name": "retrieve_context", "args": {"query": question},
+                                               "id": f"call_{n}"}]),
+            ToolMessage(content=f"RETRIEVED CONTEXT:\n{context}", name="retrieve_context", tool_call_id=f"call_{n}"),
+            AIMessage(content=answer),
+        ]
+        frame = {"response": answer, "thinking": "Response generated", "type": "message", "session_id": "s" * 22}
+        result.append((list(history), added, frame))
+        history.extend(added)
+    return result
+
+def measure(turns, encode, decode, repeat: int):
+    """(mean bytes per turn, mean microseconds per turn) for encode+decode of every turn."""
+    payloads = [encode(*turn) for turn in turns]
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for turn in turns:
+            decode(encode(*turn))
+    elapsed = time.perf_counter() - started
+    return sum(map(len, payloads)) / len(turns), elapsed / (repeat * len(turns)) * 1e6
+
+def delta_frame(history, added, frame):
+    return {**frame, "messages": message_delta(history + added, len(history))}
+
+def formats():
+    msgpack = MsgpackCodec(compress_min_bytes=0)
+    zstd = MsgpackCodec(compress_min_bytes=1)
+    return {
+        "full/json": (lambda h, a, f: json.dumps(messages_to_dict(h + a)).encode(), json.loads),
+        "full/orjson": (lambda h, a, f: orjson.dumps(messages_to_dict(h + a)), orjson.loads),
+        "delta/json": (lambda h, a, f: json.dumps(delta_frame(h, a, f)).encode(), json.loads),
+        "delta/orjson": (lambda h, a, f: dumps_json(delta_frame(h, a, f)), orjson.loads),
+        "delta/msgpack": (lambda h, a, f: msgpack.encode(delta_frame(h, a, f)), msgpack.decode),
+        "delta/msgpack+zstd": (lambda h, a, f: zstd.encode(delta_frame(h, a, f)), zstd.decode),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, nargs="+", default=[10, 50, 100], help="Conversation lengths")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    chunks = load_chunk_texts(str(src_path.parent / "data" / "processed_chunks.jsonl"))
+    results = []
+    for length in args.turns:
+        turns = conversation(length, chunks)
+        print(f"\n{length}-turn conversation (per turn)")
+        baseline = None
+        for name, (encode, decode) in formats().items():
+            size, micros = measure(turns, encode, decode, args.repeat)
+            baseline = baseline or size
+            results.append({"turns": length, "format": name, "bytes": round(size), "us": round(micros, 1)})
+            print(f"  {name:<20} {size:>10.0f} B ({size / baseline:6.1%})  {micros:>9.1f} us")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
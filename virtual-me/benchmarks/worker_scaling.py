@@ -0,0 +1,115 @@
+"""
+Throughput of the fake-backed app (fake_app.py) as the number of uvicorn workers grows.
+
+    python benchmarks/worker_scaling.py --workers 1 2 4 --concurrency 32 --endpoint rest
+
+Each run starts `uvicorn fake_app:app --workers N` with the agent graph checkpointed to a
+fresh shared SQLite file (SESSION_BACKEND=checkpoint), replays the conversation scripts
+with load_test's clients and reports throughput and latency. REST turns of one conversation
+land on arbitrary workers, so the run also checks that every session's checkpoint thread
+holds all of its turns ("continuity").
+
+Workers only add throughput with CPUs to run on: on a 1-CPU machine the runs stay flat.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import tempfile
+import argparse
+import subprocess
+import urllib.request
+from pathlib import Path
+
+from load_test import SCRIPTS_PATH, drive, summarize
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / "src"))
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_workers(workers: int, port: int, db_path: str, args) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        PYTHONPATH=str(ROOT / "benchmarks"),
+        WEB_CONCURRENCY=str(workers),
+        SESSION_BACKEND="checkpoint",
+        CHECKPOINT_DB_PATH=db_path,
+        RESPONSE_CACHE="0",
+        RATE_LIMIT_RPS="0",
+        LOG_LEVEL="WARNING",
+        FAKE_LLM_LATENCY=str(args.llm_latency),
+        FAKE_EMBED_LATENCY=str(args.embed_latency),
+    )
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health/ready", timeout=1):
+                return process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"{workers} worker(s) did not start")
+
+def continuity(db_path: str, session_ids, turns: int) -> bool:
+    """True if the sessions' checkpoint threads together hold every turn that was answered."""
+    from langchain_core.messages import HumanMessage
+    from checkpointer import SQLiteCheckpointSaver
+    from session_store import CheckpointSessionStore
+    store = CheckpointSessionStore(SQLiteCheckpointSaver(db_path))
+    stored = sum(sum(isinstance(m, HumanMessage) for m in store.get(sid) or []) for sid in session_ids)
+    return stored == turns
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--conversations", type=int, default=2, help="Conversations per client")
+    parser.add_argument("--endpoint", choices=["rest", "ws"], default="rest")
+    parser.add_argument("--ws-protocol", choices=["json", "msgpack"], default="json")
+    parser.add_argument("--scripts", default=str(SCRIPTS_PATH))
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated seconds per LLM call")
+    parser.add_argument("--embed-latency", type=float, default=0.01, help="Simulated seconds per embedding call")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--output", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    with open(args.scripts) as f:
+        scripts = json.load(f)
+
+    print(f"{os.cpu_count()} CPU(s); {args.concurrency} clients over {args.endpoint}")
+    runs = []
+    for workers in args.workers:
+        port = _free_port()
+        db_path = os.path.join(tempfile.mkdtemp(prefix="virtual-me-workers-"), "checkpoints.sqlite3")
+        process = start_workers(workers, port, db_path, args)
+        try:
+            stats, elapsed = asyncio.run(drive(args.endpoint, args.concurrency, args, scripts, f"http://127.0.0.1:{port}"))
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+        result = {"workers": workers, **summarize(args.endpoint, args.concurrency, stats, elapsed),
+                  "continuity": continuity(db_path, stats.sessions, len(stats.latencies))}
+        runs.append(result)
+        speedup = result["throughput_turns_s"] / runs[0]["throughput_turns_s"]
+        print(f"workers={workers:<3} {result['throughput_turns_s']:>7.1f} turns/s (x{speedup:.2f})  "
+              f"p50={result['latency_ms']['p50']:.0f}ms p95={result['latency_ms']['p95']:.0f}ms  "
+              f"errors={result['errors']} continuity={'ok' if result['continuity'] else 'BROKEN'}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"cpus": os.cpu_count(), "config": vars(args), "runs": runs}, f, indent=2)
+        print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,50 @@
 import json
 import os
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-
-def process_portfolio_documents():
+import re
+import sys
+from pathlib import Path
+
+# virtual-me/data, independent of the working directory the server or script runs from
+DATA_DIR = str(Path(__file__).resolve().parent.parent / "data")
+CHUNKS_PATH = os.path.join(DATA_DIR, "processed_chunks.jsonl")
+LEGACY_CHUNKS_PATH = os.path.join(DATA_DIR, "processed_chunks.json")
+
+# Metadata carried by every chunk record into the vector store (empty fields are omitted)
+CHUNK_METADATA_FIELDS = ("section", "source", "title", "company", "technologies", "date_range")
+
+def tech_tag(name: str) -> str:
+    """Normalised technology tag for filtering: 'React.js', 'ReactJS' and 'react' -> 'react'."""
+    tag = re.sub(r"[^a-z0-9+#]", "", name.lower())
+    return tag[:-2] if tag.endswith("js") and len(tag) > 4 else tag
+
+def document(section: str, text: str, title: str = None, company: str = None,
+             technologies=(), date_range: str = None) -> dict:
+    """One source document plus the metadata its chunks inherit."""
+    doc = {"section": section, "text": text}
+    title = title or text.strip().split("\n", 1)[0].split(":", 1)[0]
+    for key, value in (("title", title), ("company", company), ("date_range", date_range)):
+        if value:
+            doc[key] = value
+    tags = [tech_tag(t) for t in technologies if tech_tag(t)]
+    if tags:
+        doc["technologies"] = list(dict.fromkeys(tags))
+    return doc
+
+def chunk_metadata(record: dict) -> dict:
+    """Vector store metadata for a chunk record."""
+    return {key: record[key] for key in CHUNK_METADATA_FIELDS if record.get(key)}
+
+def build_documents(portfolio_data):
     """
-    Loads portfolio data from a JSON file, transforms it into text documents,
-    and splits them into smaller chunks.
+    Transforms portfolio data into documents ({"section", "text", ...metadata}). Sections
+    are "profile", "experience", "project", "education" and "skills"; metadata holds the
+    title, company/institution, normalised technology tags and date range where known.
     """
-    file_path = os.path.join('data', 'Portfoliodata.json')
-
-    try:
-        with open(file_path) as f:
-            portfolio_data = json.load(f)
-    except FileNotFoundError:
-        print(f"Error: The file '{file_path}' was not found. Make sure it exists in the 'data' directory.")
-        return []
-
     documents = []
 
     # Bio/About document
     contact_info = portfolio_data.get('contact', {})
-    documents.append(
+    documents.append(document("profile",
         f"Name: {portfolio_data.get('name', 'N/A')}\n"
         f"Role: {portfolio_data.get('role', 'N/A')}\n"
         f"Bio: {portfolio_data.get('bio', 'N/A')}\n"
@@ -28,50 +52,51 @@ def process_portfolio_documents():
         f"Phone: {contact_info.get('phone', 'N/A')}\n"
         f"Location: {contact_info.get('location', 'N/A')}\n"
         f"LinkedIn: {contact_info.get('linkedin', 'N/A')}\n"
-        f"GitHub: {contact_info.get('github', 'N/A')}"
-    )
+        f"GitHub: {contact_info.get('github', 'N/A')}",
+        title="Profile"
+    ))
 
     # Motivation
     if portfolio_data.get('motivation'):
-        documents.append(f"Motivation: {portfolio_data['motivation']}")
+        documents.append(document("profile", f"Motivation: {portfolio_data['motivation']}"))
 
     # Strengths
     strengths = portfolio_data.get('strengths', [])
     if strengths:
-        documents.append(f"Strengths:\n" + "\n".join(f"- {s}" for s in strengths))
+        documents.append(document("profile", f"Strengths:\n" + "\n".join(f"- {s}" for s in strengths)))
 
     # Values
     values = portfolio_data.get('values', [])
     if values:
-        documents.append(f"Values:\n" + "\n".join(f"- {v}" for v in values))
+        documents.append(document("profile", f"Values:\n" + "\n".join(f"- {v}" for v in values)))
 
     # Soft Skills
     soft_skills = portfolio_data.get('softSkills', [])
     if soft_skills:
-        documents.append(f"Soft Skills:\n" + "\n".join(f"- {s}" for s in soft_skills))
+        documents.append(document("profile", f"Soft Skills:\n" + "\n".join(f"- {s}" for s in soft_skills)))
 
     # Leadership Style
     if portfolio_data.get('leadershipStyle'):
-        documents.append(f"Leadership Style: {portfolio_data['leadershipStyle']}")
+        documents.append(document("profile", f"Leadership Style: {portfolio_data['leadershipStyle']}"))
 
     # Technical Philosophy
     if portfolio_data.get('technicalPhilosophy'):
-        documents.append(f"Technical Philosophy: {portfolio_data['technicalPhilosophy']}")
+        documents.append(document("profile", f"Technical Philosophy: {portfolio_data['technicalPhilosophy']}"))
 
     # Learning Goals
     goals = portfolio_data.get('learningGoals', [])
     if goals:
-        documents.append(f"Learning Goals:\n" + "\n".join(f"- {g}" for g in goals))
+        documents.append(document("profile", f"Learning Goals:\n" + "\n".join(f"- {g}" for g in goals)))
 
     # Personality
     personality = portfolio_data.get('personality', {})
     if personality:
         traits = "\n".join(f"- {t}" for t in personality.get('traits', []))
-        documents.append(
+        documents.append(document("profile",
             f"Personality Style: {personality.get('style', '')}\n"
             f"Traits:\n{traits}\n"
             f"Mindset: {personality.get('mindset', '')}"
-        )
+        ))
 
     # Experience documents
     for exp in portfolio_data.get("experience", []):
@@ -82,7 +107,8 @@ def process_portfolio_documents():
             f"Duration: {exp.get('duration', 'N/A')}\n"
             f"Description: {exp.get('description', 'N/A')}"
         )
-        documents.append(doc)
+        documents.append(document("experience", doc, title=exp.get('role'),
+                                  company=exp.get('company'), date_range=exp.get('duration')))
 
     # Project documents
     for proj in portfolio_data.get("projects", []):
@@ -93,7 +119,8 @@ def process_portfolio_documents():
             f"Description: {proj.get('description', 'N/A')}\n"
             f"Contribution: {proj.get('contribution', 'N/A')}"
         )
-        documents.append(doc)
+        documents.append(document("project", doc, title=proj.get('title'),
+                                  technologies=proj.get('technologies', [])))
 
     # Education documents
     for edu in portfolio_data.get("education", []):
@@ -106,37 +133,62 @@ def process_portfolio_documents():
         )
         if achievements:
             doc += "\nAchievements: " + "; ".join(achievements)
-        documents.append(doc)
+        documents.append(document("education", doc, title=edu.get('degree'),
+                                  company=edu.get('institution'), date_range=edu.get('duration')))
 
     # Skills documents
     for category, skills in portfolio_data.get("skills", {}).items():
         skills_str = ', '.join(skills)
         doc = f"Skill Category: {category}\nSkills: {skills_str}"
-        documents.append(doc)
+        documents.append(document("skills", doc, title=category, technologies=skills))
+
+    return documents
 
-    # Chunk documents
-    text_splitter = RecursiveCharacterTextSplitter(
+def read_documents(path: str):
+    """
+    Documents for one source file: a portfolio JSON file is rendered with
+    build_documents, a Markdown/text file (blog post, project README) is one
+    "document" section.
+    """
+    if path.endswith(".json"):
+        with open(path) as f:
+            return build_documents(json.load(f))
+    with open(path, encoding="utf-8") as f:
+        text = f.read().strip()
+    title = os.path.splitext(os.path.basename(path))[0].replace("_", " ").replace("-", " ")
+    return [document("document", f"Document: {title}\n{text}", title=title)] if text else []
+
+def make_text_splitter():
+    # Imported here: the server reads chunk files but never splits, and the splitter package is slow to import
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+    return RecursiveCharacterTextSplitter(
         chunk_size=1000,
         chunk_overlap=200,
         separators=["\n\n", "\n", " ", ""]
     )
 
-    chunks = []
-    for doc in documents:
-        split_docs = text_splitter.split_text(doc)
-        chunks.extend(split_docs)
+def load_chunk_records(path: str = CHUNKS_PATH):
+    """
+    Chunk records ({"id", "text"} plus CHUNK_METADATA_FIELDS) written by the ingestion
+    pipeline. Falls back to the older processed_chunks.json array of texts.
+    Returns [] if neither file exists.
+    """
+    try:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        pass
+    try:
+        with open(LEGACY_CHUNKS_PATH) as f:
+            return [{"text": text} for text in json.load(f)]
+    except FileNotFoundError:
+        return []
 
-    print(f"Created {len(chunks)} chunks from portfolio data.")
-    return chunks
+def load_chunk_texts(path: str = CHUNKS_PATH):
+    return [record["text"] for record in load_chunk_records(path)]
 
 
 if __name__ == "__main__":
-    generated_chunks = process_portfolio_documents()
-
-    output_path = os.path.join('data', 'processed_chunks.json')
-    os.makedirs(os.path.dirname(output_path), exist_ok=True)
-
-    with open(output_path, 'w') as f:
-        json.dump(generated_chunks, f, indent=2)
-
-    print(f"Successfully saved {len(generated_chunks)} chunks to '{output_path}'")
+    # Same as `python src/ingest.py --target jsonl`: writes data/processed_chunks.jsonl
+    from ingest import main
+    main(["--target", "jsonl"] + sys.argv[1:])
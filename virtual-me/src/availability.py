@@ -0,0 +1,184 @@
+"""
+Availability subsystem for the calendar tools.
+
+Busy intervals for a whole range of days are fetched with one freebusy request and cached
+per day for a short TTL, so repeated `list_available_slots` calls in a conversation don't
+each hit the Calendar API. Free 30-minute slots inside working hours are computed locally
+from a merged interval list.
+"""
+import os
+import time
+import threading
+from bisect import insort
+from concurrent.futures import Future
+from datetime import date, datetime, time as dtime, timedelta, timezone
+
+WORKDAY_START_HOUR = int(os.getenv("WORKDAY_START_HOUR", "9"))
+WORKDAY_END_HOUR = int(os.getenv("WORKDAY_END_HOUR", "17"))
+SLOT_MINUTES = 30
+AVAILABILITY_TTL = float(os.getenv("AVAILABILITY_TTL", "120"))
+MAX_RANGE_DAYS = 14
+
+def parse_time(value: str) -> datetime:
+    """Parse a Calendar API timestamp into an aware UTC datetime."""
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc)
+
+def to_iso(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def work_window(day: date):
+    start = datetime.combine(day, dtime(WORKDAY_START_HOUR), tzinfo=timezone.utc)
+    end = datetime.combine(day, dtime(WORKDAY_END_HOUR), tzinfo=timezone.utc)
+    return start, end
+
+def date_range(start: date, end: date):
+    if end < start:
+        start, end = end, start
+    days = (end - start).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise ValueError(f"Please ask for at most {MAX_RANGE_DAYS} days at a time.")
+    return [start + timedelta(days=i) for i in range(days)]
+
+class IntervalSet:
+    """Sorted, non-overlapping [start, end) intervals."""
+
+    def __init__(self, intervals=()):
+        self.intervals = []
+        for start, end in intervals:
+            self.add(start, end)
+
+    def add(self, start: datetime, end: datetime):
+        if end <= start:
+            return
+        insort(self.intervals, (start, end))
+        merged = []
+        for s, e in self.intervals:
+            if merged and s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        self.intervals = merged
+
+    def clip(self, start: datetime, end: datetime) -> "IntervalSet":
+        return IntervalSet((max(s, start), min(e, end)) for s, e in self.intervals if e > start and s < end)
+
+    def gaps(self, start: datetime, end: datetime):
+        """Complement of the set within [start, end)."""
+        free, cursor = [], start
+        for s, e in self.clip(start, end).intervals:
+            if s > cursor:
+                free.append((cursor, s))
+            cursor = max(cursor, e)
+        if cursor < end:
+            free.append((cursor, end))
+        return free
+
+    def free_slots(self, start: datetime, end: datetime, minutes: int = SLOT_MINUTES):
+        """Start times of slot-aligned `minutes`-long blocks in [start, end) that don't overlap the set."""
+        step = timedelta(minutes=minutes)
+        slots = []
+        for gap_start, gap_end in self.gaps(start, end):
+            # Align to the slot grid that starts at `start`
+            offset = (gap_start - start) % step
+            slot = gap_start if not offset else gap_start + (step - offset)
+            while slot + step <= gap_end:
+                slots.append(slot)
+                slot += step
+        return slots
+
+class AvailabilityCache:
+    """
+    Per-day cache of busy intervals. `fetch_busy(time_min_iso, time_max_iso)` must return
+    the freebusy `busy` list for that window; it is called once per batch of missing days.
+    Days another thread is already fetching are waited on rather than fetched again.
+    """
+
+    def __init__(self, fetch_busy, ttl: float = AVAILABILITY_TTL):
+        self.fetch_busy = fetch_busy
+        self.ttl = ttl
+        self._days = {}
+        self._lock = threading.Lock()
+        self._inflight = {}  # day -> Future of the fetch covering it
+        self.hits = 0
+        self.fetches = 0
+        self.shared = 0
+
+    def _fresh(self, day: date):
+        item = self._days.get(day)
+        if item is not None and time.monotonic() - item[0] < self.ttl:
+            return item[1]
+        return None
+
+    def busy_for_days(self, days):
+        """{day: IntervalSet of busy time within working hours} for every requested day."""
+        with self._lock:
+            result = {d: self._fresh(d) for d in days}
+            missing = sorted(d for d, busy in result.items() if busy is None)
+            self.hits += len(days) - len(missing)
+            waiting = {d: self._inflight[d] for d in missing if d in self._inflight}
+            futures = {d: Future() for d in missing if d not in waiting}
+            self._inflight.update(futures)
+            self.shared += len(waiting)
+        if futures:
+            fetching = list(futures)
+            # One request covering the whole span of days this call fetches
+            window_start = work_window(fetching[0])[0]
+            window_end = work_window(fetching[-1])[1]
+            try:
+                busy = IntervalSet(
+                    (parse_time(b["start"]), parse_time(b["end"]))
+                    for b in self.fetch_busy(to_iso(window_start), to_iso(window_end))
+                )
+            except BaseException as e:
+                with self._lock:
+                    for d, future in futures.items():
+                        if self._inflight.get(d) is future:
+                            del self._inflight[d]
+                for future in futures.values():
+                    future.set_exception(e)
+                raise
+            now = time.monotonic()
+            with self._lock:
+                self.fetches += 1
+                for d, future in futures.items():
+                    day_busy = busy.clip(*work_window(d))
+                    # A day invalidated mid-fetch (a meeting was just booked) isn't cached
+                    if self._inflight.get(d) is future:
+                        del self._inflight[d]
+                        self._days[d] = (now, day_busy)
+                    future.set_result(day_busy)
+                    result[d] = day_busy
+        for d, future in waiting.items():
+            result[d] = future.result()
+        return result
+
+    def free_slots(self, days):
+        """{day: [slot start datetimes]} of free SLOT_MINUTES blocks within working hours."""
+        return {d: busy.free_slots(*work_window(d)) for d, busy in self.busy_for_days(days).items()}
+
+    def invalidate(self, day: date):
+        with self._lock:
+            self._days.pop(day, None)
+            self._inflight.pop(day, None)
+
+    def stats(self) -> dict:
+        return {"cached_days": len(self._days), "hits": self.hits, "fetches": self.fetches,
+                "shared": self.shared}
+
+def describe_slots(day: date, slots) -> str:
+    """Human-readable free time for one day, collapsing consecutive slots into ranges."""
+    if not slots:
+        return f"{day.isoformat()}: fully booked between {WORKDAY_START_HOUR:02d}:00 and {WORKDAY_END_HOUR:02d}:00 UTC."
+    step = timedelta(minutes=SLOT_MINUTES)
+    ranges, run_start, prev = [], slots[0], slots[0]
+    for slot in slots[1:]:
+        if slot != prev + step:
+            ranges.append((run_start, prev + step))
+            run_start = slot
+        prev = slot
+    ranges.append((run_start, prev + step))
+    spans = ", ".join(f"{s:%H:%M}-{e:%H:%M}" for s, e in ranges)
+    return f"{day.isoformat()}: free {spans} UTC ({len(slots)} x {SLOT_MINUTES}-min slots)."
@@ -0,0 +1,154 @@
+"""
+Batch answering of independent single-turn questions (FAQ pages, suggested questions,
+regression checks).
+
+Questions with the same normalised text run once. The rest go through the agent graph
+BATCH_CONCURRENCY at a time, each holding an agent slot like any other turn, and share
+identical retrievals and query embeddings (concurrency.BatchMemo). Results are JSON Lines
+records, one per input question, in completion order:
+
+    {"type": "answer", "index": 0, "question": "...", "response": "...", "action": null,
+     "thinking": "...", "corpus_version": "...", "cacheable": true, "duplicate": false,
+     "latency_ms": 812.4}                                  ("error": "..." when it failed)
+
+Written to PRECOMPUTED_ANSWERS_PATH, they are served by the API as precomputed answers
+(response_cache.PrecomputedAnswers):
+
+    python src/batch.py benchmarks/portfolio_questions.json --concurrency 4
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from collections import OrderedDict
+from langchain_core.messages import HumanMessage
+from concurrency import BatchMemo, agent_slot
+from metrics import BATCH_SHARED, TurnTimer, timed_turn
+from response_cache import PRECOMPUTED_ANSWERS_PATH, normalize_query, is_cacheable_result
+from streaming import extract_action
+from structured_logging import get_logger
+from wire import dumps_json
+
+log = get_logger("batch")
+
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+BATCH_MAX_QUESTIONS = int(os.getenv("BATCH_MAX_QUESTIONS", "100"))
+
+async def answer_question(agent, question: str) -> dict:
+    """Run one fresh single-turn question; the record fields that don't depend on its position."""
+    state = {"messages": [HumanMessage(content=question)], "user_query": question}
+    timer = TurnTimer()
+    started = time.perf_counter()
+    try:
+        with timed_turn("batch"):
+            async with agent_slot():
+                result = await agent.ainvoke(state, timer.config())
+    except Exception as e:
+        log.exception("batch question failed", question=question)
+        return {"error": str(e), "latency_ms": round((time.perf_counter() - started) * 1000, 1)}
+    response, action = extract_action(result.get("response", ""))
+    return {
+        "response": response,
+        "action": action,
+        "thinking": result.get("thinking", ""),
+        "cacheable": is_cacheable_result(result),
+        "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+    }
+
+class BatchRun:
+    """One batch: iterate records() for the results, then read stats()."""
+
+    def __init__(self, agent, questions, concurrency: int = BATCH_CONCURRENCY, corpus_version: str = None):
+        self.agent = agent
+        self.questions = list(questions)
+        self.concurrency = max(1, concurrency)
+        self.corpus_version = corpus_version
+        self.memo = BatchMemo()
+        self.failed = 0
+        self.started = None
+        # normalised question -> indexes of the questions asking it
+        self.groups = OrderedDict()
+        for index, question in enumerate(self.questions):
+            self.groups.setdefault(normalize_query(question), []).append(index)
+
+    async def _answer(self, semaphore, indexes):
+        async with semaphore:
+            self.memo.activate()
+            return indexes, await answer_question(self.agent, self.questions[indexes[0]])
+
+    async def records(self):
+        """Yield a record per question as soon as its answer is ready."""
+        self.started = time.perf_counter()
+        duplicates = len(self.questions) - len(self.groups)
+        if duplicates:
+            self.memo.shared["question"] += duplicates
+            BATCH_SHARED.inc(duplicates, kind="question")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks = [asyncio.ensure_future(self._answer(semaphore, indexes)) for indexes in self.groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indexes, answer = await next_done
+                self.failed += len(indexes) if "error" in answer else 0
+                for n, index in enumerate(indexes):
+                    yield {"type": "answer", "index": index, "question": self.questions[index],
+                           "corpus_version": self.corpus_version, "duplicate": n > 0, **answer}
+        finally:
+            # The consumer went away (e.g. the HTTP client disconnected): stop the rest
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "type": "summary",
+            "questions": len(self.questions),
+            "unique": len(self.groups),
+            "failed": self.failed,
+            "shared": dict(self.memo.shared),
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000, 1) if self.started else 0.0,
+        }
+
+def load_questions(path: str) -> list:
+    """Questions from a JSON list (strings or {"question": ...} objects) or a text file, one per line."""
+    with open(path) as f:
+        text = f.read()
+    if path.endswith(".json"):
+        return [q["question"] if isinstance(q, dict) else str(q) for q in json.loads(text)]
+    return [line.strip() for line in text.splitlines() if line.strip() and not line.startswith("#")]
+
+async def write_batch(run: BatchRun, path: str) -> dict:
+    """Run the batch into `path` (records sorted back into input order); returns the summary."""
+    records = [record async for record in run.records()]
+    records.sort(key=lambda r: r["index"])
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        for record in records:
+            f.write(dumps_json(record) + b"\n")
+    # Atomic so serving workers never read a half-written file
+    os.replace(tmp_path, path)
+    return run.stats()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Answer a list of questions and write them as precomputed answers.")
+    parser.add_argument("questions", help="JSON list (strings or {\"question\": ...}) or text file with one question per line")
+    parser.add_argument("--output", default=PRECOMPUTED_ANSWERS_PATH, help="JSON Lines output (served by the API when it is PRECOMPUTED_ANSWERS_PATH)")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="Questions answered at once")
+    args = parser.parse_args(argv)
+
+    from dotenv import load_dotenv
+    load_dotenv()
+    import langgraph_agent as la
+
+    questions = load_questions(args.questions)
+    la.initialize_components()
+    # The bare graph: answers are generated fresh, not read back from earlier runs or the response cache
+    run = BatchRun(la.build_agent_graph(), questions, args.concurrency, corpus_version=la.get_corpus_version())
+    summary = asyncio.run(write_batch(run, args.output))
+    print(f"Answered {summary['unique']} unique of {summary['questions']} questions "
+          f"({summary['failed']} failed) in {summary['elapsed_ms'] / 1000:.1f}s; shared {summary['shared']}. "
+          f"Written to '{args.output}'.")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
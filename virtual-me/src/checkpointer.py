@@ -0,0 +1,216 @@
+"""
+LangGraph checkpointer on a shared SQLite file (WAL mode).
+
+Every uvicorn worker (or replica on the same host/volume) opens the same database, so a
+conversation can continue on whichever worker receives the next turn. Checkpoints are
+stored whole (channel values inline, serialised with the saver's serde). A checkpoint
+written by update_state (source "update": session_store.CheckpointSessionStore saving the
+trimmed history at the end of a turn) supersedes everything before it in the thread, and
+prune() drops threads idle for longer than a TTL or beyond a thread cap.
+
+The agent graph is compiled with it (SESSION_BACKEND=checkpoint), one thread per session.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import threading
+from langgraph.checkpoint.base import (
+    BaseCheckpointSaver, CheckpointTuple, WRITES_IDX_MAP, get_checkpoint_id, get_checkpoint_metadata,
+)
+from Process_document import DATA_DIR
+
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join(DATA_DIR, "checkpoints.sqlite3"))
+
+def _config(thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}}
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """BaseCheckpointSaver on one SQLite connection per process (serialised by a lock)."""
+
+    def __init__(self, path: str = CHECKPOINT_DB_PATH, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                " thread_id TEXT NOT NULL,"
+                " checkpoint_ns TEXT NOT NULL DEFAULT '',"
+                " checkpoint_id TEXT NOT NULL,"
+                " parent_id TEXT,"
+                " type TEXT,"
+                " checkpoint BLOB NOT NULL,"
+                " metadata_type TEXT,"
+                " metadata BLOB NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS writes ("
+                " thread_id TEXT NOT NULL,"
+                " checkpoint_ns TEXT NOT NULL DEFAULT '',"
+                " checkpoint_id TEXT NOT NULL,"
+                " task_id TEXT NOT NULL,"
+                " idx INTEGER NOT NULL,"
+                " channel TEXT NOT NULL,"
+                " type TEXT,"
+                " value BLOB,"
+                " task_path TEXT NOT NULL DEFAULT '',"
+                " PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_checkpoints_updated_at ON checkpoints(updated_at)")
+
+    # --- reads
+
+    def _tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata):
+        with self._lock:
+            writes = self._conn.execute(
+                "SELECT task_id, channel, type, value FROM writes"
+                " WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            ).fetchall()
+        return CheckpointTuple(
+            config=_config(thread_id, checkpoint_ns, checkpoint_id),
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=_config(thread_id, checkpoint_ns, parent_id) if parent_id else None,
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        query = ("SELECT checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata FROM checkpoints"
+                 " WHERE thread_id = ? AND checkpoint_ns = ?")
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            query += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY checkpoint_id DESC LIMIT 1", params).fetchone()
+        return self._tuple(thread_id, checkpoint_ns, *row) if row else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        query = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata"
+                 " FROM checkpoints")
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY checkpoint_id DESC", params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self._tuple(*row)
+            if filter and any(item.metadata.get(key) != value for key, value in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    # --- writes
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, payload = self.serde.dumps_typed(checkpoint)
+        metadata_type, meta = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checkpoints"
+                " (thread_id, checkpoint_ns, checkpoint_id, parent_id, type, checkpoint, metadata_type, metadata,"
+                " updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                 type_, payload, metadata_type, meta, time.time()),
+            )
+            if metadata.get("source") == "update":
+                # A completed turn: earlier checkpoints (the run's steps) are no longer needed
+                for table in ("checkpoints", "writes"):
+                    self._conn.execute(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                        (thread_id, checkpoint_ns, checkpoint["id"]),
+                    )
+        return _config(thread_id, checkpoint_ns, checkpoint["id"])
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        rows = {"INSERT OR REPLACE": [], "INSERT OR IGNORE": []}
+        for idx, (channel, value) in enumerate(writes):
+            type_, payload = self.serde.dumps_typed(value)
+            # Special writes (errors, interrupts, ...) are recorded once; regular writes replace
+            verb = "INSERT OR IGNORE" if channel in WRITES_IDX_MAP else "INSERT OR REPLACE"
+            rows[verb].append((thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                               channel, type_, payload, task_path))
+        with self._lock, self._conn:
+            for verb, items in rows.items():
+                self._conn.executemany(
+                    f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type,"
+                    " value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    items,
+                )
+
+    def delete_thread(self, thread_id: str):
+        with self._lock, self._conn:
+            for table in ("checkpoints", "writes"):
+                self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, ttl: float, max_threads: int):
+        """Drop threads idle for longer than `ttl`, then the least recently updated beyond `max_threads`."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id IN"
+                " (SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?)",
+                (time.time() - ttl,),
+            )
+            self._conn.execute(
+                "DELETE FROM checkpoints WHERE thread_id IN"
+                " (SELECT thread_id FROM checkpoints GROUP BY thread_id"
+                "  ORDER BY MAX(updated_at) DESC LIMIT -1 OFFSET ?)",
+                (max_threads,),
+            )
+            self._conn.execute("DELETE FROM writes WHERE thread_id NOT IN (SELECT thread_id FROM checkpoints)")
+
+    def thread_count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(DISTINCT thread_id) FROM checkpoints").fetchone()
+        return count
+
+    # --- async variants (SQLite calls are short; run them off the event loop)
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        await asyncio.to_thread(self.delete_thread, thread_id)
@@ -0,0 +1,287 @@
+"""
+Admission control for agent turns on a single worker.
+
+- Per-client token buckets (RATE_LIMIT_RPS sustained, RATE_LIMIT_BURST burst) reject
+  turns with a retry-after instead of queueing them. Off unless RATE_LIMIT_RPS is set.
+  Clients are keyed by peer address, so behind a reverse proxy or load balancer that
+  overwrites X-Forwarded-For also set TRUST_FORWARDED_FOR=1; otherwise every visitor shares
+  the proxy's bucket. Never set it where clients can reach the app directly.
+- At most AGENT_MAX_CONCURRENCY turns run at once; up to AGENT_MAX_QUEUE more wait for
+  a slot, for at most AGENT_QUEUE_TIMEOUT seconds. Beyond that a turn fails fast with
+  Overloaded, so a burst turns into quick 503s rather than an ever-growing backlog.
+- SingleFlight runs identical in-flight requests once and hands every caller the result.
+- PendingMessages is a websocket's inbox: messages sent while a turn is running are
+  merged into the next turn, and the oldest are dropped beyond WS_MAX_PENDING.
+- BatchMemo shares retrievals and embeddings between the questions of one batch run
+  (batch.py), whether or not they overlap in time.
+- on_turn_end registers cleanup for the turn holding the agent slot (e.g. a speculative
+  retrieval the turn never used), run however the turn ends, cancelled runs included.
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict, Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from metrics import ADMISSION_REJECTED, ADMISSION_WAIT_SECONDS, COALESCED_REQUESTS, BATCH_SHARED
+
+# Max agent turns executing concurrently per worker (further turns wait for a slot)
+AGENT_MAX_CONCURRENCY = int(os.getenv("AGENT_MAX_CONCURRENCY", "32"))
+AGENT_MAX_QUEUE = int(os.getenv("AGENT_MAX_QUEUE", "64"))
+AGENT_QUEUE_TIMEOUT = float(os.getenv("AGENT_QUEUE_TIMEOUT", "15"))
+OVERLOAD_RETRY_AFTER = float(os.getenv("OVERLOAD_RETRY_AFTER", "2"))
+
+RATE_LIMIT_RPS = float(os.getenv("RATE_LIMIT_RPS", "0"))
+RATE_LIMIT_BURST = float(os.getenv("RATE_LIMIT_BURST", "10"))
+RATE_LIMIT_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_MAX_CLIENTS", "10000"))
+# Key clients by the first X-Forwarded-For hop. Only behind a proxy that overwrites the header
+# (docker-compose.yml's "proxy" profile): reaching the app directly, a client could send any value
+TRUST_FORWARDED_FOR = os.getenv("TRUST_FORWARDED_FOR", "0").lower() in ("1", "true", "yes")
+
+COALESCE_REQUESTS = os.getenv("COALESCE_REQUESTS", "1").lower() not in ("0", "false", "no")
+WS_MAX_PENDING = int(os.getenv("WS_MAX_PENDING", "8"))
+
+class Overloaded(Exception):
+    """A turn was refused: `reason` is rate_limited, queue_full or queue_timeout."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    @property
+    def status_code(self) -> int:
+        return 429 if self.reason == "rate_limited" else 503
+
+    def frame(self) -> dict:
+        """Websocket/SSE error frame for this rejection."""
+        return {"type": "error", "error": self.reason, "retry_after": round(self.retry_after, 1)}
+
+def client_key(connection) -> str:
+    """Rate-limit key of an HTTP request or websocket."""
+    if TRUST_FORWARDED_FOR:
+        forwarded = connection.headers.get("x-forwarded-for", "")
+        if forwarded:
+            return forwarded.split(",", 1)[0].strip()
+    return connection.client.host if connection.client else "unknown"
+
+class RateLimiter:
+    """Token bucket per client; the least recently seen clients are forgotten beyond max_clients."""
+
+    def __init__(self, rate: float = RATE_LIMIT_RPS, burst: float = RATE_LIMIT_BURST,
+                 max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()  # key -> (tokens, updated_at)
+
+    def acquire(self, key: str, cost: float = 1) -> float:
+        """Take `cost` tokens (at most a full burst) for `key`: 0.0 on success, else seconds until they are available."""
+        if self.rate <= 0:
+            return 0.0
+        cost = min(cost, self.burst)
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= cost:
+            tokens -= cost
+        else:
+            wait = (cost - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def check(self, key: str, cost: float = 1):
+        """Raise Overloaded("rate_limited") if `key` doesn't have `cost` tokens left."""
+        wait = self.acquire(key, cost)
+        if wait:
+            ADMISSION_REJECTED.inc(reason="rate_limited")
+            raise Overloaded("rate_limited", wait)
+
+    def stats(self) -> dict:
+        return {"clients": len(self._buckets), "rate": self.rate, "burst": self.burst}
+
+class AdmissionController:
+    """In-flight cap with a bounded, time-limited wait queue."""
+
+    def __init__(self, max_in_flight: int = AGENT_MAX_CONCURRENCY, max_queue: int = AGENT_MAX_QUEUE,
+                 queue_timeout: float = AGENT_QUEUE_TIMEOUT):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._semaphore = None
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        # Created lazily so it binds to the running event loop
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        return self._semaphore
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold an execution slot for the duration of a turn; raises Overloaded instead of waiting too long."""
+        semaphore = self._get_semaphore()
+        if semaphore.locked() and self.queued >= self.max_queue:
+            ADMISSION_REJECTED.inc(reason="queue_full")
+            raise Overloaded("queue_full", OVERLOAD_RETRY_AFTER)
+        started = time.perf_counter()
+        self.queued += 1
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            ADMISSION_REJECTED.inc(reason="queue_timeout")
+            raise Overloaded("queue_timeout", OVERLOAD_RETRY_AFTER) from None
+        finally:
+            self.queued -= 1
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - started)
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+        }
+
+class SingleFlight:
+    """Runs one call per key at a time; concurrent callers with the same key share its outcome."""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def run(self, key, fn):
+        """Await `fn()` (a coroutine function), or the call already in flight for `key`."""
+        if key is None or not COALESCE_REQUESTS:
+            return await fn()
+        future = self._calls.get(key)
+        if future is not None:
+            COALESCED_REQUESTS.inc()
+            # Shielded: a follower going away must not cancel the leader's call
+            return await asyncio.shield(future)
+        future = asyncio.ensure_future(fn())
+        self._calls[key] = future
+        future.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(future)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._calls)}
+
+class PendingMessages:
+    """
+    A websocket's inbox. take() returns everything received since the last turn as one
+    message: the texts joined by newlines, the other fields from the latest message.
+    """
+
+    total = 0  # pending messages across all connections of this worker
+
+    def __init__(self, max_pending: int = WS_MAX_PENDING):
+        self.max_pending = max_pending
+        self._messages = []
+        self._dropped = 0
+        self._closed = None
+        self._ready = asyncio.Event()
+
+    def put(self, message: dict):
+        self._messages.append(message)
+        PendingMessages.total += 1
+        if len(self._messages) > self.max_pending:
+            self._messages.pop(0)
+            PendingMessages.total -= 1
+            self._dropped += 1
+        self._ready.set()
+
+    def close(self, error: Exception):
+        """No more messages; take() raises `error` once the inbox is drained."""
+        self._closed = error
+        self._ready.set()
+
+    async def take(self):
+        """(merged message, number of messages dropped since the last take)."""
+        await self._ready.wait()
+        if not self._messages:
+            raise self._closed
+        messages, self._messages = self._messages, []
+        dropped, self._dropped = self._dropped, 0
+        PendingMessages.total -= len(messages)
+        if self._closed is None:
+            self._ready.clear()
+        merged = dict(messages[-1])
+        merged["text"] = "\n".join(str(m.get("text", "")) for m in messages if m.get("text"))
+        return merged, dropped
+
+_batch_memo = ContextVar("batch_memo", default=None)
+_turn_cleanups = ContextVar("turn_cleanups", default=None)
+
+class BatchMemo:
+    """Results of memoized() calls keyed by (kind, ...) for the tasks of one batch."""
+
+    def __init__(self):
+        self._results = {}
+        self.shared = Counter()
+
+    def activate(self):
+        """Use this memo for the current task and the tasks it starts."""
+        _batch_memo.set(self)
+
+    async def run(self, key: tuple, fn):
+        future = self._results.get(key)
+        if future is None:
+            future = self._results[key] = asyncio.ensure_future(fn())
+            future.add_done_callback(lambda f: self._forget_failure(key, f))
+        else:
+            self.shared[key[0]] += 1
+            BATCH_SHARED.inc(kind=key[0])
+        # Shielded like SingleFlight: one question being cancelled must not fail the others
+        return await asyncio.shield(future)
+
+    def _forget_failure(self, key, future):
+        # Callers already waiting share the error; later ones try again
+        if future.cancelled() or future.exception() is not None:
+            self._results.pop(key, None)
+
+async def memoized(key: tuple, fn):
+    """Await `fn()` once per `key` within a batch (see BatchMemo); outside one, just await it."""
+    memo = _batch_memo.get()
+    return await (memo.run(key, fn) if memo is not None else fn())
+
+rate_limiter = RateLimiter()
+admission = AdmissionController()
+single_flight = SingleFlight()
+
+@asynccontextmanager
+async def agent_slot():
+    """Hold one of the worker's agent execution slots for the duration of a turn, then run its on_turn_end callbacks."""
+    async with admission.slot():
+        cleanups, previous = [], _turn_cleanups.get()
+        _turn_cleanups.set(cleanups)
+        try:
+            yield
+        finally:
+            # set() rather than reset(): a streamed turn may be closed from another context
+            _turn_cleanups.set(previous)
+            for cleanup in cleanups:
+                cleanup()
+
+def on_turn_end(callback):
+    """Call `callback()` when the current turn's agent_slot is released (ignored outside a turn)."""
+    cleanups = _turn_cleanups.get()
+    if cleanups is not None:
+        cleanups.append(callback)
+
+def admission_stats() -> dict:
+    return {
+        **admission.stats(),
+        "coalescing": single_flight.stats()["in_flight"],
+        "ws_pending": PendingMessages.total,
+        "rate_limited_clients": rate_limiter.stats()["clients"],
+    }
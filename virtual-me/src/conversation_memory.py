@@ -0,0 +1,192 @@
+"""
+Token-budgeted conversation memory for the agent's message list.
+
+Without it every turn resends the whole history, including full RETRIEVED CONTEXT
+blobs, so prompt size grows linearly with the conversation. ConversationMemory keeps
+the current turn intact, collapses tool output from earlier turns to short stubs and
+drops the oldest turns once the history exceeds the token budget. Dropped turns can
+optionally be folded into one rolling summary message; when the summarizer's model is
+unavailable they are just dropped, and the summary catches up on a later turn.
+"""
+import os
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from resilience import gemini, is_unavailable
+from structured_logging import get_logger
+
+log = get_logger("memory")
+
+MEMORY_TOKEN_BUDGET = int(os.getenv("MEMORY_TOKEN_BUDGET", "4000"))
+MEMORY_SUMMARIZE = os.getenv("MEMORY_SUMMARIZE", "0").lower() in ("1", "true", "yes")
+TOOL_STUB_CHARS = 160
+SUMMARY_ID = "conversation-summary"
+SUMMARY_PREFIX = "SUMMARY OF EARLIER CONVERSATION:\n"
+
+SUMMARIZE_PROMPT = (
+    "Update the running summary of a conversation between a visitor and Rishab's AI assistant. "
+    "Keep names, emails, dates, meeting details and open questions; drop pleasantries. "
+    "Reply with the updated summary only (max 120 words).\n\n"
+    "CURRENT SUMMARY:\n{summary}\n\nNEW MESSAGES:\n{transcript}"
+)
+
+def _text(message) -> str:
+    content = message.content
+    if isinstance(content, str):
+        return content
+    return " ".join(p if isinstance(p, str) else str(p.get("text", "")) for p in content or [])
+
+def estimate_tokens(message) -> int:
+    """Rough token count (~4 characters per token for Gemini) plus per-message overhead."""
+    chars = len(_text(message))
+    for call in getattr(message, "tool_calls", None) or []:
+        chars += len(call["name"]) + len(str(call.get("args", "")))
+    return chars // 4 + 4
+
+def count_tokens(messages) -> int:
+    return sum(estimate_tokens(m) for m in messages)
+
+def is_summary(message) -> bool:
+    return isinstance(message, SystemMessage) and message.id == SUMMARY_ID
+
+def split_turns(messages):
+    """Split into (leading system messages, [turn, ...]); each turn starts at a HumanMessage."""
+    head, turns = [], []
+    for m in messages:
+        if isinstance(m, HumanMessage) or (turns == [] and not isinstance(m, SystemMessage)):
+            turns.append([m])
+        elif turns:
+            turns[-1].append(m)
+        else:
+            head.append(m)
+    return head, turns
+
+def stub_tool_output(message: ToolMessage) -> ToolMessage:
+    text = _text(message)
+    if len(text) <= TOOL_STUB_CHARS:
+        return message
+    stub = f"{text[:TOOL_STUB_CHARS]}... [{len(text) - TOOL_STUB_CHARS} chars of earlier {message.name or 'tool'} output omitted]"
+    return message.model_copy(update={"content": stub})
+
+def transcript(messages) -> str:
+    lines = []
+    for m in messages:
+        if isinstance(m, HumanMessage):
+            lines.append(f"Visitor: {_text(m)}")
+        elif isinstance(m, AIMessage) and _text(m):
+            lines.append(f"Assistant: {_text(m)}")
+    return "\n".join(lines)
+
+class LLMSummarizer:
+    """
+    Folds evicted turns into a rolling summary with a plain (tool-less) chat model, under the
+    same deadline/retry/breaker policy as the agent's other calls to that model.
+    """
+
+    def __init__(self, chat_model, dependency=gemini):
+        self.chat_model = chat_model
+        self.dependency = dependency
+
+    @staticmethod
+    def _prompt(summary: str, messages) -> list:
+        prompt = SUMMARIZE_PROMPT.format(summary=summary or "(none)", transcript=transcript(messages))
+        return [HumanMessage(content=prompt)]
+
+    def summarize(self, summary: str, messages) -> str:
+        prompt = self._prompt(summary, messages)
+        return _text(self.dependency.call_sync(lambda: self.chat_model.invoke(prompt)))
+
+    async def asummarize(self, summary: str, messages) -> str:
+        prompt = self._prompt(summary, messages)
+        return _text(await self.dependency.call(lambda: self.chat_model.ainvoke(prompt)))
+
+class ConversationMemory:
+    """Sliding window over conversation turns under a token budget."""
+
+    def __init__(self, token_budget: int = MEMORY_TOKEN_BUDGET, summarizer=None):
+        self.token_budget = token_budget
+        self.summarizer = summarizer
+        self.compactions = 0
+        self.tokens_before_total = 0
+        self.tokens_after_total = 0
+        self.last_tokens_saved = 0
+        self.summary_failures = 0
+
+    def _window(self, messages):
+        """Return (summary text, evicted messages, kept messages) for `messages`."""
+        head, turns = split_turns(messages)
+        summary = "\n".join(_text(m)[len(SUMMARY_PREFIX):] for m in head if is_summary(m))
+        system = [m for m in head if not is_summary(m)]
+        if not turns:
+            return summary, [], system
+
+        current = turns[-1]
+        older = [[stub_tool_output(m) if isinstance(m, ToolMessage) else m for m in turn] for turn in turns[:-1]]
+
+        budget = self.token_budget - count_tokens(system) - count_tokens(current)
+        kept, evicted = [], []
+        for turn in reversed(older):
+            cost = count_tokens(turn)
+            if not evicted and cost <= budget:
+                kept.insert(0, turn)
+                budget -= cost
+            else:
+                evicted.insert(0, turn)
+        flat = lambda groups: [m for g in groups for m in g]
+        return summary, flat(evicted), system + flat(kept) + current
+
+    def _finish(self, messages, summary, kept, record: bool):
+        result = kept
+        if summary:
+            result = [SystemMessage(content=SUMMARY_PREFIX + summary, id=SUMMARY_ID)] + kept
+        if not record:
+            return result
+        before, after = count_tokens(messages), count_tokens(result)
+        self.compactions += 1
+        self.tokens_before_total += before
+        self.tokens_after_total += after
+        self.last_tokens_saved = before - after
+        return result
+
+    def compact(self, messages):
+        """Messages to send to the LLM for this call (counted in the tokens-saved metrics)."""
+        summary, _, kept = self._window(messages)
+        return self._finish(messages, summary, kept, record=True)
+
+    def _summary_failed(self, error: Exception):
+        """Keep the old summary and just drop the evicted turns (the turn's answer still goes out)."""
+        self.summary_failures += 1
+        log.warning("summarizer unavailable, evicted turns dropped", error=str(error) or type(error).__name__)
+
+    def trim_history(self, messages):
+        """History to store between turns; evicted turns are folded into the rolling summary."""
+        summary, evicted, kept = self._window(messages)
+        if evicted and self.summarizer is not None:
+            try:
+                summary = self.summarizer.summarize(summary, evicted)
+            except Exception as e:
+                if not is_unavailable(e):
+                    raise
+                self._summary_failed(e)
+        return self._finish(messages, summary, kept, record=False)
+
+    async def atrim_history(self, messages):
+        summary, evicted, kept = self._window(messages)
+        if evicted and self.summarizer is not None:
+            try:
+                summary = await self.summarizer.asummarize(summary, evicted)
+            except Exception as e:
+                if not is_unavailable(e):
+                    raise
+                self._summary_failed(e)
+        return self._finish(messages, summary, kept, record=False)
+
+    def stats(self) -> dict:
+        return {
+            "token_budget": self.token_budget,
+            "compactions": self.compactions,
+            "tokens_saved_total": self.tokens_before_total - self.tokens_after_total,
+            "last_tokens_saved": self.last_tokens_saved,
+            "summary_failures": self.summary_failures,
+            "avg_tokens_saved_per_call": round(
+                (self.tokens_before_total - self.tokens_after_total) / self.compactions, 1
+            ) if self.compactions else 0.0,
+        }
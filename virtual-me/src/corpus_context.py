@@ -0,0 +1,95 @@
+"""
+Full-corpus-in-context mode.
+
+The whole portfolio is a couple of thousand tokens, so a retrieve_context round trip
+(an extra LLM call, an embedding and a vector search) buys little. At ingestion time the
+chunks are rendered into one static, versioned context block (data/corpus_context.json)
+and the decision is recorded: the block is used only if it fits under
+CORPUS_CONTEXT_TOKEN_BUDGET. When it does, the agent appends it to the system prompt and
+drops retrieve_context from the model's tools, so most questions take a single LLM call.
+Past the budget the agent keeps using retrieval.
+
+The block is part of the first, unchanging prompt bytes of every request, which is what
+Gemini's implicit prefix caching keys on. CORPUS_IN_CONTEXT=off forces retrieval,
+=auto (default) uses the block when it fits.
+"""
+import os
+import json
+from collections import OrderedDict
+from Process_document import DATA_DIR, CHUNKS_PATH, load_chunk_records
+from index_sync import ids_version, chunk_id
+from structured_logging import get_logger
+
+log = get_logger("corpus_context")
+
+CORPUS_IN_CONTEXT = os.getenv("CORPUS_IN_CONTEXT", "auto").lower()  # "auto" | "off"
+CORPUS_CONTEXT_TOKEN_BUDGET = int(os.getenv("CORPUS_CONTEXT_TOKEN_BUDGET", "6000"))
+CORPUS_CONTEXT_PATH = os.getenv("CORPUS_CONTEXT_PATH", os.path.join(DATA_DIR, "corpus_context.json"))
+
+SECTION_TITLES = {"profile": "Profile", "experience": "Experience", "project": "Projects",
+                  "education": "Education", "skills": "Skills"}
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def source_version(records) -> str:
+    """Hash of the chunk IDs the block was rendered from."""
+    return ids_version(record.get("id") or chunk_id(record["text"]) for record in records)
+
+def render_corpus(records) -> str:
+    """Chunk texts grouped by section, in the order they were ingested."""
+    sections = OrderedDict()
+    for record in records:
+        sections.setdefault(record.get("section") or "other", []).append(record["text"].strip())
+    return "\n\n".join(
+        f"## {SECTION_TITLES.get(section, section.title())}\n\n" + "\n\n".join(texts)
+        for section, texts in sections.items()
+    )
+
+def compile_corpus_context(records, budget: int = CORPUS_CONTEXT_TOKEN_BUDGET) -> dict:
+    """The rendered block with its version, size and whether it fits `budget`."""
+    text = render_corpus(records)
+    version = source_version(records)
+    tokens = estimate_tokens(text)
+    return {
+        "version": version,
+        "chunks": len(records),
+        "tokens": tokens,
+        "budget": budget,
+        "fits": bool(records) and tokens <= budget,
+        "context": text,
+    }
+
+def write_corpus_context(chunks_path: str = CHUNKS_PATH, path: str = CORPUS_CONTEXT_PATH,
+                         budget: int = CORPUS_CONTEXT_TOKEN_BUDGET) -> dict:
+    """Compile the block from processed_chunks.jsonl into `path` (run by the ingestion CLI)."""
+    compiled = compile_corpus_context(load_chunk_records(chunks_path), budget)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(compiled, f, indent=2)
+    os.replace(tmp_path, path)
+    mode = "in-context" if compiled["fits"] else "retrieval"
+    print(f"Corpus context {compiled['version']}: ~{compiled['tokens']} tokens "
+          f"(budget {budget}) -> {mode} mode, written to '{path}'")
+    return compiled
+
+def load_corpus_context(chunks_path: str = CHUNKS_PATH, path: str = CORPUS_CONTEXT_PATH,
+                        budget: int = CORPUS_CONTEXT_TOKEN_BUDGET):
+    """
+    The compiled block if the corpus should be served in context, else None.
+    A missing or stale file (chunks re-ingested since) is recompiled in memory.
+    """
+    if CORPUS_IN_CONTEXT == "off":
+        return None
+    records = load_chunk_records(chunks_path)
+    try:
+        with open(path) as f:
+            compiled = json.load(f)
+    except (FileNotFoundError, ValueError):
+        compiled = None
+    if compiled is None or compiled.get("version") != source_version(records) or compiled.get("budget") != budget:
+        compiled = compile_corpus_context(records, budget)
+    log.info("corpus context", version=compiled["version"], tokens=compiled["tokens"], budget=budget,
+             in_context=compiled["fits"])
+    return compiled if compiled["fits"] else None
@@ -0,0 +1,183 @@
+"""
+Disk-backed embedding cache shared by ingestion and query-time retrieval.
+
+Vectors are stored in SQLite keyed by (model name, SHA-256 of the text) so unchanged
+chunks and repeated user questions never hit the embedding API twice. The table is
+bounded: once it grows past EMBEDDING_CACHE_MAX_ENTRIES the least recently used
+rows are evicted, down to EMBEDDING_CACHE_EVICT_TO of the limit so that eviction (and
+the row count it needs) runs once per batch of writes rather than on every write.
+"""
+import os
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+from typing import List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from concurrency import memoized
+from Process_document import DATA_DIR
+
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", os.path.join(DATA_DIR, "embedding_cache.sqlite3"))
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", "10000"))
+EMBEDDING_CACHE_EVICT_TO = float(os.getenv("EMBEDDING_CACHE_EVICT_TO", "0.9"))
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE", "1").lower() not in ("0", "false", "no")
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class EmbeddingCache:
+    """LRU-bounded SQLite store of float32 vectors keyed by (model, text hash)."""
+
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_entries: int = EMBEDDING_CACHE_MAX_ENTRIES,
+                 evict_to: float = EMBEDDING_CACHE_EVICT_TO):
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_to = evict_to
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " text_hash TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, text_hash))"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings(last_used)")
+            # Upper bound on the row count, kept up to date by put_many: the table is only
+            # counted (and trimmed) once this passes max_entries
+            (self._entries,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached vector for each text (None where missing); refreshes recency of hits."""
+        hashes = [text_hash(t) for t in texts]
+        found = {}
+        with self._lock, self._conn:
+            for h in set(hashes):
+                row = self._conn.execute(
+                    "SELECT vector FROM embeddings WHERE model = ? AND text_hash = ?", (model, h)
+                ).fetchone()
+                if row is not None:
+                    found[h] = np.frombuffer(row[0], dtype=np.float32).tolist()
+            if found:
+                now = time.time()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+            results = [found.get(h) for h in hashes]
+            hit_count = sum(r is not None for r in results)
+            self.hits += hit_count
+            self.misses += len(results) - hit_count
+        return results
+
+    def put_many(self, model: str, texts: List[str], vectors: List[List[float]]):
+        now = time.time()
+        rows = [
+            (model, text_hash(t), np.asarray(v, dtype=np.float32).tobytes(), now)
+            for t, v in zip(texts, vectors)
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?, ?)", rows)
+            self._entries += len(rows)
+            if self._entries > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        """Count the rows (other workers write too); past max_entries, drop the LRU ones down to evict_to."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        if count > self.max_entries:
+            keep = int(self.max_entries * self.evict_to)
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE rowid IN "
+                "(SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                (count - keep,),
+            )
+            count = keep
+        self._entries = count
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": count, "max_entries": self.max_entries}
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an Embeddings client so every lookup goes through an EmbeddingCache first."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def _split(self, texts):
+        cached = self.cache.get_many(self.model, texts)
+        missing = list(dict.fromkeys(t for t, v in zip(texts, cached) if v is None))
+        return cached, missing
+
+    @staticmethod
+    def _combine(texts, cached, missing, new_vectors):
+        fresh = dict(zip(missing, new_vectors))
+        return [v if v is not None else fresh[t] for t, v in zip(texts, cached)]
+
+    def _merge(self, texts, cached, missing, new_vectors):
+        if missing:
+            self.cache.put_many(self.model, missing, new_vectors)
+        return self._combine(texts, cached, missing, new_vectors)
+
+    # The async variants run the SQLite reads and writes in threads: they block on the
+    # cache lock and on other workers' writes, which must not stall the event loop
+
+    async def _asplit(self, texts):
+        return await asyncio.to_thread(self._split, texts)
+
+    async def _amerge(self, texts, cached, missing, new_vectors):
+        if missing:
+            await asyncio.to_thread(self.cache.put_many, self.model, missing, new_vectors)
+        return self._combine(texts, cached, missing, new_vectors)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = self._split(texts)
+        new_vectors = self.embeddings.embed_documents(missing) if missing else []
+        return self._merge(texts, cached, missing, new_vectors)
+
+    def embed_query(self, text: str) -> List[float]:
+        cached, missing = self._split([text])
+        new_vectors = [self.embeddings.embed_query(text)] if missing else []
+        return self._merge([text], cached, missing, new_vectors)[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        cached, missing = await self._asplit(texts)
+        new_vectors = await self.embeddings.aembed_documents(missing) if missing else []
+        return await self._amerge(texts, cached, missing, new_vectors)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        # A batch embeds each distinct question once, even while the first call is in flight
+        return await memoized(("embedding", self.model, text), lambda: self._aembed_query(text))
+
+    async def _aembed_query(self, text: str) -> List[float]:
+        cached, missing = await self._asplit([text])
+        new_vectors = [await self.embeddings.aembed_query(text)] if missing else []
+        return (await self._amerge([text], cached, missing, new_vectors))[0]
+
+_cache = None
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """Process-wide cache instance (None when disabled via EMBEDDING_CACHE=0)."""
+    global _cache
+    if _cache is None and EMBEDDING_CACHE_ENABLED:
+        _cache = EmbeddingCache()
+    return _cache
+
+def with_embedding_cache(embeddings: Embeddings, model: str) -> Embeddings:
+    """Wrap an embeddings client with the shared cache when caching is enabled."""
+    cache = get_embedding_cache()
+    return CachedEmbeddings(embeddings, cache, model) if cache is not None else embeddings
@@ -1,15 +1,36 @@
 import os
 import json
-from langchain.agents import tool
-from googleapiclient.discovery import build
-from google.oauth2 import service_account
-from datetime import datetime, timedelta
+import hashlib
+import threading
+from langchain_core.tools import tool
+from datetime import date, datetime, timedelta
+from availability import AvailabilityCache, date_range, describe_slots, parse_time
+from metrics import registry, ERRORS
+from resilience import calendar
+from structured_logging import get_logger
+
+log = get_logger("calendar")
 
 SCOPES = ['https://www.googleapis.com/auth/calendar']
 PERSONAL_CALENDAR_ID = "crishab07@gmail.com" 
 
-def get_calendar_service():
-    """Loads credentials from environment variable and returns a service object."""
+# Optional override of the Calendar API base URL (e.g. a local fake for benchmarks)
+CALENDAR_API_ENDPOINT = os.getenv("GOOGLE_CALENDAR_API_ENDPOINT")
+# Socket timeout; defaults to the calendar deadline so abandoned attempts don't linger past it
+CALENDAR_HTTP_TIMEOUT = float(os.getenv("GOOGLE_CALENDAR_HTTP_TIMEOUT", str(calendar.timeout)))
+
+# Credentials are shared process-wide; service objects (and their httplib2
+# connections, which are not thread-safe) are cached per thread.
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+# The Google client libraries (googleapiclient, google-auth, httplib2) are imported inside the
+# functions below: they are only needed once a calendar tool actually runs.
+
+def load_credentials():
+    """Parses GCP_SERVICE_ACCOUNT_JSON into service-account credentials."""
+    from google.oauth2 import service_account
     creds_json = os.environ.get("GCP_SERVICE_ACCOUNT_JSON", "").strip().strip("'").strip('"')
 
     if not creds_json:
@@ -19,32 +40,115 @@ def get_calendar_service():
     if "private_key" in info:
         info["private_key"] = info["private_key"].replace("\\n", "\n")
         
-    creds = service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
-    return build('calendar', 'v3', credentials=creds)
+    return service_account.Credentials.from_service_account_info(info, scopes=SCOPES)
+
+def get_credentials():
+    """Process-wide credentials; the access token is refreshed under a lock and reused until expiry."""
+    global _credentials
+    from google.auth.transport.requests import Request
+    with _credentials_lock:
+        if _credentials is None:
+            _credentials = load_credentials()
+        if not _credentials.valid:
+            _credentials.refresh(Request())
+        return _credentials
+
+def build_calendar_service(creds):
+    """Builds a Calendar client from the bundled discovery document over a persistent HTTP connection."""
+    import httplib2
+    from googleapiclient.discovery import build
+    from google_auth_httplib2 import AuthorizedHttp
+    http = AuthorizedHttp(creds, http=httplib2.Http(timeout=CALENDAR_HTTP_TIMEOUT))
+    client_options = {"api_endpoint": CALENDAR_API_ENDPOINT} if CALENDAR_API_ENDPOINT else None
+    return build('calendar', 'v3', http=http, cache_discovery=False, static_discovery=True,
+                 client_options=client_options)
+
+def get_calendar_service():
+    """Returns this thread's cached service object (built once, token shared across threads)."""
+    creds = get_credentials()
+    service = getattr(_local, "service", None)
+    if service is None:
+        service = build_calendar_service(creds)
+        _local.service = service
+    return service
+
+def reset_calendar_service():
+    """Drops cached credentials and this thread's service (e.g. after rotating the service account)."""
+    global _credentials
+    with _credentials_lock:
+        _credentials = None
+    _local.service = None
+
+def query_busy(time_min: str, time_max: str):
+    """One freebusy request for [time_min, time_max); returns the calendar's busy intervals."""
+    body = {
+        "timeMin": time_min,
+        "timeMax": time_max,
+        "items": [{"id": PERSONAL_CALENDAR_ID}]
+    }
+    # A read: retried and hedged under the calendar deadline. The request runs on a
+    # resilience.py worker thread, which builds its own service object.
+    fb_result = calendar.call_sync(lambda: get_calendar_service().freebusy().query(body=body).execute())
+    return fb_result['calendars'][PERSONAL_CALENDAR_ID]['busy']
+
+# Fresh IDs tried for one guest and slot when earlier requests were cancelled
+MEETING_ID_ATTEMPTS = 5
+
+def meeting_event_id(guest_email: str, start_time_iso: str, attempt: int = 0) -> str:
+    """
+    Deterministic event ID (hex digits are valid base32hex) so a retried insert can't create a
+    second event. Google keeps the IDs of deleted or declined events reserved, so later
+    requests for the same guest and slot move on to the next `attempt`.
+    """
+    key = f"{guest_email.lower()}|{start_time_iso}" + (f"|{attempt}" if attempt else "")
+    return hashlib.sha1(key.encode()).hexdigest()
+
+def insert_event(event: dict, guest_email: str, start_time_iso: str):
+    """
+    events.insert under meeting_event_id. "Already exists" (409) means an earlier attempt got
+    through, unless that event is cancelled: then the next ID is tried.
+    """
+    events = get_calendar_service().events()
+    for attempt in range(MEETING_ID_ATTEMPTS):
+        event_id = meeting_event_id(guest_email, start_time_iso, attempt)
+        try:
+            events.insert(
+                calendarId=PERSONAL_CALENDAR_ID, 
+                body={**event, "id": event_id}
+                # conferenceDataVersion=1
+            ).execute()
+            return
+        except Exception as e:
+            if getattr(getattr(e, "resp", None), "status", None) != 409:
+                raise
+        existing = events.get(calendarId=PERSONAL_CALENDAR_ID, eventId=event_id).execute()
+        if existing.get("status") != "cancelled":
+            return
+    raise RuntimeError(f"this slot was already requested and cancelled {MEETING_ID_ATTEMPTS} times")
+
+# Busy intervals per day, shared by all conversations for a short TTL
+availability = AvailabilityCache(query_busy)
+registry.register_collector("availability_cache", availability.stats)
 
 @tool
-def list_available_slots(date_str: str) -> str:
-    """Check availability for a date (format: YYYY-MM-DD)."""
+def list_available_slots(date_str: str, end_date_str: str = "") -> str:
+    """
+    Check availability and list free 30-min meeting slots (9 AM - 5 PM UTC).
+    Args:
+        date_str: The first date to check (format: YYYY-MM-DD).
+        end_date_str: Optional last date (YYYY-MM-DD) to check a whole range in one call (max 14 days).
+    """
     try:
-        service = get_calendar_service()
-        t_min = f"{date_str}T09:00:00Z"
-        t_max = f"{date_str}T17:00:00Z"
-        
-        body = {
-            "timeMin": t_min,
-            "timeMax": t_max,
-            "items": [{"id": PERSONAL_CALENDAR_ID}]
-        }
+        first_day = date.fromisoformat(date_str)
+        last_day = date.fromisoformat(end_date_str) if end_date_str else first_day
+        days = date_range(first_day, last_day)
         
-        fb_result = service.freebusy().query(body=body).execute()
-        busy_slots = fb_result['calendars'][PERSONAL_CALENDAR_ID]['busy']
-        
-        if not busy_slots:
-            return f"I am fully available on {date_str} between 9 AM and 5 PM UTC."
-        
-        slots_str = ", ".join([f"{s['start']} to {s['end']}" for s in busy_slots])
-        return f"On {date_str}, I am busy: {slots_str}. Other times between 9AM-5PM UTC are free."
+        free = availability.free_slots(days)
+        lines = [describe_slots(day, free[day]) for day in days]
+        return "Available 30-minute slots:\n" + "\n".join(lines)
     except Exception as e:
+        ERRORS.inc(component="list_available_slots")
+        log.warning("availability lookup failed", error=str(e), date=date_str, end_date=end_date_str)
         return f"Error checking calendar: {str(e)}"
 
 @tool
@@ -58,7 +162,6 @@ def request_meeting_approval(start_time_iso: str, guest_email: str, meeting_cont
         meeting_context: A brief summary of why the person wants to meet.
     """
     try:
-        service = get_calendar_service()
         dt = datetime.fromisoformat(start_time_iso.replace('Z', ''))
         end_time = (dt + timedelta(minutes=30)).isoformat() + "Z"
         
@@ -84,16 +187,18 @@ def request_meeting_approval(start_time_iso: str, guest_email: str, meeting_cont
         #     }
          }
         
-        service.events().insert(
-            calendarId=PERSONAL_CALENDAR_ID, 
-            body=event
-            # conferenceDataVersion=1
-        ).execute()
+        # Retried like a read (the event ID makes it idempotent), but never hedged
+        calendar.call_sync(lambda: insert_event(event, guest_email, start_time_iso), hedge=False)
+        
+        # The day's cached availability is stale now
+        availability.invalidate(parse_time(start_time_iso).date())
         
         return (f"I've placed a tentative meeting request on Rishab's calendar for {start_time_iso}. "
                 "Once he reviews the context and accepts it, the meeting will be finalized.")
                 
     except Exception as e:
+        ERRORS.inc(component="request_meeting_approval")
+        log.warning("meeting request failed", error=str(e), start=start_time_iso)
         return f"Failed to send request: {str(e)}"
 
 if __name__ == "__main__":
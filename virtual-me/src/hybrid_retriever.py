@@ -0,0 +1,158 @@
+"""
+Hybrid lexical + dense retrieval for retrieve_context.
+
+Dense search alone misses exact-match questions ("has he used Solidity?"), which sends
+the model back for more retrieve_context calls. HybridRetriever keeps an in-process BM25
+inverted index over the processed chunks next to the vector store, fuses both rankings
+with reciprocal-rank fusion, drops chunks that overlap ones already selected (the
+splitter's chunk_overlap) and stops once the context reaches a token budget.
+"""
+import os
+import re
+import math
+from collections import Counter, defaultdict
+from langchain_core.documents import Document
+from Process_document import CHUNKS_PATH, load_chunk_records, chunk_metadata, tech_tag
+from index_sync import metadata_matches
+
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").lower()  # "hybrid" | "dense"
+RETRIEVAL_MAX_TOKENS = int(os.getenv("RETRIEVAL_MAX_TOKENS", "1200"))
+RRF_K = 60
+SECTION_ALIASES = {"projects": "project", "skill": "skills", "work": "experience", "jobs": "experience"}
+
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "did", "does", "do", "for", "from", "has",
+    "have", "he", "his", "him", "how", "i", "in", "is", "it", "of", "on", "or", "rishab", "s",
+    "tell", "that", "the", "to", "was", "what", "which", "who", "with", "about", "me", "any", "used",
+}
+
+def tokenize(text: str):
+    """Lowercase terms, keeping tech tokens like 'c++', 'node.js' and 'c#' intact."""
+    terms = re.findall(r"[a-z0-9][a-z0-9+#.]*", text.lower())
+    return [t.rstrip(".") for t in terms if t.rstrip(".") and t.rstrip(".") not in STOPWORDS]
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+def load_corpus(path: str = CHUNKS_PATH):
+    """(texts, metadatas) for the processed chunks."""
+    records = load_chunk_records(path)
+    return [r["text"] for r in records], [chunk_metadata(r) for r in records]
+
+class BM25Index:
+    """Okapi BM25 over an in-memory inverted index."""
+
+    def __init__(self, texts, k1: float = 1.5, b: float = 0.75):
+        self.texts = list(texts)
+        self.k1 = k1
+        self.b = b
+        self.postings = defaultdict(list)
+        self.doc_lengths = []
+        for doc_id, text in enumerate(self.texts):
+            terms = Counter(tokenize(text))
+            self.doc_lengths.append(sum(terms.values()))
+            for term, tf in terms.items():
+                self.postings[term].append((doc_id, tf))
+        self.avg_length = (sum(self.doc_lengths) / len(self.doc_lengths)) if self.doc_lengths else 0.0
+        n = len(self.texts)
+        self.idf = {
+            term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, k: int = 5, allowed=None):
+        """
+        [(doc_id, score)] for the k best-scoring chunks (only chunks sharing a query term,
+        and only doc_ids in `allowed` when given).
+        """
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                if allowed is not None and doc_id not in allowed:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / (self.avg_length or 1))
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda item: -item[1])[:k]
+
+def metadata_filter(section: str = None, technology: str = None) -> dict:
+    """Pinecone-style filter for retrieve_context's optional section/technology arguments."""
+    flt = {}
+    if section:
+        flt["section"] = {"$eq": SECTION_ALIASES.get(section.lower(), section.lower())}
+    if technology:
+        flt["technologies"] = {"$in": [tech_tag(technology)]}
+    return flt
+
+def reciprocal_rank_fusion(rankings, k: int = RRF_K):
+    """Fuse ranked key lists: score(key) = sum(1 / (k + rank))."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking):
+            scores[key] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: -item[1])
+
+def _shingles(text: str, size: int = 5):
+    words = text.split()
+    return {" ".join(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+def overlaps(a: str, b: str, threshold: float = 0.5) -> bool:
+    """True if one chunk is mostly contained in the other (e.g. split overlap or duplicate)."""
+    if a in b or b in a:
+        return True
+    sa, sb = _shingles(a), _shingles(b)
+    return len(sa & sb) / max(1, min(len(sa), len(sb))) >= threshold
+
+class HybridRetriever:
+    """
+    Wraps a dense vector store (Pinecone or LocalVectorIndex) and adds BM25 + RRF.
+    Exposes the same similarity_search/asimilarity_search calls (including the metadata
+    `filter`, which narrows both rankings); other attributes fall through to the dense store.
+    """
+
+    def __init__(self, dense, texts, max_tokens: int = RETRIEVAL_MAX_TOKENS, candidates: int = 10,
+                 metadatas=None):
+        self.dense = dense
+        self.bm25 = BM25Index(texts)
+        self.metadatas = list(metadatas or [{} for _ in self.bm25.texts])
+        self.metadata_by_text = dict(zip(self.bm25.texts, self.metadatas))
+        self.max_tokens = max_tokens
+        self.candidates = candidates
+
+    def __getattr__(self, name):
+        return getattr(self.dense, name)
+
+    def _allowed(self, flt):
+        if not flt:
+            return None
+        return {i for i, m in enumerate(self.metadatas) if metadata_matches(m, flt)}
+
+    def _fuse(self, query: str, dense_docs, k: int, flt: dict = None):
+        hits = self.bm25.search(query, self.candidates, allowed=self._allowed(flt))
+        lexical = [self.bm25.texts[i] for i, _ in hits]
+        dense = [d.page_content for d in dense_docs]
+        selected, used_tokens = [], 0
+        for text, score in reciprocal_rank_fusion([dense, lexical]):
+            if len(selected) >= k:
+                break
+            if any(overlaps(text, s.page_content) for s in selected):
+                continue
+            cost = estimate_tokens(text)
+            if selected and used_tokens + cost > self.max_tokens:
+                break
+            metadata = {**self.metadata_by_text.get(text, {}), "rrf_score": score}
+            selected.append(Document(page_content=text, metadata=metadata))
+            used_tokens += cost
+        return selected
+
+    def similarity_search(self, query: str, k: int = 5, filter: dict = None):
+        return self._fuse(query, self.dense.similarity_search(query, k=self.candidates, filter=filter), k, filter)
+
+    async def asimilarity_search(self, query: str, k: int = 5, filter: dict = None):
+        return self._fuse(query, await self.dense.asimilarity_search(query, k=self.candidates, filter=filter), k, filter)
+
+    def lexical_search(self, query: str, k: int = 5, filter: dict = None):
+        """BM25 ranking alone: no embedding or vector store call (the fallback when those are down)."""
+        return self._fuse(query, [], k, filter)
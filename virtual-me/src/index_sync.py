@@ -0,0 +1,149 @@
+"""
+Bookkeeping for incremental index syncs (driven by ingest.ingest_to_index).
+
+Every chunk gets a stable ID derived from its section and a content hash, and a local
+manifest maps the IDs already in the index to a fingerprint of their metadata, so an edit
+to the sources only re-embeds and upserts the chunks whose text or metadata changed. IDs
+that disappear from the corpus are deleted. Works against a Pinecone Index or the
+InMemoryIndex stand-in below.
+"""
+import os
+import re
+import json
+import hashlib
+import numpy as np
+from Process_document import DATA_DIR
+
+MANIFEST_PATH = os.getenv("INDEX_MANIFEST_PATH", os.path.join(DATA_DIR, "index_manifest.json"))
+UPSERT_BATCH_SIZE = int(os.getenv("UPSERT_BATCH_SIZE", "64"))
+
+def chunk_section(text: str) -> str:
+    """Section slug from the chunk's first line, e.g. 'Project: X' -> 'project'."""
+    first_line = text.strip().split("\n", 1)[0]
+    label = first_line.split(":", 1)[0] if ":" in first_line else first_line
+    slug = re.sub(r"[^a-z0-9]+", "-", label.lower()).strip("-")
+    return slug[:40] or "chunk"
+
+def chunk_id(text: str) -> str:
+    """Stable vector ID: section plus a content hash."""
+    return f"{chunk_section(text)}-{hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]}"
+
+def load_manifest(path: str = MANIFEST_PATH) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"ids": {}}
+
+def save_manifest(manifest: dict, path: str = MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+_version_cache = {}
+
+def corpus_version(path: str = MANIFEST_PATH) -> str:
+    """Short hash of the set of indexed chunk IDs (memoised on the manifest's mtime)."""
+    try:
+        mtime = os.stat(path).st_mtime
+    except FileNotFoundError:
+        return "unversioned"
+    if _version_cache.get(path, (None,))[0] != mtime:
+        ids = sorted(load_manifest(path).get("ids", {}))
+        _version_cache[path] = (mtime, ids_version(ids))
+    return _version_cache[path][1]
+
+def ids_version(ids) -> str:
+    return hashlib.sha256("\n".join(sorted(ids)).encode("utf-8")).hexdigest()[:12]
+
+def _batches(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+def load_index_manifest(index_name: str, path: str = MANIFEST_PATH) -> dict:
+    manifest = load_manifest(path)
+    if manifest.get("index") != index_name:
+        # Manifest describes a different index: treat everything as new
+        manifest = {"index": index_name, "ids": {}}
+    return manifest
+
+def metadata_fingerprint(metadata: dict) -> str:
+    """Manifest value for a chunk: changes when its metadata does, so metadata edits get re-upserted."""
+    return "meta-" + hashlib.sha256(json.dumps(metadata, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def upsert_batch(index, manifest: dict, ids, texts, vectors, manifest_path: str = MANIFEST_PATH,
+                 text_key: str = "text", metadatas=None):
+    """Upsert one embedded batch and record it in the manifest."""
+    metadatas = metadatas or [{"section": chunk_section(t)} for t in texts]
+    index.upsert(vectors=[
+        {"id": i, "values": list(v), "metadata": {**m, text_key: t}}
+        for i, t, v, m in zip(ids, texts, vectors, metadatas)
+    ])
+    for i, m in zip(ids, metadatas):
+        manifest["ids"][i] = metadata_fingerprint(m)
+    save_manifest(manifest, manifest_path)
+
+def delete_stale(index, manifest: dict, current_ids, manifest_path: str = MANIFEST_PATH,
+                 batch_size: int = UPSERT_BATCH_SIZE) -> int:
+    """Delete indexed IDs that are not in `current_ids`; returns how many were removed."""
+    to_delete = sorted(i for i in manifest["ids"] if i not in current_ids)
+    for batch in _batches(to_delete, batch_size):
+        index.delete(ids=batch)
+        for i in batch:
+            manifest["ids"].pop(i, None)
+        save_manifest(manifest, manifest_path)
+    return len(to_delete)
+
+def metadata_matches(metadata: dict, flt: dict) -> bool:
+    """
+    Evaluate a Pinecone-style metadata filter ({"field": value}, {"field": {"$eq"|"$in": ...}}).
+    List-valued fields (technologies) match if any element matches, as in Pinecone.
+    """
+    for field, condition in (flt or {}).items():
+        value = metadata.get(field)
+        values = value if isinstance(value, list) else [value]
+        if isinstance(condition, dict):
+            if "$eq" in condition and condition["$eq"] not in values:
+                return False
+            if "$in" in condition and not set(condition["$in"]) & set(values):
+                return False
+        elif condition not in values:
+            return False
+    return True
+
+class InMemoryIndex:
+    """Dict-backed stand-in for a Pinecone Index (upsert/delete/fetch/query/stats)."""
+
+    def __init__(self):
+        self.vectors = {}
+
+    def upsert(self, vectors, namespace: str = None):
+        for v in vectors:
+            self.vectors[v["id"]] = {"values": list(v["values"]), "metadata": dict(v.get("metadata", {}))}
+        return {"upserted_count": len(vectors)}
+
+    def delete(self, ids, namespace: str = None):
+        for i in ids:
+            self.vectors.pop(i, None)
+
+    def fetch(self, ids, namespace: str = None):
+        return {"vectors": {i: self.vectors[i] for i in ids if i in self.vectors}}
+
+    def query(self, vector, top_k: int = 5, include_metadata: bool = True, filter: dict = None, **kwargs):
+        ids = [i for i, v in self.vectors.items() if metadata_matches(v["metadata"], filter)]
+        if not ids:
+            return {"matches": []}
+        matrix = np.asarray([self.vectors[i]["values"] for i in ids], dtype=np.float32)
+        query = np.asarray(vector, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        order = np.argsort(-scores)[:top_k]
+        return {"matches": [
+            {"id": ids[i], "score": float(scores[i]),
+             "metadata": self.vectors[ids[i]]["metadata"] if include_metadata else None}
+            for i in order
+        ]}
+
+    def describe_index_stats(self):
+        return {"total_vector_count": len(self.vectors)}
@@ -0,0 +1,266 @@
+"""
+Streaming ingestion pipeline: source files -> sections -> chunks -> embeddings -> index.
+
+    python src/ingest.py data/Portfoliodata.json data/posts/ --target pinecone
+
+Sources can be portfolio JSON files, Markdown/text files (blog posts, project READMEs)
+or directories of them. Every stage is a generator, so chunks flow through in batches
+instead of the whole corpus being built up front. Embedding batches run on a bounded
+worker pool with retry/backoff, each embedded batch is upserted as soon as it is ready,
+and the chunk records are written to data/processed_chunks.jsonl on the way through.
+Per-stage throughput is printed at the end.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from Process_document import DATA_DIR, CHUNKS_PATH, read_documents, make_text_splitter, chunk_metadata
+from corpus_context import write_corpus_context
+from index_sync import (
+    MANIFEST_PATH, UPSERT_BATCH_SIZE, chunk_id, load_index_manifest, upsert_batch, delete_stale,
+    metadata_fingerprint,
+)
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "4"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", str(UPSERT_BATCH_SIZE)))
+INGEST_MAX_RETRIES = int(os.getenv("INGEST_MAX_RETRIES", "4"))
+INGEST_BACKOFF = float(os.getenv("INGEST_BACKOFF", "1.0"))
+SOURCE_EXTENSIONS = (".json", ".md", ".markdown", ".txt")
+DEFAULT_SOURCES = [os.path.join(DATA_DIR, "Portfoliodata.json")]
+
+class StageMeter:
+    """Items and wall time per generator stage (a stage's time excludes its upstream stages)."""
+
+    def __init__(self):
+        self.stages = OrderedDict()
+
+    def meter(self, name: str, iterable, count=lambda item: 1):
+        # Registered here rather than in the generator so stages are listed in pipeline order
+        stats = self.stages.setdefault(name, {"items": 0, "seconds": 0.0})
+        return self._timed(stats, iter(iterable), count)
+
+    def _timed(self, stats: dict, iterator, count):
+        while True:
+            started = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                stats["seconds"] += time.perf_counter() - started
+                return
+            stats["seconds"] += time.perf_counter() - started
+            stats["items"] += count(item)
+            yield item
+
+    def report(self):
+        """[(stage, items, own seconds, items/s)] in pipeline order."""
+        rows, upstream = [], 0.0
+        for name, stats in self.stages.items():
+            own = max(stats["seconds"] - upstream, 1e-9)
+            upstream = stats["seconds"]
+            rows.append((name, stats["items"], own, stats["items"] / own))
+        return rows
+
+    def print_report(self):
+        for name, items, seconds, rate in self.report():
+            print(f"  {name:<8} {items:>6} items  {seconds * 1000:>9.1f} ms  {rate:>10.1f} items/s")
+
+def iter_source_files(paths):
+    """Source files in the given paths (directories are walked in sorted order)."""
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith(SOURCE_EXTENSIONS):
+                        yield os.path.join(root, name)
+        elif os.path.exists(path):
+            yield path
+        else:
+            print(f"⚠️ Source '{path}' not found, skipping")
+
+def render_documents(files):
+    for path in files:
+        for doc in read_documents(path):
+            yield dict(doc, source=path)
+
+def split_chunks(documents, splitter=None):
+    """
+    Chunk records with stable IDs; every chunk of a document inherits its metadata.
+    Identical chunks from different sources are kept once.
+    """
+    splitter = splitter or make_text_splitter()
+    seen = set()
+    for doc in documents:
+        for text in splitter.split_text(doc["text"]):
+            cid = chunk_id(text)
+            if cid in seen:
+                continue
+            seen.add(cid)
+            yield {"id": cid, **chunk_metadata(doc), "text": text}
+
+def tee_jsonl(records, path: str = CHUNKS_PATH):
+    """
+    Pass records through while writing them as JSON Lines. The file is replaced atomically
+    at the end, and left alone if no records came through or the pipeline failed.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    written = 0
+    try:
+        with open(tmp_path, "w") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+                written += 1
+                yield record
+        if written:
+            os.replace(tmp_path, path)
+    finally:
+        # Empty, failed or abandoned runs (the pipeline raised) leave no temp file behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def skip_indexed(records, manifest: dict, seen: set):
+    """
+    Drop chunks the manifest says are already indexed with the same metadata; every ID
+    passing through is added to `seen`.
+    """
+    for record in records:
+        seen.add(record["id"])
+        if manifest["ids"].get(record["id"]) != metadata_fingerprint(chunk_metadata(record)):
+            yield record
+
+def batched(items, size: int):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def embed_with_retry(embeddings, texts, max_retries: int = INGEST_MAX_RETRIES, backoff: float = INGEST_BACKOFF):
+    """embed_documents with exponential backoff and jitter on failure."""
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"⚠️ Embedding batch of {len(texts)} failed ({e}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+def upsert_batches(index, manifest: dict, embedded, manifest_path: str = MANIFEST_PATH):
+    """Upsert each embedded batch as soon as it is ready; yields the batch size."""
+    for batch, vectors in embedded:
+        upsert_batch(index, manifest, [r["id"] for r in batch], [r["text"] for r in batch], vectors, manifest_path,
+                     metadatas=[chunk_metadata(r) for r in batch])
+        yield len(batch)
+
+def embed_batches(batches, embeddings, workers: int = INGEST_WORKERS, max_retries: int = INGEST_MAX_RETRIES):
+    """
+    Yield (batch, vectors) in input order, embedding up to `workers` batches concurrently.
+    At most 2 x workers batches are in flight, so a large corpus is never read ahead in full.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="embed") as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append((batch, pool.submit(embed_with_retry, embeddings, [r["text"] for r in batch], max_retries)))
+            if len(pending) >= workers * 2:
+                done, future = pending.popleft()
+                yield done, future.result()
+        while pending:
+            done, future = pending.popleft()
+            yield done, future.result()
+
+def chunk_stream(sources, meter: StageMeter, chunks_path: str = CHUNKS_PATH):
+    """load -> render -> split -> JSONL stages shared by every target."""
+    files = meter.meter("load", iter_source_files(sources))
+    documents = meter.meter("render", render_documents(files))
+    chunks = meter.meter("split", split_chunks(documents))
+    return tee_jsonl(chunks, chunks_path)
+
+def write_chunks(sources=DEFAULT_SOURCES, chunks_path: str = CHUNKS_PATH) -> dict:
+    """Chunk the sources into `chunks_path` without embedding them."""
+    meter = StageMeter()
+    count = sum(1 for _ in chunk_stream(sources, meter, chunks_path))
+    if count:
+        print(f"Successfully saved {count} chunks to '{chunks_path}'")
+    else:
+        print(f"Error: no chunks were produced from the given sources, '{chunks_path}' left unchanged.")
+    meter.print_report()
+    return {"chunks": count, "stages": meter.report()}
+
+def ingest_to_index(index, index_name: str, embeddings, sources=DEFAULT_SOURCES,
+                    workers: int = INGEST_WORKERS, batch_size: int = INGEST_BATCH_SIZE,
+                    chunks_path: str = CHUNKS_PATH, manifest_path: str = MANIFEST_PATH) -> dict:
+    """
+    Stream the sources into a Pinecone-style index. Chunks already recorded in the manifest
+    are skipped; indexed chunks that no longer appear in the sources are deleted at the end.
+    """
+    meter = StageMeter()
+    manifest = load_index_manifest(index_name, manifest_path)
+    seen = set()
+    new_chunks = skip_indexed(chunk_stream(sources, meter, chunks_path), manifest, seen)
+    embedded = meter.meter("embed", embed_batches(batched(new_chunks, batch_size), embeddings, workers),
+                           count=lambda item: len(item[0]))
+
+    upserted = sum(meter.meter("upsert", upsert_batches(index, manifest, embedded, manifest_path),
+                               count=lambda n: n))
+
+    # An empty run (e.g. a mistyped source path) must not wipe the index
+    deleted = delete_stale(index, manifest, seen, manifest_path) if seen else 0
+    print(f"Ingested {len(seen)} chunks: {upserted} upserted, {deleted} deleted, "
+          f"{len(seen) - upserted} unchanged.")
+    meter.print_report()
+    return {"chunks": len(seen), "upserted": upserted, "deleted": deleted,
+            "total": len(manifest["ids"]), "stages": meter.report()}
+
+def embed_corpus(embeddings, sources=DEFAULT_SOURCES, workers: int = INGEST_WORKERS,
+                 batch_size: int = INGEST_BATCH_SIZE, chunks_path: str = CHUNKS_PATH):
+    """(texts, vectors, metadatas) for every chunk in the sources, e.g. to build the local index."""
+    meter = StageMeter()
+    texts, vectors, metadatas = [], [], []
+    batches = batched(chunk_stream(sources, meter, chunks_path), batch_size)
+    for batch, batch_vectors in meter.meter("embed", embed_batches(batches, embeddings, workers),
+                                            count=lambda item: len(item[0])):
+        texts.extend(r["text"] for r in batch)
+        metadatas.extend(chunk_metadata(r) for r in batch)
+        vectors.extend(batch_vectors)
+    meter.print_report()
+    return texts, vectors, metadatas
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingest portfolio sources into the vector store.")
+    parser.add_argument("sources", nargs="*", default=DEFAULT_SOURCES,
+                        help="Portfolio JSON / Markdown / text files or directories")
+    parser.add_argument("--target", choices=["pinecone", "local", "jsonl"], default="pinecone",
+                        help="Where to write: Pinecone, the in-process index, or only processed_chunks.jsonl")
+    parser.add_argument("--rebuild", action="store_true", help="Delete and recreate the Pinecone index instead of syncing")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS, help="Concurrent embedding batches")
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE, help="Chunks per embedding/upsert batch")
+    args = parser.parse_args(argv)
+
+    if args.target == "jsonl":
+        write_chunks(args.sources)
+        write_corpus_context()
+        return
+
+    # Imported lazily so the jsonl target doesn't need the Pinecone / Gemini clients
+    from vector_store_setup import setup_vector_store, build_local_index
+    if args.target == "local":
+        build_local_index(sources=args.sources, workers=args.workers, batch_size=args.batch_size)
+    else:
+        setup_vector_store(rebuild=args.rebuild, sources=args.sources, workers=args.workers,
+                           batch_size=args.batch_size)
+    # Decide between the corpus-in-context and retrieval modes for the chunks just written
+    write_corpus_context()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
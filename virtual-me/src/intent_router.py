@@ -0,0 +1,171 @@
+"""
+Cheap intent routing in front of the tool-calling loop.
+
+Static portfolio questions ("what databases does he know?") don't need the model to
+decide to call retrieve_context: a keyword classifier (no LLM call) picks the intent,
+the matching pre-grouped Portfoliodata.json sections become the context, and a single
+generation call answers. Scheduling requests and questions that match no intent fall
+through to the full think -> tools -> think loop. So do messages that carry an email
+address or a date/time (a visitor answering the meeting flow), and every turn after the
+conversation has used the calendar tools.
+"""
+import os
+import re
+import json
+import time
+import threading
+from collections import defaultdict
+from Process_document import DATA_DIR, build_documents
+from structured_logging import get_logger
+
+log = get_logger("intent_router")
+
+INTENT_ROUTING = os.getenv("INTENT_ROUTING", "1").lower() not in ("0", "false", "no")
+PORTFOLIO_PATH = os.path.join(DATA_DIR, "Portfoliodata.json")
+
+# Intents answered from static sections, and the document sections each one uses
+STATIC_INTENTS = {
+    "experience": ["experience"],
+    "skills": ["skills"],
+    "projects": ["project"],
+    "education": ["education"],
+    "profile": ["profile"],
+}
+MAX_COMBINED_INTENTS = 2
+# Reply the routed answer call gives when the static sections aren't enough
+NEEDS_RETRIEVAL = "NEEDS_RETRIEVAL"
+
+SCHEDULING_KEYWORDS = {
+    "meet", "meeting", "meetings", "schedule", "scheduling", "calendar", "availability", "available",
+    "book", "booking", "slot", "slots", "appointment", "interview", "call", "tomorrow", "today",
+}
+# Calendar tool calls earlier in the conversation: later turns continue the scheduling flow
+CALENDAR_TOOLS = {"list_available_slots", "request_meeting_approval"}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_MONTH = r"(?:jan|feb|mar|apr|may|jun|jul|aug|sep|sept|oct|nov|dec)[a-z]*\.?"
+DATE_TIME_RE = re.compile(
+    r"\b\d{1,2}:\d{2}\b"                                      # 10:00
+    r"|\b\d{1,2}\s?(?:am|pm)\b"                               # 10am, 3 pm
+    r"|\b\d{4}-\d{2}-\d{2}\b"                                 # 2026-02-12
+    rf"|\b{_MONTH}\s+\d{{1,2}}(?:st|nd|rd|th)?\b"              # Feb 12 (not "May 2021")
+    rf"|\b\d{{1,2}}(?:st|nd|rd|th)?\s+(?:of\s+)?{_MONTH}(?!\w)"  # 12th of February
+    r"|\b(?:mon|tues|wednes|thurs|fri|satur|sun)day\b",
+    re.IGNORECASE,
+)
+
+def in_scheduling_flow(history) -> bool:
+    """True if earlier messages called (or hold results of) the calendar tools."""
+    for message in history:
+        if getattr(message, "name", None) in CALENDAR_TOOLS:
+            return True
+        if any(call.get("name") in CALENDAR_TOOLS for call in getattr(message, "tool_calls", None) or []):
+            return True
+    return False
+
+INTENT_KEYWORDS = {
+    "experience": {"experience", "work", "worked", "working", "job", "jobs", "role", "roles", "company",
+                   "companies", "employer", "career", "position", "founding", "intern", "internship", "research"},
+    "skills": {"skill", "skills", "stack", "language", "languages", "framework", "frameworks", "know",
+               "knows", "proficient", "tools", "technologies", "technology", "tech", "expertise"},
+    "projects": {"project", "projects", "built", "build", "portfolio", "app", "application", "system"},
+    "education": {"degree", "study", "studied", "university", "masters", "master", "bachelor", "bachelors",
+                  "education", "college", "school", "graduate", "graduated", "qualification"},
+    "profile": {"who", "bio", "background", "contact", "email", "linkedin", "github", "location", "based",
+                "strengths", "values", "personality", "leadership", "motivation", "goals", "philosophy"},
+}
+
+def _terms(text: str):
+    return set(re.findall(r"[a-z0-9][a-z0-9+#.]*", text.lower()))
+
+class IntentRouter:
+    """Keyword classifier plus the per-intent context blocks it routes to."""
+
+    def __init__(self, portfolio_data: dict):
+        self.keywords = {intent: set(words) for intent, words in INTENT_KEYWORDS.items()}
+        self.phrases = defaultdict(set)
+
+        # Vocabulary from the portfolio itself: skill names and employer names
+        for skills in portfolio_data.get("skills", {}).values():
+            for skill in skills:
+                if len(skill) > 1:
+                    self.phrases["skills"].add(skill.lower())
+        for exp in portfolio_data.get("experience", []):
+            company = re.sub(r"\(.*?\)", "", exp.get("company", "")).strip().lower()
+            if company:
+                self.phrases["experience"].add(company)
+        for proj in portfolio_data.get("projects", []):
+            for tech in proj.get("technologies", []):
+                self.phrases["skills"].add(tech.lower())
+
+        sections = defaultdict(list)
+        for doc in build_documents(portfolio_data):
+            sections[doc["section"]].append(doc["text"])
+        self.context = {
+            intent: "\n\n".join(text for s in section_names for text in sections.get(s, []))
+            for intent, section_names in STATIC_INTENTS.items()
+        }
+
+    @classmethod
+    def load(cls, path: str = PORTFOLIO_PATH):
+        """Router for the portfolio file, or None if it isn't available."""
+        try:
+            with open(path) as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            log.warning("portfolio file not found, intent routing disabled", path=path)
+            return None
+
+    def classify(self, text: str, history=()):
+        """
+        Return (intent, [static intents]) - the list is empty when the tool loop is needed.
+        `history` is the conversation before `text` (message objects).
+        """
+        terms = _terms(text)
+        lowered = f" {text.lower()} "
+        if terms & SCHEDULING_KEYWORDS or EMAIL_RE.search(text) or DATE_TIME_RE.search(text):
+            return "scheduling", []
+        if in_scheduling_flow(history):
+            return "scheduling", []
+
+        scores = {}
+        for intent, words in self.keywords.items():
+            score = len(terms & words)
+            score += sum(1 for p in self.phrases.get(intent, ()) if re.search(rf"(?<![\w]){re.escape(p)}(?![\w])", lowered))
+            if score:
+                scores[intent] = score
+        if not scores:
+            return "general", []
+
+        ranked = sorted(scores, key=lambda i: -scores[i])[:MAX_COMBINED_INTENTS]
+        return ranked[0], ranked
+
+    def context_for(self, intents) -> str:
+        return "\n\n".join(self.context[i] for i in intents if self.context.get(i))
+
+class RoutingMetrics:
+    """Per-intent turn latency and LLM-call counts."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._turns = defaultdict(lambda: {"turns": 0, "latency_total": 0.0, "llm_calls": 0})
+
+    def record(self, intent: str, started_at: float, llm_calls: int):
+        if not started_at:
+            return
+        with self._lock:
+            item = self._turns[intent or "unknown"]
+            item["turns"] += 1
+            item["latency_total"] += time.perf_counter() - started_at
+            item["llm_calls"] += llm_calls
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                intent: {
+                    "turns": item["turns"],
+                    "avg_latency_ms": round(item["latency_total"] / item["turns"] * 1000, 1),
+                    "avg_llm_calls": round(item["llm_calls"] / item["turns"], 2),
+                }
+                for intent, item in self._turns.items()
+            }
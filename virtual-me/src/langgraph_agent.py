@@ -1,73 +1,225 @@
 import os
-from typing import TypedDict, Annotated, List
+import time
+import threading
+from typing import TypedDict, Annotated, List, Optional
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
-from langchain_google_genai import ChatGoogleGenerativeAI, GoogleGenerativeAIEmbeddings
-from langchain_pinecone import PineconeVectorStore
-from langchain_core.tools import tool
-from langgraph.prebuilt import ToolNode
+from local_index import LocalVectorIndex, LOCAL_INDEX_DIR
+from hybrid_retriever import HybridRetriever, RETRIEVAL_MODE, load_corpus, metadata_filter
+from reduced_embeddings import gemini_embeddings
+from index_sync import corpus_version
+from response_cache import ResponseCache, CachedAgent, PrecomputedAnswers, RESPONSE_CACHE_ENABLED
+from conversation_memory import ConversationMemory, LLMSummarizer, MEMORY_SUMMARIZE
+from intent_router import IntentRouter, RoutingMetrics, INTENT_ROUTING, NEEDS_RETRIEVAL
+from corpus_context import load_corpus_context
+from metrics import registry, ERRORS
+from concurrency import memoized
+from resilience import gemini, retrieval, is_unavailable
+from session_store import get_session_store, graph_checkpointer
+from structured_logging import get_logger
+from tool_executor import ParallelToolExecutor, speculation, SPECULATIVE_RETRIEVAL
+from langchain_core.tools import StructuredTool
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import merge_configs
+from langchain_core.callbacks import BaseCallbackHandler
 
 # Import updated calendar tools
 from google_calender_tools import list_available_slots, request_meeting_approval
 
+log = get_logger("agent")
+
+# Retrieval backend: "pinecone" (default) or "local" (in-process NumPy index)
+RETRIEVER_BACKEND = os.getenv("RETRIEVER_BACKEND", "pinecone").lower()
+
+# Results returned for a metadata-filtered search (the narrowed set is denser, so fewer are needed)
+FILTERED_K = 3
+
 # --- LAZY INITIALIZATION ---
 vector_store = None
+embeddings = None
 llm = None
+answer_llm = None
+router = None
 agent = None
+stateless_agent = None  # set by get_agent when sessions are checkpointed (see get_stateless_agent)
+corpus_context = None  # compiled corpus block when the whole portfolio is served from the prompt
+lexical_retriever = None  # fallback when the vector store or Gemini is unavailable (see resilience.py)
+_init_lock = threading.Lock()
+
+# Keeps the prompt under MEMORY_TOKEN_BUDGET as conversations grow
+memory = ConversationMemory()
+
+# Per-intent latency / LLM-call counts for routed turns
+routing_metrics = RoutingMetrics()
+registry.register_collector("conversation_memory", memory.stats)
+registry.register_collector("speculative_retrieval", speculation.stats)
 
 def initialize_components():
-    global vector_store, llm
-    if llm is not None: 
+    # Double-checked: the startup warm-up and an early request may both get here
+    if llm is not None:
         return
+    with _init_lock:
+        if llm is None:
+            _initialize_components()
+
+def _initialize_components():
+    global vector_store, embeddings, llm, answer_llm, router, corpus_context, system_prompt
+    # Client libraries are imported here rather than at module load: they account for most
+    # of the import time, and the Pinecone client isn't needed with the local index
+    from langchain_google_genai import ChatGoogleGenerativeAI
     
     google_api_key = os.getenv("GOOGLE_API_KEY")
     
-    # Initialize Embeddings
-    embeddings = GoogleGenerativeAIEmbeddings(
-        model="models/gemini-embedding-001",
-        google_api_key=google_api_key
-    )
+    # Initialize Embeddings (EMBEDDING_DIMENSIONS wide; repeated queries are served from the on-disk cache)
+    embeddings = gemini_embeddings(google_api_key)
     
-    # Initialize Vector Store
-    vector_store = PineconeVectorStore(
-        index_name=os.getenv("PINECONE_INDEX"),
-        embedding=embeddings,
-        pinecone_api_key=os.getenv("PINECONE_API_KEY")
-    )
+    # Small corpus: put all of it in the system prompt instead of retrieving (see corpus_context.py)
+    corpus_context = load_corpus_context()
+    if corpus_context is not None:
+        system_prompt = corpus_system_prompt(corpus_context)
+    else:
+        # Initialize Vector Store (only retrieve_context uses it)
+        if RETRIEVER_BACKEND == "local":
+            vector_store = LocalVectorIndex.load(embeddings, LOCAL_INDEX_DIR)
+            log.info("local vector index loaded", chunks=len(vector_store))
+        else:
+            from langchain_pinecone import PineconeVectorStore
+            vector_store = PineconeVectorStore(
+                index_name=os.getenv("PINECONE_INDEX"),
+                embedding=embeddings,
+                pinecone_api_key=os.getenv("PINECONE_API_KEY")
+            )
+
+        # Add BM25 + reciprocal-rank fusion over the same chunks (RETRIEVAL_MODE=dense disables)
+        if RETRIEVAL_MODE == "hybrid":
+            if isinstance(vector_store, LocalVectorIndex):
+                texts, metadatas = vector_store.texts, vector_store.metadatas
+            else:
+                texts, metadatas = load_corpus()
+            if texts:
+                vector_store = HybridRetriever(vector_store, texts, metadatas=metadatas)
+            else:
+                log.warning("no processed chunks for lexical search, using dense retrieval only")
 
-    # Bind tools to the LLM (Using the new request_meeting_approval)
-    tools = [retrieve_context, list_available_slots, request_meeting_approval]
-    llm = ChatGoogleGenerativeAI(
+    chat_model = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash",
         google_api_key=google_api_key,
-        temperature=0.7
-    ).bind_tools(tools)
+        temperature=0.7,
+        # Deadlines and retries are resilience.py's: one attempt per call, bounded by the deadline
+        max_retries=1,
+        timeout=gemini.timeout
+    )
+    # Tool-less model for questions the intent router answers from static sections
+    answer_llm = chat_model
+    # With the whole corpus in the prompt a single think call already answers static questions
+    if INTENT_ROUTING and corpus_context is None:
+        router = IntentRouter.load()
+
+    # Optionally fold turns that fall out of the memory window into a rolling summary
+    if MEMORY_SUMMARIZE:
+        memory.summarizer = LLMSummarizer(chat_model)
 
-@tool
-def retrieve_context(query: str) -> str:
+    # Set last: a non-None llm tells initialize_components everything is ready
+    llm = chat_model.bind_tools(agent_tools())
+
+def _format_context(results) -> str:
+    context = "\n\n".join([doc.page_content for doc in results])
+    return f"RETRIEVED CONTEXT:\n{context}"
+
+def _search(query: str, flt: dict):
+    results = vector_store.similarity_search(query, k=FILTERED_K, filter=flt) if flt else []
+    if not results:
+        results = vector_store.similarity_search(query, k=5)
+    return results
+
+async def _asearch(query: str, flt: dict):
+    results = await vector_store.asimilarity_search(query, k=FILTERED_K, filter=flt) if flt else []
+    if not results:
+        # Nothing in the narrowed set (or no filter): search the whole index
+        results = await vector_store.asimilarity_search(query, k=5)
+    return results
+
+def get_lexical_retriever() -> HybridRetriever:
+    """BM25 over the processed chunks: answers without Gemini or the vector store"""
+    global lexical_retriever
+    if lexical_retriever is None:
+        if isinstance(vector_store, HybridRetriever):
+            lexical_retriever = vector_store
+        else:
+            texts, metadatas = load_corpus()
+            lexical_retriever = HybridRetriever(None, texts, metadatas=metadatas)
+    return lexical_retriever
+
+def _lexical_search(query: str, flt: dict, error: Exception):
+    ERRORS.inc(component="retrieve_context")
+    log.warning("retrieval degraded to lexical search", backend=RETRIEVER_BACKEND, error=str(error))
+    retriever = get_lexical_retriever()
+    return (retriever.lexical_search(query, k=FILTERED_K, filter=flt) if flt else []) or retriever.lexical_search(query, k=5)
+
+def _retrieve_context(query: str, section: Optional[str] = None, technology: Optional[str] = None) -> str:
     """Retrieve relevant information about Rishab's portfolio, experience, skills, and projects.
     Use this tool to answer questions about work history, tech stack, and achievements.
+    Optionally narrow the search: section is one of "experience", "project", "skills",
+    "education" or "profile"; technology is a tool or language name (e.g. "React").
     """
     initialize_components()
+    log.debug("retrieve_context", backend=RETRIEVER_BACKEND, query=query, section=section, technology=technology)
+    flt = metadata_filter(section, technology)
     try:
-        print(f"DEBUG: Searching Pinecone for: {query}")
-        results = vector_store.similarity_search(query, k=5)
-        context = "\n\n".join([doc.page_content for doc in results])
-        return f"RETRIEVED CONTEXT:\n{context}"
+        results = retrieval.call_sync(lambda: _search(query, flt))
+    except Exception as e:
+        # Vector store / embeddings down, too slow or circuit open: BM25 over the local chunks
+        results = _lexical_search(query, flt, e)
+    return _format_context(results)
+
+async def _aretrieve(query: str, section: Optional[str], technology: Optional[str]) -> str:
+    flt = metadata_filter(section, technology)
+    try:
+        results = await retrieval.call(lambda: _asearch(query, flt))
     except Exception as e:
-        print(f"DEBUG ERROR: {str(e)}")
-        return f"Error retrieving context: {str(e)}"
+        results = _lexical_search(query, flt, e)
+    return _format_context(results)
+
+async def _aretrieve_context(query: str, section: Optional[str] = None, technology: Optional[str] = None) -> str:
+    """Async variant used by the graph's async path so the search doesn't block the event loop."""
+    initialize_components()
+    log.debug("retrieve_context", backend=RETRIEVER_BACKEND, query=query, section=section, technology=technology)
+    # Questions in one batch (batch.py) that search for the same thing share the search
+    return await memoized(("retrieval", query, section, technology),
+                          lambda: _aretrieve(query, section, technology))
+
+retrieve_context = StructuredTool.from_function(
+    func=_retrieve_context,
+    coroutine=_aretrieve_context,
+    name="retrieve_context",
+)
+
+def agent_tools() -> list:
+    """Tools the model can call: no retrieval when the corpus is already in the prompt"""
+    if corpus_context is not None:
+        return [list_available_slots, request_meeting_approval]
+    return [retrieve_context, list_available_slots, request_meeting_approval]
+
+def count_llm_calls(total: int, calls: Optional[int]) -> int:
+    """Reducer for llm_calls: adds up the turn's calls; None (route_node, at the start of a turn) resets it"""
+    return 0 if calls is None else total + calls
 
 class AgentState(TypedDict):
     messages: Annotated[List[BaseMessage], add_messages]
     user_query: str
     retrieved_context: str
+    intent: str  # "experience", "skills", "projects", "education", "profile", "scheduling", "general"
+    routed_intents: List[str]
+    llm_calls: Annotated[int, count_llm_calls]
+    turn_started: float
+    speculation_id: str  # retrieval started alongside the first think call (SPECULATIVE_RETRIEVAL=1)
+    degraded: bool  # answered without the LLM (never cached)
     thinking: str
     response: str
 
 # --- REFINED SYSTEM PROMPT ---
-SYSTEM_PROMPT = """You are Rishab Chouhan's AI assistant. Your role is to help visitors learn about Rishab's background and coordinate meeting requests.
+SYSTEM_PROMPT_TEMPLATE = """You are Rishab Chouhan's AI assistant. Your role is to help visitors learn about Rishab's background and coordinate meeting requests.
 
 ABOUT RISHAB:
 - Full-Stack Software Engineer with 2+ years experience based in Sydney, Australia.
@@ -77,32 +229,197 @@ ABOUT RISHAB:
 MEETING SCHEDULING PROTOCOL:
 When a user wants to schedule a meeting, you must follow these steps:
 1. **Gather Info**: Ask for their email address and a brief reason (context) for the meeting if they haven't provided it.
-2. **Check Availability**: Use `list_available_slots` with a date (format: YYYY-MM-DD).
+2. **Check Availability**: Use `list_available_slots` with a date (format: YYYY-MM-DD). To check several days, pass `end_date_str` once instead of calling it per date.
 3. **Send Request**: Once a time is chosen, use `request_meeting_approval`. 
    - You MUST pass the `meeting_context` which summarizes the visitor's goal.
 4. **Manage Expectations**: Inform the user that a "Tentative Request" has been added to Rishab's calendar. Explain that he will review the context and finalize the booking by accepting it.
 
 IMPORTANT GUIDELINES:
-- ALWAYS use `retrieve_context` when asked about Rishab's skills, experience, or projects.
+{portfolio_guideline}
 - Be professional, technical, and friendly.
 - If a tool fails, explain the error clearly and offer to try a different date or provide contact info.
 """
 
-def think_node(state: AgentState) -> dict:
+RETRIEVAL_GUIDELINE = """- ALWAYS use `retrieve_context` when asked about Rishab's skills, experience, or projects.
+  Pass `section` and/or `technology` when the question is clearly about one (e.g. "projects using React" -> section="project", technology="React")."""
+
+CORPUS_GUIDELINE = """- Answer questions about Rishab's skills, experience, or projects from the PORTFOLIO below; it is his complete portfolio.
+  If it doesn't cover something, say so instead of guessing."""
+
+SYSTEM_PROMPT = SYSTEM_PROMPT_TEMPLATE.format(portfolio_guideline=RETRIEVAL_GUIDELINE)
+
+# Static, versioned block after the instructions: identical bytes on every request, so the
+# provider can reuse the cached prefix
+CORPUS_CONTEXT_PROMPT = """PORTFOLIO (corpus version {version}):
+{context}"""
+
+def corpus_system_prompt(compiled: dict) -> str:
+    return "\n".join([
+        SYSTEM_PROMPT_TEMPLATE.format(portfolio_guideline=CORPUS_GUIDELINE),
+        CORPUS_CONTEXT_PROMPT.format(version=compiled["version"], context=compiled["context"]),
+    ])
+
+# SYSTEM_PROMPT, or the corpus-in-context variant chosen by initialize_components
+system_prompt = SYSTEM_PROMPT
+
+# Appended to the system prompt when the router answers without tools
+ROUTED_ANSWER_PROMPT = """PORTFOLIO CONTEXT ({intents}):
+{context}
+
+Answer the visitor's latest message using only the portfolio context above. Do not mention tools.
+If the context does not contain the answer, reply with exactly: {fallback}"""
+
+def prompt_messages(messages, extra_system: str = None) -> list:
+    """Messages for one LLM call: budgeted history with the system prompt (plus any rolling summary) first"""
+    messages = memory.compact(messages)
+    extra = [m.content for m in messages if isinstance(m, SystemMessage) and m.content != system_prompt]
+    if extra_system:
+        extra.append(extra_system)
+    rest = [m for m in messages if not isinstance(m, SystemMessage)]
+    return [SystemMessage(content="\n\n".join([system_prompt] + extra))] + rest
+
+def route_node(state: AgentState) -> dict:
+    """Classify the latest question without an LLM call"""
+    initialize_components()
+    
+    # Per-turn fields start over (a checkpointed session thread still holds the last turn's)
+    turn = {"llm_calls": None, "degraded": False, "speculation_id": "", "turn_started": time.perf_counter()}
+    if router is None:
+        return {**turn, "intent": "general", "routed_intents": []}
+    
+    last_message = state["messages"][-1]
+    text = last_message.content if isinstance(last_message.content, str) else ""
+    intent, static_intents = router.classify(text, state["messages"][:-1])
+    return {**turn, "intent": intent, "routed_intents": static_intents}
+
+def route_after_classify(state: AgentState) -> str:
+    return "answer" if state.get("routed_intents") else "think"
+
+def _routed_answer_prompt(state: AgentState) -> list:
+    intents = state["routed_intents"]
+    extra = ROUTED_ANSWER_PROMPT.format(
+        intents=", ".join(intents), context=router.context_for(intents), fallback=NEEDS_RETRIEVAL
+    )
+    return prompt_messages(state["messages"], extra_system=extra)
+
+def _routed_answer_result(ai_response) -> dict:
+    content = ai_response.content if isinstance(ai_response.content, str) else ""
+    if content.strip() == NEEDS_RETRIEVAL:
+        # Static sections weren't enough: fall back to the tool loop
+        return {"routed_intents": [], "llm_calls": 1, "thinking": "Routing fell back to retrieval..."}
+    return {"messages": [ai_response], "llm_calls": 1, "thinking": "Answered from portfolio sections"}
+
+# Turn results when Gemini is down, too slow or its circuit is open (see resilience.py)
+DEGRADED_NOTICE = "I can't reach my language model right now, so here is the relevant part of Rishab's portfolio as written:"
+DEGRADED_UNAVAILABLE = "I can't reach my language model right now. Please try again in a minute."
+
+class _StreamWatch(BaseCallbackHandler):
+    """Notices the first token an LLM call streams (astream_events turns forward it to the client)."""
+
+    run_inline = True
+
+    def __init__(self):
+        self.streamed = False
+
+    def on_llm_new_token(self, token, **kwargs):
+        self.streamed = True
+
+async def _allm_call(model, messages, config: RunnableConfig):
+    """model.ainvoke under the gemini policy; not retried or hedged once tokens have reached the client"""
+    watch = _StreamWatch()
+    config = merge_configs(config, {"callbacks": [watch]})
+    return await gemini.call(lambda: model.ainvoke(messages, config), can_repeat=lambda: not watch.streamed)
+
+def degraded_reply(state: AgentState, error: Exception, context: str = None) -> dict:
+    """
+    Answer without generation: `context`, or the chunks a lexical search finds for the question.
+    Only for resilience.is_unavailable errors; callers re-raise anything else.
+    """
+    ERRORS.inc(component="llm")
+    log.warning("llm unavailable, answering from portfolio text", error=str(error) or type(error).__name__)
+    if context is None:
+        question = next((m.content for m in reversed(state["messages"])
+                         if isinstance(m, HumanMessage) and isinstance(m.content, str)), "")
+        docs = get_lexical_retriever().lexical_search(question, k=2) if question.strip() else []
+        context = "\n\n".join(d.page_content for d in docs)
+    content = f"{DEGRADED_NOTICE}\n\n{context}" if context else DEGRADED_UNAVAILABLE
+    return {"messages": [AIMessage(content=content)], "llm_calls": 1, "degraded": True,
+            "thinking": "Language model unavailable, answered from portfolio text"}
+
+def answer_node(state: AgentState, config: RunnableConfig) -> dict:
+    """Single generation call over the routed intent's portfolio sections (no tools)"""
+    try:
+        ai_response = gemini.call_sync(lambda: answer_llm.invoke(_routed_answer_prompt(state), config))
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        return degraded_reply(state, e, router.context_for(state["routed_intents"]))
+    return _routed_answer_result(ai_response)
+
+async def aanswer_node(state: AgentState, config: RunnableConfig) -> dict:
+    try:
+        ai_response = await _allm_call(answer_llm, _routed_answer_prompt(state), config)
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        return degraded_reply(state, e, router.context_for(state["routed_intents"]))
+    return _routed_answer_result(ai_response)
+
+def route_after_answer(state: AgentState) -> str:
+    return "respond" if state.get("routed_intents") else "think"
+
+def think_node(state: AgentState, config: RunnableConfig) -> dict:
     """Main reasoning node - decides what to do next"""
     initialize_components()
     
-    messages = state["messages"]
+    # Trim history to the token budget and add the system prompt
+    messages = prompt_messages(state["messages"])
+    
+    # Invoke LLM (passing config lets streaming callbacks see partial tokens)
+    try:
+        ai_response = gemini.call_sync(lambda: llm.invoke(messages, config))
+    except Exception as e:
+        if not is_unavailable(e):
+            raise
+        return degraded_reply(state, e)
     
-    # Add system message if not present
-    if not any(isinstance(m, SystemMessage) for m in messages):
-        messages = [SystemMessage(content=SYSTEM_PROMPT)] + list(messages)
+    return {
+        "messages": [ai_response],
+        "llm_calls": 1,
+        "thinking": "Analyzing request..."
+    }
+
+async def athink_node(state: AgentState, config: RunnableConfig) -> dict:
+    """Async reasoning node - same as think_node but awaits the LLM instead of blocking"""
+    initialize_components()
+    
+    messages = prompt_messages(state["messages"])
+    
+    # Search for the raw question while the model decides whether it needs to
+    speculation_id = ""
+    last_message = state["messages"][-1]
+    if SPECULATIVE_RETRIEVAL and corpus_context is None and isinstance(last_message, HumanMessage) and isinstance(last_message.content, str):
+        speculation_id = speculation.start(_aretrieve_context(last_message.content), last_message.content)
     
-    # Invoke LLM
-    ai_response = llm.invoke(messages)
+    try:
+        ai_response = await _allm_call(llm, messages, config)
+    except Exception as e:
+        speculation.discard(speculation_id)
+        if not is_unavailable(e):
+            raise
+        return degraded_reply(state, e)
+    except BaseException:
+        speculation.discard(speculation_id)
+        raise
+    
+    if speculation_id and not any(call["name"] == "retrieve_context" for call in ai_response.tool_calls):
+        speculation.discard(speculation_id)
+        speculation_id = ""
     
     return {
         "messages": [ai_response],
+        "llm_calls": 1,
+        "speculation_id": speculation_id,
         "thinking": "Analyzing request..."
     }
 
@@ -117,6 +434,8 @@ def response_node(state: AgentState) -> dict:
     if any(keyword in response_text.lower() for keyword in ['meeting', 'schedule', 'calendar', 'available']):
         response_text += "\n\n[TRIGGER:MEETING_FLOW]"
     
+    routing_metrics.record(state.get("intent"), state.get("turn_started"), state.get("llm_calls", 0))
+    
     return {
         "response": response_text,
         "thinking": "Response generated"
@@ -132,20 +451,24 @@ def should_continue(state: AgentState) -> str:
     
     return "respond"
 
-def build_agent_graph():
-    """Build the LangGraph workflow"""
+def build_agent_graph(checkpointer=None):
+    """Build the LangGraph workflow (with a checkpointer, runs need a thread_id: the session ID)"""
     workflow = StateGraph(AgentState)
     
-    # Add nodes
-    workflow.add_node("think", think_node)
+    # Add nodes (sync invoke uses think_node, ainvoke/astream use athink_node)
+    workflow.add_node("route", route_node)
+    workflow.add_node("answer", RunnableLambda(answer_node, afunc=aanswer_node, name="answer"))
+    workflow.add_node("think", RunnableLambda(think_node, afunc=athink_node, name="think"))
     workflow.add_node("respond", response_node)
-    workflow.add_node(
-        "tools", 
-        ToolNode([retrieve_context, list_available_slots, request_meeting_approval])
-    )
+    # All tool calls of one LLM response run concurrently, each with its own timeout
+    # (the sync calendar tools are offloaded to threads by BaseTool.ainvoke)
+    tools = ParallelToolExecutor(agent_tools())
+    workflow.add_node("tools", RunnableLambda(tools.invoke, afunc=tools.ainvoke, name="tools"))
     
-    # Set entry point
-    workflow.set_entry_point("think")
+    # Set entry point: static questions skip the tool loop
+    workflow.set_entry_point("route")
+    workflow.add_conditional_edges("route", route_after_classify, {"answer": "answer", "think": "think"})
+    workflow.add_conditional_edges("answer", route_after_answer, {"respond": "respond", "think": "think"})
     
     # Add conditional edges
     workflow.add_conditional_edges(
@@ -161,15 +484,51 @@ def build_agent_graph():
     workflow.add_edge("tools", "think")
     workflow.add_edge("respond", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
+
+async def compact_history(messages) -> list:
+    """History to keep between turns (old tool output stubbed, oldest turns evicted/summarised)"""
+    return await memory.atrim_history(messages)
+
+def get_embeddings():
+    initialize_components()
+    return embeddings
+
+def get_corpus_version() -> str:
+    """Version of the corpus the retriever currently serves (used to invalidate cached answers)."""
+    if corpus_context is not None:
+        return corpus_context["version"]
+    if RETRIEVER_BACKEND == "local" and vector_store is not None:
+        return vector_store.version
+    return corpus_version()
 
 def get_agent():
-    """Get or create the agent instance"""
-    global agent
+    """
+    Get or create the agent instance, wrapped so fresh questions are answered from the
+    batch job's precomputed answers and the response cache (unless RESPONSE_CACHE=0)
+    """
+    global agent, stateless_agent
     if agent is None:
-        agent = build_agent_graph()
+        # The tool set depends on the corpus mode, so components come first
+        initialize_components()
+        checkpointer = graph_checkpointer()
+        graph = build_agent_graph(checkpointer)
+        if checkpointer is not None:
+            get_session_store().bind(graph)
+        cache = None
+        if RESPONSE_CACHE_ENABLED:
+            cache = ResponseCache(get_embeddings=get_embeddings, version_fn=get_corpus_version)
+        precomputed = PrecomputedAnswers(version_fn=get_corpus_version)
+        # Batch questions belong to no session, so they need a graph without a checkpointer
+        stateless_agent = CachedAgent(build_agent_graph(), cache, precomputed) if checkpointer is not None else None
+        agent = CachedAgent(graph, cache, precomputed)
     return agent
 
+def get_stateless_agent():
+    """get_agent() for runs outside any session (no thread_id), sharing its caches"""
+    served = get_agent()
+    return stateless_agent or served
+
 # For direct script debugging
 if __name__ == "__main__":
     from dotenv import load_dotenv
@@ -0,0 +1,188 @@
+"""
+In-process vector index over pre-computed chunk embeddings.
+
+The whole portfolio corpus is small enough to keep as one contiguous float32 matrix,
+so retrieval is a single matrix-vector product instead of a Pinecone round trip.
+Build it with `python src/vector_store_setup.py --local`.
+
+LOCAL_INDEX_QUANTIZATION=float16|int8 also stores a compact copy of the matrix (int8 with
+one float32 scale per row) and searches that instead. The top k * LOCAL_INDEX_RESCORE
+candidates are then re-scored exactly against the float32 matrix, which stays on disk
+memory-mapped, so only the candidates' rows are ever read from it.
+"""
+import os
+import json
+import numpy as np
+from langchain_core.documents import Document
+from index_sync import chunk_id, ids_version, metadata_matches
+from Process_document import DATA_DIR
+
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(DATA_DIR, "local_index"))
+EMBEDDINGS_FILE = "embeddings.npy"
+META_FILE = "index.json"
+SCALES_FILE = "scales.npy"
+# "float32" (no compact copy) | "float16" | "int8"
+LOCAL_INDEX_QUANTIZATION = os.getenv("LOCAL_INDEX_QUANTIZATION", "float32").lower()
+# Candidates re-scored exactly per result wanted (quantized indexes only)
+LOCAL_INDEX_RESCORE = int(os.getenv("LOCAL_INDEX_RESCORE", "4"))
+QUANTIZATIONS = ("float32", "float16", "int8")
+SEARCH_BLOCK_ROWS = 4096
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def quantize(matrix: np.ndarray, quantization: str):
+    """(compact matrix, per-row scales or None) for a normalised float32 matrix."""
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+    if quantization == "float16":
+        return matrix.astype(np.float16), None
+    if quantization == "int8":
+        # Symmetric per-row scaling: each row's largest magnitude maps to 127
+        scales = np.abs(matrix).max(axis=1).astype(np.float32) / 127.0
+        scales[scales == 0] = 1.0
+        return np.round(matrix / scales[:, None]).astype(np.int8), scales
+    return matrix, None
+
+def _quantized_file(quantization: str) -> str:
+    return f"embeddings.{quantization}.npy"
+
+def save_local_index(texts, vectors, model: str, index_dir: str = LOCAL_INDEX_DIR, metadatas=None,
+                     quantization: str = LOCAL_INDEX_QUANTIZATION):
+    """
+    Persist L2-normalised embeddings (one row per chunk) plus the chunk texts and metadata,
+    and the quantized search matrix unless `quantization` is float32.
+    """
+    matrix = _normalize(np.asarray(vectors, dtype=np.float32))
+    if matrix.shape[0] != len(texts):
+        raise ValueError(f"Got {matrix.shape[0]} vectors for {len(texts)} texts")
+    compact, scales = quantize(matrix, quantization)
+
+    os.makedirs(index_dir, exist_ok=True)
+    np.save(os.path.join(index_dir, EMBEDDINGS_FILE), np.ascontiguousarray(matrix))
+    if quantization != "float32":
+        np.save(os.path.join(index_dir, _quantized_file(quantization)), np.ascontiguousarray(compact))
+    if scales is not None:
+        np.save(os.path.join(index_dir, SCALES_FILE), scales)
+    with open(os.path.join(index_dir, META_FILE), "w") as f:
+        json.dump({"model": model, "dimension": int(matrix.shape[1]), "quantization": quantization,
+                   "texts": list(texts), "metadatas": list(metadatas or [{} for _ in texts])}, f)
+
+def _top(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first."""
+    k = min(k, len(scores))
+    if k < len(scores):
+        top = np.argpartition(-scores, k - 1)[:k]
+    else:
+        top = np.arange(len(scores))
+    return top[np.argsort(-scores[top])]
+
+class LocalVectorIndex:
+    """
+    Cosine top-k over a normalised embedding matrix. Exposes the same
+    similarity_search/asimilarity_search calls the agent uses on PineconeVectorStore.
+
+    `matrix` is what every search scans (float32, float16 or int8 with per-row `scales`);
+    when it is quantized, `exact` is the float32 matrix used to re-score the candidates.
+    """
+
+    def __init__(self, texts, matrix: np.ndarray, embedding, model: str = None, metadatas=None,
+                 scales: np.ndarray = None, exact: np.ndarray = None, rescore: int = LOCAL_INDEX_RESCORE):
+        self.texts = list(texts)
+        self.metadatas = list(metadatas or [{} for _ in self.texts])
+        self.matrix = matrix
+        self.scales = scales
+        self.exact = exact
+        self.rescore = rescore
+        self.embedding = embedding
+        self.model = model
+        # Corpus version of the indexed chunks (matches index_sync.corpus_version for the same corpus)
+        self.version = ids_version(chunk_id(t) for t in self.texts)
+
+    @classmethod
+    def load(cls, embedding, index_dir: str = LOCAL_INDEX_DIR, mmap: bool = True, quantization: str = None):
+        """
+        Load an index written by save_local_index (memory-mapped by default). `quantization`
+        defaults to what the index was built with; another one is computed at load time.
+        """
+        with open(os.path.join(index_dir, META_FILE)) as f:
+            meta = json.load(f)
+        mmap_mode = "r" if mmap else None
+        exact = np.load(os.path.join(index_dir, EMBEDDINGS_FILE), mmap_mode=mmap_mode)
+        quantization = quantization or meta.get("quantization", "float32")
+        if quantization == "float32":
+            matrix, scales, exact = exact, None, None
+        elif quantization == meta.get("quantization"):
+            matrix = np.load(os.path.join(index_dir, _quantized_file(quantization)), mmap_mode=mmap_mode)
+            scales = np.load(os.path.join(index_dir, SCALES_FILE)) if quantization == "int8" else None
+        else:
+            matrix, scales = quantize(np.asarray(exact), quantization)
+        return cls(meta["texts"], matrix, embedding, model=meta.get("model"), metadatas=meta.get("metadatas"),
+                   scales=scales, exact=exact)
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        """Size of what a search scans (the compact matrix and its scales)."""
+        return int(self.matrix.nbytes + (self.scales.nbytes if self.scales is not None else 0))
+
+    def rows_matching(self, flt: dict):
+        """Row numbers whose metadata passes a Pinecone-style filter."""
+        return np.asarray([i for i, m in enumerate(self.metadatas) if metadata_matches(m, flt)], dtype=np.int64)
+
+    def _query(self, vector) -> np.ndarray:
+        query = np.asarray(vector, dtype=np.float32)
+        dimension = self.matrix.shape[1]
+        if query.shape[-1] < dimension:
+            raise ValueError(f"Query has {query.shape[-1]} dimensions, the index {dimension}")
+        # A full-size query against a reduced index: same truncation as the stored vectors
+        return _normalize(query[:dimension])
+
+    def _scores(self, query: np.ndarray, rows=None) -> np.ndarray:
+        matrix = self.matrix if rows is None else self.matrix[rows]
+        if matrix.dtype != np.float32:
+            # No BLAS kernels for float16/int8: upcast a block of rows at a time so the
+            # float32 copy stays small
+            scores = np.empty(len(matrix), dtype=np.float32)
+            for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+                scores[start:start + SEARCH_BLOCK_ROWS] = matrix[start:start + SEARCH_BLOCK_ROWS].astype(np.float32) @ query
+            if self.scales is not None:
+                scores *= self.scales if rows is None else self.scales[rows]
+            return scores
+        return matrix @ query
+
+    def search_by_vector(self, vector, k: int = 5, filter: dict = None):
+        """Return [(row, score)] for the k most similar chunks (optionally only rows matching `filter`), best first."""
+        if not len(self.texts):
+            return []
+        query = self._query(vector)
+        rows = None
+        if filter:
+            # Score only the narrowed candidate set
+            rows = self.rows_matching(filter)
+            if not len(rows):
+                return []
+        scores = self._scores(query, rows)
+        if self.exact is None:
+            top = _top(scores, k)
+            ids = top if rows is None else rows[top]
+            return [(int(i), float(s)) for i, s in zip(ids, scores[top])]
+        candidates = _top(scores, k * max(1, self.rescore))
+        ids = np.sort(candidates if rows is None else rows[candidates])
+        exact = np.asarray(self.exact[ids], dtype=np.float32) @ query
+        top = _top(exact, k)
+        return [(int(ids[i]), float(exact[i])) for i in top]
+
+    def _documents(self, hits):
+        return [Document(page_content=self.texts[i], metadata={**self.metadatas[i], "score": score}) for i, score in hits]
+
+    def similarity_search(self, query: str, k: int = 5, filter: dict = None):
+        return self._documents(self.search_by_vector(self.embedding.embed_query(query), k, filter))
+
+    async def asimilarity_search(self, query: str, k: int = 5, filter: dict = None):
+        vector = await self.embedding.aembed_query(query)
+        return self._documents(self.search_by_vector(vector, k, filter))
@@ -1,15 +1,21 @@
+import time
+IMPORT_STARTED = time.perf_counter()  # start of the "imports" phase in the startup profile
 import os
 import sys
-import json
+import math
+import asyncio
 from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import List, Optional
 
 # Add src directory to Python path
 src_path = Path(__file__).parent
 if str(src_path) not in sys.path:
     sys.path.insert(0, str(src_path))
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, PlainTextResponse, ORJSONResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from langchain_core.messages import HumanMessage, AIMessage
@@ -18,9 +24,45 @@ from langchain_core.messages import HumanMessage, AIMessage
 load_dotenv()
 
 # Import agent
-from langgraph_agent import get_agent
+from langgraph_agent import get_agent, get_stateless_agent, get_corpus_version, compact_history, memory, routing_metrics
+from batch import BatchRun, BATCH_CONCURRENCY, BATCH_MAX_QUESTIONS
+from streaming import AgentTurnStream, build_message_payload, extract_action, to_sse
+from concurrency import (agent_slot, admission_stats, client_key, rate_limiter, single_flight,
+                         Overloaded, PendingMessages)
+from embedding_cache import get_embedding_cache
+from response_cache import cacheable_query, normalize_query
+from session_store import get_session_store, new_session_id, prune_sessions
+from metrics import registry, render_metrics, timed_turn, TurnTimer
+from structured_logging import get_logger
+from startup import profile
+from resilience import dependency_stats, open_circuits
+from wire import negotiate, receive_frame, message_delta, dumps_json, FrameTooLarge, MESSAGE_TOO_BIG
 
-app = FastAPI(title="Virtual Rishab AI Assistant")
+log = get_logger("main")
+
+# REST responses carry a Server-Timing header with per-node/tool durations (TIMING_HEADERS=0 disables)
+TIMING_HEADERS = os.getenv("TIMING_HEADERS", "1").lower() not in ("0", "false", "no")
+
+def get_agent_safe():
+    """Safely get agent instance with error handling"""
+    try:
+        return get_agent()
+    except Exception:
+        log.exception("agent initialization failed")
+        return None
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the worker up in the background: liveness probes are answered while it runs"""
+    warm_up_task = profile.start(get_agent)
+    prune_task = asyncio.create_task(prune_sessions())
+    yield
+    warm_up_task.cancel()
+    prune_task.cancel()
+
+app = FastAPI(title="Virtual Rishab AI Assistant", lifespan=lifespan, default_response_class=ORJSONResponse)
+profile.started = IMPORT_STARTED
+profile.record("imports", IMPORT_STARTED)
 
 cors_origins = os.getenv("CORS_ORIGINS", "http://localhost:3000,http://localhost:5173,http://localhost:5174").split(",")
 app.add_middleware(
@@ -33,68 +75,213 @@ app.add_middleware(
 
 class ChatRequest(BaseModel):
     message: str
-    history: list = [] 
+    session_id: Optional[str] = None  # Server keeps the history; omit to start a new session
+    history: list = []  # Only used by stateless clients that don't send a session_id
+    deltas: bool = False  # Return the messages this turn added (compact form, see wire.py)
 
 class ChatResponse(BaseModel):
     response: str
     thinking: str
-    history: list
-    action: str = None  # For triggering meeting flow
+    session_id: str
+    action: Optional[str] = None  # For triggering meeting flow
+    messages: Optional[list] = None  # Message delta when the request asked for it
 
-def get_agent_safe():
-    """Safely get agent instance with error handling"""
-    try:
-        return get_agent()
-    except Exception as e:
-        print(f"❌ Error getting agent: {e}")
-        import traceback
-        traceback.print_exc()
-        return None
+class BatchRequest(BaseModel):
+    questions: List[str]
+    concurrency: Optional[int] = None  # At most BATCH_CONCURRENCY
+    fresh: bool = False  # Run every question through the graph, ignoring precomputed/cached answers
+
+async def load_session(session_id: Optional[str], fallback_history: list):
+    """
+    Returns (session_id, history) for a request. An unknown or expired session_id is
+    replaced by a fresh server-issued one: clients can't choose their session IDs.
+    """
+    if session_id:
+        # Store calls block on SQLite (and on other workers' write locks): keep them off the event loop
+        history = await asyncio.to_thread(get_session_store().get, session_id)
+        if history is not None:
+            return session_id, history
+    return new_session_id(), list(fallback_history)
+
+async def save_session(session_id: str, messages: list):
+    """Stores the history (trimmed to the memory budget) for the session's next turn"""
+    history = await compact_history(messages)
+    await asyncio.to_thread(get_session_store().set, session_id, history)
+    return history
+
+def turn_config(session_id: str, timer: TurnTimer) -> dict:
+    """Run config for a session turn: the timer's callbacks, and the session as the graph's checkpoint thread"""
+    return {**timer.config(), "configurable": {"thread_id": session_id}}
+
+def is_enabled(value) -> bool:
+    """Truthy query parameter / message flag ("1", "true", "yes")"""
+    return str(value).lower() in ("1", "true", "yes")
+
+def overload_error(e: Overloaded) -> HTTPException:
+    """429 (rate limited) or 503 (no agent slot) with a Retry-After header"""
+    return HTTPException(status_code=e.status_code, detail=e.reason,
+                         headers={"Retry-After": str(math.ceil(e.retry_after))})
+
+async def run_turn(agent, initial_state: dict, config: dict) -> dict:
+    """One non-streamed agent turn; identical fresh questions in flight together share a single run"""
+    async def invoke():
+        async with agent_slot():
+            return await agent.ainvoke(initial_state, config)
+    query = cacheable_query(initial_state)
+    return await single_flight.run(normalize_query(query) if query else None, invoke)
+
+def _response_cache_stats():
+    response_cache = getattr(get_agent_safe(), "cache", None) if profile.ready else None
+    return response_cache.stats() if response_cache is not None else {}
+
+def _precomputed_answers_stats():
+    precomputed = getattr(get_agent_safe(), "precomputed", None) if profile.ready else None
+    return precomputed.stats() if precomputed is not None else {}
+
+def _embedding_cache_stats():
+    cache = get_embedding_cache()
+    return cache.stats() if cache is not None else {}
+
+registry.register_collector("embedding_cache", _embedding_cache_stats)
+registry.register_collector("response_cache", _response_cache_stats)
+registry.register_collector("precomputed_answers", _precomputed_answers_stats)
+registry.register_collector("sessions", lambda: get_session_store().stats())
+registry.register_collector("admission", admission_stats)
+registry.register_collector("dependencies", dependency_stats)
 
 @app.post("/api/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, response: Response, http_request: Request):
     """REST endpoint for chat"""
+    try:
+        rate_limiter.check(client_key(http_request))
+    except Overloaded as e:
+        raise overload_error(e)
+    await profile.wait()
     agent = get_agent_safe()
     if not agent:
         raise HTTPException(status_code=500, detail="Agent not initialized.")
     
+    session_id, history = await load_session(request.session_id, request.history)
     initial_state = {
-        "messages": request.history + [HumanMessage(content=request.message)],
+        "messages": history + [HumanMessage(content=request.message)],
         "user_query": request.message,
     }
     
+    timer = TurnTimer()
     try:
-        result = agent.invoke(initial_state)
+        with timed_turn("rest"):
+            result = await run_turn(agent, initial_state, turn_config(session_id, timer))
+            await save_session(session_id, result.get("messages", []))
         
         # Check if response triggers meeting flow
-        response_text = result.get("response", "Error")
-        action = None
-        if "[TRIGGER:MEETING_FLOW]" in response_text:
-            action = "suggest_meeting"
-            response_text = response_text.replace("[TRIGGER:MEETING_FLOW]", "").strip()
+        response_text, action = extract_action(result.get("response", "Error"))
+        if TIMING_HEADERS:
+            response.headers["Server-Timing"] = timer.server_timing()
         
         return ChatResponse(
             response=response_text,
             thinking=result.get("thinking", ""),
-            history=result.get("messages", []),
-            action=action
+            session_id=session_id,
+            action=action,
+            messages=message_delta(result.get("messages", []), len(history)) if request.deltas else None
         )
+    except Overloaded as e:
+        raise overload_error(e)
     except Exception as e:
-        print(f"❌ Error in chat endpoint: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("chat endpoint failed", session_id=session_id)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request, timings: str = ""):
+    """
+    Server-Sent-Events variant of /api/chat: tokens and tool activity are pushed as they happen.
+    With ?timings=1 a `timing` event with per-node/tool durations precedes the final message.
+    """
+    try:
+        rate_limiter.check(client_key(http_request))
+    except Overloaded as e:
+        raise overload_error(e)
+    await profile.wait()
+    agent = get_agent_safe()
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized.")
+    
+    session_id, history = await load_session(request.session_id, request.history)
+    initial_state = {
+        "messages": history + [HumanMessage(content=request.message)],
+        "user_query": request.message,
+    }
+    
+    async def event_source():
+        timer = TurnTimer()
+        try:
+            with timed_turn("sse"):
+                async with agent_slot():
+                    turn = AgentTurnStream(agent, initial_state, turn_config(session_id, timer))
+                    async for frame in turn.frames():
+                        if frame["type"] == "message":
+                            await save_session(session_id, (turn.final_state or {}).get("messages", []))
+                            frame["session_id"] = session_id
+                            if is_enabled(timings):
+                                yield to_sse({"type": "timing", **timer.summary()})
+                        yield to_sse(frame)
+        except Overloaded as e:
+            yield to_sse(e.frame())
+        except Exception as e:
+            log.exception("chat stream failed", session_id=session_id)
+            yield to_sse({"type": "error", "error": str(e)})
+    
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/api/chat/batch")
+async def chat_batch(request: BatchRequest, http_request: Request):
+    """
+    Answer independent single-turn questions concurrently (see batch.py). The response is
+    JSON Lines: one answer record per question as it completes, then a summary record.
+    """
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="No questions given.")
+    if len(request.questions) > BATCH_MAX_QUESTIONS:
+        raise HTTPException(status_code=413, detail=f"At most {BATCH_MAX_QUESTIONS} questions per batch.")
+    try:
+        # Each distinct question costs a token (up to a full burst)
+        rate_limiter.check(client_key(http_request), cost=len({normalize_query(q) for q in request.questions}))
+    except Overloaded as e:
+        raise overload_error(e)
+    await profile.wait()
+    agent = get_agent_safe()
+    if not agent:
+        raise HTTPException(status_code=500, detail="Agent not initialized.")
+    
+    # Batch questions belong to no session: run them on the graph without a checkpointer
+    agent = get_stateless_agent()
+    concurrency = min(request.concurrency or BATCH_CONCURRENCY, BATCH_CONCURRENCY)
+    run = BatchRun(getattr(agent, "agent", agent) if request.fresh else agent, request.questions,
+                   concurrency, corpus_version=get_corpus_version())
+    
+    async def lines():
+        async for record in run.records():
+            yield dumps_json(record) + b"\n"
+        yield dumps_json(run.stats()) + b"\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.websocket("/ws/chat")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint for real-time chat"""
-    await websocket.accept()
-    print("✅ WebSocket connection accepted")
+    """WebSocket endpoint for real-time chat (JSON text frames, or MessagePack with the virtual-me.msgpack subprotocol)"""
+    codec = negotiate(websocket)
+    await websocket.accept(subprotocol=codec.subprotocol)
+    log.info("websocket accepted", subprotocol=codec.subprotocol)
     
+    await profile.wait()
     agent = get_agent_safe()
     if not agent:
         try:
-            await websocket.send_json({
+            await codec.send(websocket, {
                 "error": "Agent not initialized. Check server logs.",
                 "type": "error"
             })
@@ -103,15 +290,37 @@ async def websocket_endpoint(websocket: WebSocket):
             pass
         return
 
-    session_messages = []
+    # Clients opt into token streaming per connection (?stream=1) or per message ("stream": true)
+    stream_default = websocket.query_params.get("stream", "").lower() in ("1", "true", "yes")
+    # ...and into a `timing` frame after each answer with ?timings=1 or "timings": true
+    timings_default = is_enabled(websocket.query_params.get("timings", ""))
+    # ...and into the turn's message delta on each answer with ?deltas=1 or "deltas": true
+    deltas_default = is_enabled(websocket.query_params.get("deltas", ""))
+
+    # Resume an existing session with ?session_id=..., otherwise start a new one
+    session_id, session_messages = await load_session(websocket.query_params.get("session_id"), [])
+    client = client_key(websocket)
+
+    # Receive in the background: messages sent while a turn runs are merged into the next one
+    inbox = PendingMessages()
+    async def receive_messages():
+        try:
+            while True:
+                inbox.put(await receive_frame(websocket, codec))
+        except Exception as e:
+            inbox.close(e)
+    receiver = asyncio.create_task(receive_messages())
     try:
         while True:
-            # Receive message from client
-            data = await websocket.receive_text()
-            message_data = json.loads(data)
+            message_data, dropped = await inbox.take()
             user_text = message_data.get("text", "")
             
-            print(f"📨 Received: {user_text}")
+            log.info("ws message received", session_id=session_id, chars=len(user_text), dropped=dropped)
+            if dropped:
+                await codec.send(websocket, {"type": "dropped", "dropped": dropped})
+            
+            # Re-read the stored history: other workers may have continued this session
+            _, session_messages = await load_session(session_id, session_messages)
             
             # Build initial state
             initial_state = {
@@ -119,67 +328,119 @@ async def websocket_endpoint(websocket: WebSocket):
                 "user_query": user_text,
             }
             
+            timer = TurnTimer()
+            config = turn_config(session_id, timer)
             try:
-                # Invoke agent
-                result = agent.invoke(initial_state)
-                session_messages = result.get("messages", [])
-                
-                response_text = result.get("response", "I apologize, but I encountered an error.")
-                
-                # Check for meeting flow trigger
-                action = None
-                if "[TRIGGER:MEETING_FLOW]" in response_text:
-                    action = "suggest_meeting"
-                    response_text = response_text.replace("[TRIGGER:MEETING_FLOW]", "").strip()
-                
-                # Send response
-                response_payload = {
-                    "response": response_text,
-                    "thinking": result.get("thinking", ""),
-                    "type": "message"
-                }
-                
-                if action:
-                    response_payload["action"] = action
-                
-                await websocket.send_json(response_payload)
-                print(f"📤 Sent: {response_text[:100]}...")
+                rate_limiter.check(client)
+                with timed_turn("websocket"):
+                    if message_data.get("stream", stream_default):
+                        # Stream tokens, tool events and the final message as separate frames
+                        async with agent_slot():
+                            turn = AgentTurnStream(agent, initial_state, config)
+                            async for frame in turn.frames():
+                                if frame["type"] == "message":
+                                    frame["session_id"] = session_id
+                                    if message_data.get("deltas", deltas_default):
+                                        frame["messages"] = message_delta(
+                                            (turn.final_state or {}).get("messages", []), len(session_messages))
+                                await codec.send(websocket, frame)
+                        result = turn.final_state or {}
+                        response_payload = build_message_payload(result)
+                    else:
+                        # Invoke agent without blocking the event loop
+                        result = await run_turn(agent, initial_state, config)
+                        response_payload = build_message_payload(result)
+                        response_payload["session_id"] = session_id
+                        if message_data.get("deltas", deltas_default):
+                            response_payload["messages"] = message_delta(result.get("messages", []),
+                                                                          len(session_messages))
+                        await codec.send(websocket, response_payload)
+                    
+                    # Keep the stored history within the memory budget for the next turn
+                    session_messages = await save_session(session_id, result.get("messages", session_messages))
+                summary = timer.summary()
+                if message_data.get("timings", timings_default):
+                    await codec.send(websocket, {"type": "timing", **summary})
+                log.info("ws answer sent", session_id=session_id, chars=len(response_payload["response"]),
+                         total_ms=summary["total_ms"], tool_calls=summary["tool_calls"])
                 
+            except Overloaded as e:
+                await codec.send(websocket, e.frame())
             except Exception as e:
-                print(f"❌ Error invoking agent: {e}")
-                import traceback
-                traceback.print_exc()
+                log.exception("agent invocation failed", session_id=session_id)
                 
-                await websocket.send_json({
+                await codec.send(websocket, {
                     "response": "I apologize, but I encountered an error processing your request. Please try again.",
                     "error": str(e),
                     "type": "error"
                 })
             
     except WebSocketDisconnect:
-        print("ℹ️ Client disconnected normally.")
+        log.info("websocket disconnected", session_id=session_id)
+    except FrameTooLarge as e:
+        log.warning("websocket frame rejected", session_id=session_id, error=str(e))
+        await websocket.close(code=MESSAGE_TOO_BIG, reason="frame too large")
     except Exception as e:
-        print(f"⚠️ WebSocket Error: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("websocket error", session_id=session_id)
         try:
-            await websocket.send_json({"error": str(e), "type": "error"})
+            await codec.send(websocket, {"error": str(e), "type": "error"})
         except RuntimeError:
-            print("🚫 Could not send error: connection already closed.")
+            log.warning("could not send error, connection already closed", session_id=session_id)
+    finally:
+        receiver.cancel()
 
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    agent = get_agent_safe()
-    status = "healthy" if agent else "degraded"
+    # Don't build the agent from here while warm-up is still doing it
+    agent = get_agent_safe() if profile.ready else None
+    status = "healthy" if agent else ("degraded" if profile.finished else "starting")
+    # An open circuit means answers are being degraded (readiness is unaffected: every worker would fail it)
+    if status == "healthy" and open_circuits():
+        status = "degraded"
+    cache = get_embedding_cache()
+    response_cache = getattr(agent, "cache", None)
+    precomputed = getattr(agent, "precomputed", None)
     
     return {
         "status": status,
         "pinecone_index": os.getenv("PINECONE_INDEX"),
         "google_api_configured": bool(os.getenv("GOOGLE_API_KEY")),
-        "calendar_configured": bool(os.getenv("GCP_SERVICE_ACCOUNT_JSON"))
+        "calendar_configured": bool(os.getenv("GCP_SERVICE_ACCOUNT_JSON")),
+        "embedding_cache": cache.stats() if cache is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "precomputed_answers": precomputed.stats() if precomputed is not None else None,
+        "conversation_memory": memory.stats(),
+        "intent_routing": routing_metrics.stats(),
+        "sessions": get_session_store().stats(),
+        "admission": admission_stats(),
+        "dependencies": dependency_stats(),
+        "startup": profile.report()
     }
 
+@app.get("/health/live")
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness():
+    """Readiness probe: 503 until the worker has finished warming up"""
+    if not profile.ready:
+        status = "failed" if profile.finished else "warming_up"
+        return ORJSONResponse(status_code=503, content={"status": status, **profile.report()})
+    return {"status": "ready", "ready_ms": profile.ready_at}
+
+@app.get("/health/startup")
+def startup_report():
+    """Import and warm-up timings of this worker"""
+    return profile.report()
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of node/tool/LLM latency, token and error metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 def root():
     """Root endpoint"""
@@ -189,7 +450,11 @@ def root():
         "endpoints": {
             "websocket": "/ws/chat",
             "rest": "/api/chat",
-            "health": "/health"
+            "sse": "/api/chat/stream",
+            "health": "/health",
+            "liveness": "/health/live",
+            "readiness": "/health/ready",
+            "metrics": "/metrics"
         }
     }
 
@@ -0,0 +1,324 @@
+"""
+Latency/throughput instrumentation for the agent, exported in Prometheus text format.
+
+AgentMetricsCallback is passed as a callback with every agent invocation (see
+TurnTimer.config), so every node (route, answer, think, tools, respond), tool call and
+LLM call is timed without touching the node code: per-call latency histograms, LLM token
+counts, tool calls per turn and error counts. Subsystems that already keep hit/miss counters (embedding/response caches,
+availability cache, ...) register a collector that is read at scrape time.
+
+TurnTimer is a per-request handler that gathers the same timings for one turn, for the
+optional Server-Timing header / websocket "timing" frame.
+"""
+import time
+import bisect
+import threading
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from langchain_core.callbacks import BaseCallbackHandler
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13)
+
+def _label_key(labels: dict):
+    return tuple(sorted(labels.items()))
+
+def _escape_label(value) -> str:
+    # Prometheus text format: backslash, double quote and newline are escaped in label values
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+def _format_labels(key, extra=()) -> str:
+    items = list(key) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in items) + "}"
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] += amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(_label_key(labels), 0.0)
+
+    def render(self):
+        yield f"# HELP {self.name} {_escape_help(self.help)}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                yield f"{self.name}{_format_labels(key)} {value:g}"
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series["counts"][index] += 1
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self):
+        yield f"# HELP {self.name} {_escape_help(self.help)}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    yield f"{self.name}_bucket{_format_labels(key, [('le', f'{bound:g}')])} {cumulative}"
+                yield f"{self.name}_bucket{_format_labels(key, [('le', '+Inf')])} {series['count']}"
+                yield f"{self.name}_sum{_format_labels(key)} {series['sum']:.6f}"
+                yield f"{self.name}_count{_format_labels(key)} {series['count']}"
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        metric = Counter(name, help_text)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help_text: str, buckets=LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name, help_text, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def register_collector(self, prefix: str, stats_fn):
+        """Export the numeric values of `stats_fn()` (e.g. a cache's .stats()) as gauges named prefix_<key>."""
+        self.collectors.append((prefix, stats_fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        for prefix, stats_fn in self.collectors:
+            try:
+                stats = stats_fn() or {}
+            except Exception:
+                continue
+            for key, value in stats.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {value:g}")
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+NODE_SECONDS = registry.histogram("agent_node_seconds", "Latency of each LangGraph node call")
+TOOL_SECONDS = registry.histogram("agent_tool_seconds", "Latency of each tool call")
+TOOL_CALLS = registry.counter("agent_tool_calls_total", "Tool calls by tool and status")
+LLM_SECONDS = registry.histogram("agent_llm_seconds", "Latency of each LLM call")
+LLM_TOKENS = registry.counter("agent_llm_tokens_total", "LLM tokens by node and direction")
+TURN_SECONDS = registry.histogram("agent_turn_seconds", "End-to-end latency of a chat turn by endpoint")
+TURN_TOOL_CALLS = registry.histogram("agent_turn_tool_calls", "Tool calls per agent turn", COUNT_BUCKETS)
+TURNS = registry.counter("agent_turns_total", "Chat turns by endpoint and outcome")
+ERRORS = registry.counter("agent_errors_total", "Errors by component")
+SPECULATIVE_RETRIEVALS = registry.counter("agent_speculative_retrievals_total",
+                                          "Speculative retrievals by outcome (used/discarded)")
+ADMISSION_REJECTED = registry.counter("agent_admission_rejected_total",
+                                     "Turns refused by admission control by reason")
+ADMISSION_WAIT_SECONDS = registry.histogram("agent_admission_wait_seconds", "Time turns waited for an agent slot")
+COALESCED_REQUESTS = registry.counter("agent_coalesced_requests_total",
+                                      "Requests answered by an identical request already in flight")
+DEPENDENCY_CALLS = registry.counter("agent_dependency_calls_total",
+                                    "Calls to Gemini, retrieval and Calendar by outcome (ok/error/timeout/rejected)")
+DEPENDENCY_SECONDS = registry.histogram("agent_dependency_seconds", "Latency of dependency calls, retries included")
+DEPENDENCY_RETRIED = registry.counter("agent_dependency_retries_total", "Retried dependency attempts")
+DEPENDENCY_HEDGES = registry.counter("agent_dependency_hedges_total", "Hedged duplicate requests sent and won")
+BATCH_SHARED = registry.counter("agent_batch_shared_total",
+                                "Questions, retrievals and embeddings a batch reused instead of repeating, by kind")
+
+class _RunClock(BaseCallbackHandler, ABC):
+    """Times graph nodes, tools and LLM calls from LangChain callback events."""
+
+    run_inline = True  # bookkeeping only: no need to hop to an executor thread
+
+    def __init__(self):
+        self._runs = {}  # run_id -> (kind, name, started, root_id)
+        self._turn_tools = defaultdict(int)
+
+    def _start(self, kind: str, name: str, run_id, parent_run_id):
+        parent = self._runs.get(parent_run_id)
+        root = parent[3] if parent else (parent_run_id or run_id)
+        if kind == "node" and parent is not None and parent[:2] == ("node", name):
+            kind = None  # the node's own runnable (e.g. RunnableLambda "think") inside the node call
+        self._runs[run_id] = (kind, name, time.perf_counter(), root)
+
+    def _end(self, run_id, error: bool = False, **extra):
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        kind, name, started, root = run
+        if kind == "tool":
+            self._turn_tools[root] += 1
+        if kind == "turn":
+            self.on_turn(time.perf_counter() - started, self._turn_tools.pop(root, 0), error)
+        elif kind is not None:
+            self.observe(kind, name, time.perf_counter() - started, error, **extra)
+
+    @abstractmethod
+    def observe(self, kind: str, name: str, seconds: float, error: bool, **extra):
+        """One finished node/tool/LLM run (extra: input_tokens/output_tokens for LLM calls)."""
+
+    def on_turn(self, seconds: float, tool_calls: int, error: bool):
+        pass
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, name=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if parent_run_id is None:
+            kind = "turn"
+        elif node and name == node:
+            kind = "node"
+        else:
+            kind = None  # inner runnable: tracked only to resolve its root
+        self._start(kind, node or name, run_id, parent_run_id)
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, parent_run_id=None, name=None, **kwargs):
+        self._start("tool", name or (serialized or {}).get("name", "tool"), run_id, parent_run_id)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        self._start("llm", (metadata or {}).get("langgraph_node", "llm"), run_id, parent_run_id)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = {}
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                for key, value in (getattr(message, "usage_metadata", None) or {}).items():
+                    if key in ("input_tokens", "output_tokens"):
+                        usage[key] = usage.get(key, 0) + value
+        self._end(run_id, **usage)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=True)
+
+class AgentMetricsCallback(_RunClock):
+    """Process-wide handler feeding the Prometheus registry."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def _start(self, *args):
+        with self._lock:
+            super()._start(*args)
+
+    def _end(self, *args, **kwargs):
+        with self._lock:
+            super()._end(*args, **kwargs)
+
+    def observe(self, kind, name, seconds, error, input_tokens=0, output_tokens=0):
+        if kind == "node":
+            NODE_SECONDS.observe(seconds, node=name)
+            if error:
+                ERRORS.inc(component=f"node:{name}")
+        elif kind == "tool":
+            TOOL_SECONDS.observe(seconds, tool=name)
+            TOOL_CALLS.inc(tool=name, status="error" if error else "ok")
+        elif kind == "llm":
+            LLM_SECONDS.observe(seconds, node=name)
+            if input_tokens:
+                LLM_TOKENS.inc(input_tokens, node=name, direction="input")
+            if output_tokens:
+                LLM_TOKENS.inc(output_tokens, node=name, direction="output")
+            if error:
+                ERRORS.inc(component="llm")
+
+    def on_turn(self, seconds, tool_calls, error):
+        TURN_TOOL_CALLS.observe(tool_calls)
+
+class TurnTimer(_RunClock):
+    """Per-request timings: total milliseconds per node/tool plus LLM token counts."""
+
+    def __init__(self):
+        super().__init__()
+        self.started = time.perf_counter()
+        self.spans = defaultdict(float)
+        self.tokens = {"input": 0, "output": 0}
+        self.tool_calls = 0
+
+    def observe(self, kind, name, seconds, error, input_tokens=0, output_tokens=0):
+        if kind == "llm":
+            self.spans["llm"] += seconds
+            self.tokens["input"] += input_tokens
+            self.tokens["output"] += output_tokens
+        else:
+            self.spans[name] += seconds
+        if kind == "tool":
+            self.tool_calls += 1
+
+    def config(self) -> dict:
+        """Invocation config that feeds both this timer and the process-wide metrics."""
+        return {"callbacks": [agent_metrics, self]}
+
+    def summary(self) -> dict:
+        return {
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 1),
+            "spans_ms": {name: round(seconds * 1000, 1) for name, seconds in self.spans.items()},
+            "llm_tokens": dict(self.tokens),
+            "tool_calls": self.tool_calls,
+        }
+
+    def server_timing(self) -> str:
+        """Server-Timing header value (shown in the browser's network panel)."""
+        parts = [f"{name.replace(' ', '_')};dur={seconds * 1000:.1f}" for name, seconds in self.spans.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
+
+class timed_turn:
+    """`with timed_turn("rest"):` records agent_turn_seconds and agent_turns_total for an endpoint."""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        TURN_SECONDS.observe(time.perf_counter() - self.started, endpoint=self.endpoint)
+        TURNS.inc(endpoint=self.endpoint, outcome="error" if exc_type else "ok")
+        if exc_type:
+            ERRORS.inc(component=f"endpoint:{self.endpoint}")
+        return False
+
+agent_metrics = AgentMetricsCallback()
+
+def render_metrics() -> str:
+    return registry.render()
@@ -0,0 +1,60 @@
+"""
+Configurable output dimensionality for the Gemini embeddings.
+
+gemini-embedding-001 is trained Matryoshka-style: the leading dimensions of its 3072-d
+vectors carry most of the signal, so a prefix of 768 or 256 values, re-normalised to unit
+length, is a usable embedding at a quarter or a twelfth of the size. EMBEDDING_DIMENSIONS
+sets that size for everything built from the same client: the local index, the Pinecone
+index dimension, query vectors and the embedding cache (whose entries are keyed by model
+and dimension, so indexes of different sizes never share vectors).
+
+See benchmarks/index_quantization.py for recall vs memory per dimension.
+"""
+import os
+from typing import List
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from embedding_cache import with_embedding_cache
+
+EMBEDDING_MODEL = "models/gemini-embedding-001"
+# gemini-embedding-001 outputs 3072 dimensions by default
+NATIVE_DIMENSIONS = 3072
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(NATIVE_DIMENSIONS)))
+
+def reduce_vectors(vectors, dimensions: int) -> np.ndarray:
+    """The first `dimensions` values of each vector, scaled back to unit length."""
+    matrix = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def cache_model_name(model: str, dimensions: int) -> str:
+    """Embedding cache key for `model` truncated to `dimensions` (plain model name at full size)."""
+    return model if dimensions >= NATIVE_DIMENSIONS else f"{model}@{dimensions}"
+
+class ReducedEmbeddings(Embeddings):
+    """Wraps an Embeddings client and truncates + renormalises every vector it returns."""
+
+    def __init__(self, embeddings: Embeddings, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return reduce_vectors(self.embeddings.embed_documents(texts), self.dimensions).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return reduce_vectors(self.embeddings.embed_query(text), self.dimensions).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return reduce_vectors(await self.embeddings.aembed_documents(texts), self.dimensions).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return reduce_vectors(await self.embeddings.aembed_query(text), self.dimensions).tolist()
+
+def gemini_embeddings(google_api_key: str = None, dimensions: int = EMBEDDING_DIMENSIONS) -> Embeddings:
+    """Gemini embeddings at `dimensions`, behind the shared embedding cache."""
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    client = GoogleGenerativeAIEmbeddings(model=EMBEDDING_MODEL, google_api_key=google_api_key)
+    if dimensions < NATIVE_DIMENSIONS:
+        client = ReducedEmbeddings(client, dimensions)
+    return with_embedding_cache(client, cache_model_name(EMBEDDING_MODEL, dimensions))
@@ -0,0 +1,423 @@
+"""
+Deadlines, retries, hedged requests and circuit breakers for the agent's upstream calls.
+
+Every call to Gemini ("gemini"), the vector store with its query embedding ("retrieval")
+and Google Calendar ("calendar") goes through that dependency's Dependency:
+
+- Deadline: all attempts of one call share DEPENDENCY_TIMEOUTS[name] seconds, so a
+  stalled upstream can't pin a worker for longer than that.
+- Retries: transient failures (timeouts, connection errors, 408/429/5xx) are retried up
+  to DEPENDENCY_RETRIES[name] times with full-jitter exponential backoff.
+- Hedging: for idempotent reads of HEDGED_DEPENDENCIES, an attempt still running after the
+  dependency's recent p95 latency gets a duplicate; the first success wins.
+- Circuit breaker: BREAKER_FAILURES transient failures in a row open it. Calls then fail
+  fast with CircuitOpen for BREAKER_RESET seconds, after which a single probe call decides
+  whether it closes again.
+
+A call whose side effects can't be repeated once under way (an LLM call that has already
+streamed tokens to the client) passes `can_repeat`; once it returns False the call is
+neither retried nor hedged.
+
+Blocking calls (call_sync) run on the dependency's own pool of RESILIENCE_WORKERS threads.
+An attempt past its deadline keeps its thread until the client library gives up, so when
+a stalled upstream has every thread busy, further calls fail fast with Saturated instead of
+queueing behind them; that isn't counted against the breaker.
+
+Callers catch the final error and degrade (lexical retrieval, an answer from the static
+portfolio text, a "calendar unavailable" tool result). Breakers are per worker process;
+their state is in /health and /metrics.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, wait as wait_futures
+from langchain_core.runnables.config import ContextThreadPoolExecutor
+from metrics import DEPENDENCY_CALLS, DEPENDENCY_RETRIED, DEPENDENCY_HEDGES, DEPENDENCY_SECONDS
+from structured_logging import get_logger
+from tool_executor import parse_timeouts
+
+log = get_logger("resilience")
+
+DEFAULT_TIMEOUTS = {"gemini": 30.0, "retrieval": 5.0, "calendar": 10.0}
+DEFAULT_RETRIES = {"gemini": 1, "retrieval": 2, "calendar": 2}
+# e.g. DEPENDENCY_TIMEOUTS="gemini=20,calendar=5", DEPENDENCY_RETRIES="gemini=0"
+DEPENDENCY_TIMEOUTS = {**DEFAULT_TIMEOUTS, **parse_timeouts(os.getenv("DEPENDENCY_TIMEOUTS", ""))}
+DEPENDENCY_RETRIES = {**DEFAULT_RETRIES, **{name: int(n) for name, n in parse_timeouts(os.getenv("DEPENDENCY_RETRIES", "")).items()}}
+RETRY_BASE_DELAY = float(os.getenv("RETRY_BASE_DELAY", "0.1"))
+RETRY_MAX_DELAY = float(os.getenv("RETRY_MAX_DELAY", "2"))
+
+HEDGED_DEPENDENCIES = {name.strip() for name in os.getenv("HEDGED_DEPENDENCIES", "retrieval,calendar").split(",") if name.strip()}
+HEDGE_QUANTILE = float(os.getenv("HEDGE_QUANTILE", "0.95"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.05"))
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("BREAKER_RESET", "30"))
+
+# Threads per dependency for blocking calls (Calendar, the sync graph path); an attempt past
+# its deadline keeps its thread until the client library's own socket timeout
+RESILIENCE_WORKERS = int(os.getenv("RESILIENCE_WORKERS", "16"))
+
+TRANSIENT_STATUS = {408, 429, 500, 502, 503, 504}
+TRANSIENT_ERRORS = {"ServiceUnavailable", "TooManyRequests", "ResourceExhausted", "InternalServerError",
+                    "DeadlineExceeded", "GatewayTimeout", "BadGateway", "ServerError"}
+
+# Error responses from the provider clients (google.api_core, langchain-google-genai, googleapiclient)
+PROVIDER_ERRORS = {"GoogleAPIError", "GoogleGenerativeAIError", "HttpError"}
+
+class CircuitOpen(Exception):
+    """A call was refused without trying because the dependency's breaker is open."""
+
+    def __init__(self, dependency: str, retry_after: float):
+        super().__init__(f"{dependency} unavailable (circuit open), retry in {retry_after:.0f}s")
+        self.dependency = dependency
+        self.retry_after = retry_after
+
+class DependencyTimeout(TimeoutError):
+    """A call ran out of its deadline."""
+
+class Saturated(Exception):
+    """A blocking call was refused because every thread of the dependency's pool is still busy."""
+
+    def __init__(self, dependency: str, workers: int):
+        super().__init__(f"{dependency} saturated: all {workers} worker threads busy")
+        self.dependency = dependency
+
+def is_transient(error: Exception) -> bool:
+    """Worth retrying (and counted against the breaker): timeouts, connection failures, 408/429/5xx."""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError, ConnectionError)):
+        return True
+    if type(error).__name__ in TRANSIENT_ERRORS:
+        return True
+    # google.api_core errors carry .code, googleapiclient's HttpError .resp.status
+    status = getattr(error, "status_code", None) or getattr(error, "code", None) \
+        or getattr(getattr(error, "resp", None), "status", None)
+    try:
+        return int(status) in TRANSIENT_STATUS
+    except (TypeError, ValueError):
+        return False
+
+def is_unavailable(error: Exception) -> bool:
+    """
+    The dependency couldn't serve a call: refused (CircuitOpen, Saturated), out of time, out of
+    retries on a transient failure, or an error response from its API. Callers may answer
+    around these (degraded replies); anything else is a bug and should propagate.
+    """
+    if isinstance(error, (CircuitOpen, Saturated)) or is_transient(error):
+        return True
+    return any(cls.__name__ in PROVIDER_ERRORS for cls in type(error).__mro__)
+
+class CircuitBreaker:
+    """closed -> open after `failures` transient failures in a row -> half_open (one probe) after `reset_after` seconds."""
+
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self.name = name
+        self.threshold = failures
+        self.reset_after = reset_after
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = None
+        self.opened = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def check(self):
+        """Raise CircuitOpen unless a call may go through now."""
+        with self._lock:
+            if self.state == "open":
+                remaining = self.opened_at + self.reset_after - time.monotonic()
+                if remaining > 0:
+                    raise CircuitOpen(self.name, remaining)
+                self.state = "half_open"
+            if self.state == "half_open":
+                if self._probing:
+                    raise CircuitOpen(self.name, self.reset_after)
+                self._probing = True
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                log.info("circuit closed", dependency=self.name)
+            self.state = "closed"
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == "half_open" or (self.state == "closed" and self.failures >= self.threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+                self.opened += 1
+                log.warning("circuit opened", dependency=self.name, failures=self.failures, reset_after=self.reset_after)
+            self._probing = False
+
+    def abandon(self):
+        """The call was cancelled before it could tell: let the next one probe."""
+        with self._lock:
+            self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.opened}
+
+class BoundedPool:
+    """Thread pool that refuses work (Saturated) instead of queueing it once every thread is taken."""
+
+    def __init__(self, name: str, workers: int = RESILIENCE_WORKERS):
+        self.name = name
+        self.workers = workers
+        self.busy = 0
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, fn):
+        with self._lock:
+            if self.busy >= self.workers:
+                raise Saturated(self.name, self.workers)
+            self.busy += 1
+            if self._executor is None:
+                self._executor = ContextThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f"dep-{self.name}")
+        try:
+            future = self._executor.submit(fn)
+        except BaseException:
+            self._release()
+            raise
+        # Also runs when a queued duplicate is cancelled
+        future.add_done_callback(self._release)
+        return future
+
+    def _release(self, _future=None):
+        with self._lock:
+            self.busy -= 1
+
+def _always() -> bool:
+    return True
+
+class Dependency:
+    """Call policy for one upstream; call() for coroutine functions, call_sync() for blocking ones."""
+
+    def __init__(self, name: str, timeout: float, retries: int, hedged: bool = False,
+                 breaker: CircuitBreaker = None):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.hedged = hedged
+        self.breaker = breaker or CircuitBreaker(name)
+        self.pool = BoundedPool(name)
+        self.saturated = 0
+        self._latencies = deque(maxlen=200)
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def hedge_delay(self):
+        """Recent p95 latency of successful attempts (None until there are enough samples)."""
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self._latencies)
+        return max(HEDGE_MIN_DELAY, ordered[int(HEDGE_QUANTILE * (len(ordered) - 1))])
+
+    def _hedge_after(self, hedge: bool, remaining: float, can_repeat):
+        delay = self.hedge_delay() if hedge and self.hedged and can_repeat() else None
+        return delay if delay is not None and delay < remaining else None
+
+    def _record(self, outcome: str, started: float):
+        DEPENDENCY_CALLS.inc(dependency=self.name, outcome=outcome)
+        DEPENDENCY_SECONDS.observe(time.perf_counter() - started, dependency=self.name)
+
+    def _retry_delay(self, error: Exception, attempt: int, deadline: float, can_repeat):
+        """Seconds to back off before retrying after `error`, or None to give up."""
+        if not is_transient(error):
+            # The upstream answered (e.g. a 400): nothing wrong with it
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.retries or self.breaker.is_open or not can_repeat():
+            return None
+        delay = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        DEPENDENCY_RETRIED.inc(dependency=self.name)
+        return delay
+
+    def _check(self, started: float):
+        try:
+            self.breaker.check()
+        except CircuitOpen:
+            self._record("rejected", started)
+            raise
+
+    def _failed(self, error: Exception, started: float):
+        self._record("timeout" if isinstance(error, TimeoutError) else "error", started)
+        log.warning("dependency call failed", dependency=self.name, error=str(error) or type(error).__name__)
+
+    async def call(self, fn, hedge: bool = True, can_repeat=_always):
+        """Await `fn()` (a coroutine function) under the deadline, retry, hedge and breaker policy."""
+        started = time.perf_counter()
+        self._check(started)
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                result = await self._attempt(fn, deadline - time.monotonic(), hedge, can_repeat)
+            except asyncio.CancelledError:
+                self.breaker.abandon()
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline, can_repeat)
+                if delay is None:
+                    self._failed(e, started)
+                    raise
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._record("ok", started)
+            return result
+
+    async def _attempt(self, fn, remaining: float, hedge: bool, can_repeat):
+        if remaining <= 0:
+            raise DependencyTimeout(f"{self.name} deadline of {self.timeout:g}s exceeded")
+        attempt_started = time.perf_counter()
+        end = time.monotonic() + remaining
+        hedge_after = self._hedge_after(hedge, remaining, can_repeat)
+        hedge_at = time.monotonic() + hedge_after if hedge_after is not None else None
+        tasks = [asyncio.ensure_future(fn())]
+        pending, error = set(tasks), None
+        try:
+            while pending:
+                wake = hedge_at if hedge_at is not None and len(tasks) == 1 else end
+                done, pending = await asyncio.wait(pending, timeout=max(0.0, wake - time.monotonic()),
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        self._won(task is not tasks[0], attempt_started)
+                        return task.result()
+                    error = task.exception()
+                if done:
+                    continue
+                if len(tasks) == 1 and hedge_at is not None and time.monotonic() < end and can_repeat():
+                    # Slower than usual: race a duplicate against it
+                    tasks.append(asyncio.ensure_future(fn()))
+                    pending.add(tasks[-1])
+                    self._hedged()
+                elif time.monotonic() < end:
+                    hedge_at = None  # too late to duplicate it: wait for the deadline
+                else:
+                    raise DependencyTimeout(f"{self.name} deadline of {self.timeout:g}s exceeded")
+            raise error
+        finally:
+            for task in tasks:
+                if task.done() and not task.cancelled():
+                    task.exception()  # retrieved, so a losing attempt's error isn't logged as unhandled
+                task.cancel()
+
+    def call_sync(self, fn, hedge: bool = True, can_repeat=_always):
+        """Blocking variant of call(): `fn()` runs on the dependency's thread pool."""
+        started = time.perf_counter()
+        self._check(started)
+        deadline = time.monotonic() + self.timeout
+        attempt = 0
+        while True:
+            try:
+                result = self._attempt_sync(fn, deadline - time.monotonic(), hedge, can_repeat)
+            except Saturated:
+                # Our own threads are the bottleneck, not the upstream: leave the breaker alone
+                self.breaker.abandon()
+                self.saturated += 1
+                self._record("rejected", started)
+                log.warning("dependency saturated", dependency=self.name, workers=self.pool.workers)
+                raise
+            except Exception as e:
+                delay = self._retry_delay(e, attempt, deadline, can_repeat)
+                if delay is None:
+                    self._failed(e, started)
+                    raise
+                attempt += 1
+                time.sleep(delay)
+                continue
+            self.breaker.record_success()
+            self._record("ok", started)
+            return result
+
+    def _attempt_sync(self, fn, remaining: float, hedge: bool, can_repeat):
+        if remaining <= 0:
+            raise DependencyTimeout(f"{self.name} deadline of {self.timeout:g}s exceeded")
+        attempt_started = time.perf_counter()
+        end = time.monotonic() + remaining
+        hedge_after = self._hedge_after(hedge, remaining, can_repeat)
+        hedge_at = time.monotonic() + hedge_after if hedge_after is not None else None
+        futures = [self.pool.submit(fn)]
+        pending, error = set(futures), None
+        try:
+            while pending:
+                wake = hedge_at if hedge_at is not None and len(futures) == 1 else end
+                done, pending = wait_futures(pending, timeout=max(0.0, wake - time.monotonic()),
+                                             return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is None:
+                        self._won(future is not futures[0], attempt_started)
+                        return future.result()
+                    error = future.exception()
+                if done:
+                    continue
+                if len(futures) == 1 and hedge_at is not None and time.monotonic() < end and can_repeat():
+                    try:
+                        futures.append(self.pool.submit(fn))
+                    except Saturated:
+                        hedge_at = None  # no spare thread for a duplicate: keep waiting on the first
+                        continue
+                    pending.add(futures[-1])
+                    self._hedged()
+                elif time.monotonic() < end:
+                    hedge_at = None
+                else:
+                    raise DependencyTimeout(f"{self.name} deadline of {self.timeout:g}s exceeded")
+            raise error
+        finally:
+            # Not-yet-started duplicates are dropped; running ones finish in the background
+            for future in futures:
+                future.cancel()
+
+    def _hedged(self):
+        self.hedges += 1
+        DEPENDENCY_HEDGES.inc(dependency=self.name, outcome="sent")
+
+    def _won(self, by_hedge: bool, attempt_started: float):
+        self._latencies.append(time.perf_counter() - attempt_started)
+        if by_hedge:
+            self.hedge_wins += 1
+            DEPENDENCY_HEDGES.inc(dependency=self.name, outcome="won")
+
+    def stats(self) -> dict:
+        delay = self.hedge_delay()
+        return {
+            **self.breaker.stats(),
+            "timeout_s": self.timeout,
+            "retries": self.retries,
+            "hedge_after_ms": round(delay * 1000, 1) if delay is not None and self.hedged else None,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "busy_threads": self.pool.busy,
+            "saturated": self.saturated,
+        }
+
+dependencies = {
+    name: Dependency(name, DEPENDENCY_TIMEOUTS[name], DEPENDENCY_RETRIES.get(name, 0), hedged=name in HEDGED_DEPENDENCIES)
+    for name in DEFAULT_TIMEOUTS
+}
+gemini = dependencies["gemini"]
+retrieval = dependencies["retrieval"]
+calendar = dependencies["calendar"]
+
+def dependency_stats() -> dict:
+    return {name: dependency.stats() for name, dependency in dependencies.items()}
+
+def open_circuits() -> list:
+    return [name for name, dependency in dependencies.items() if dependency.breaker.is_open]
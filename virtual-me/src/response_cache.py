@@ -0,0 +1,321 @@
+"""
+Response cache in front of the LangGraph agent.
+
+Most traffic is the same handful of portfolio questions, each costing two Gemini calls
+and a vector search. Single-turn questions are looked up first by normalised text, then
+by embedding similarity. Entries expire after a TTL, the least recently used are evicted
+first, and the whole cache is dropped when the indexed corpus version changes. Turns that
+touched the calendar tools, and answers degraded by an unavailable LLM, are never cached.
+
+In front of it, PrecomputedAnswers serves the answers a batch job wrote to
+PRECOMPUTED_ANSWERS_PATH (see batch.py) for questions with the same normalised text, as
+long as they were generated from the corpus version currently served.
+"""
+import os
+import re
+import json
+import time
+from collections import OrderedDict
+import numpy as np
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from streaming import extract_action, MEETING_TRIGGER
+from structured_logging import get_logger
+from Process_document import DATA_DIR
+
+log = get_logger("response_cache")
+
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE", "1").lower() not in ("0", "false", "no")
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "3600"))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+RESPONSE_CACHE_SIMILARITY = float(os.getenv("RESPONSE_CACHE_SIMILARITY", "0.92"))
+# Shipped in the image (see .dockerignore), or point it at a mounted file
+PRECOMPUTED_ANSWERS_PATH = os.getenv("PRECOMPUTED_ANSWERS_PATH", os.path.join(DATA_DIR, "precomputed_answers.jsonl"))
+# How often lookups re-check the answers file and the corpus version
+PRECOMPUTED_RECHECK_SECONDS = float(os.getenv("PRECOMPUTED_RECHECK_SECONDS", "5"))
+
+# Tools with side effects or time-dependent answers
+UNCACHEABLE_TOOLS = {"list_available_slots", "request_meeting_approval"}
+
+def normalize_query(text: str) -> str:
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+def cacheable_query(state: dict):
+    """The question text if the state is a fresh single-turn question, else None."""
+    messages = state.get("messages", [])
+    if len(messages) != 1 or not isinstance(messages[0], HumanMessage):
+        return None
+    content = messages[0].content
+    return content if isinstance(content, str) and content.strip() else None
+
+def is_cacheable_result(result: dict) -> bool:
+    """False for degraded answers and turns that used the calendar tools."""
+    return not result.get("degraded") and not used_uncacheable_tool(result.get("messages", []))
+
+def used_uncacheable_tool(messages) -> bool:
+    for m in messages:
+        if isinstance(m, ToolMessage) and m.name in UNCACHEABLE_TOOLS:
+            return True
+        if isinstance(m, AIMessage) and any(c["name"] in UNCACHEABLE_TOOLS for c in m.tool_calls or []):
+            return True
+    return False
+
+class _Entry:
+    __slots__ = ("response", "thinking", "vector", "created_at")
+
+    def __init__(self, response, thinking, vector, created_at):
+        self.response = response
+        self.thinking = thinking
+        self.vector = vector
+        self.created_at = created_at
+
+class ResponseCache:
+    """Exact + semantic lookup of final responses with TTL, LRU and corpus-version invalidation."""
+
+    def __init__(self, get_embeddings=None, version_fn=None, ttl: float = RESPONSE_CACHE_TTL,
+                 max_entries: int = RESPONSE_CACHE_MAX_ENTRIES, threshold: float = RESPONSE_CACHE_SIMILARITY):
+        self.get_embeddings = get_embeddings
+        self.version_fn = version_fn
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.entries = OrderedDict()
+        self.version = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    def _check_version(self):
+        if self.version_fn is None:
+            return
+        version = self.version_fn()
+        if version != self.version:
+            if self.entries:
+                log.info("corpus version changed, clearing response cache", old=self.version, new=version)
+            self.entries.clear()
+            self.version = version
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for key in [k for k, e in self.entries.items() if e.created_at < cutoff]:
+            del self.entries[key]
+
+    def _exact(self, key):
+        self._check_version()
+        self._expire()
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.exact_hits += 1
+        return entry
+
+    def _semantic(self, vector):
+        candidates = [(k, e) for k, e in self.entries.items() if e.vector is not None]
+        if vector is None or not candidates:
+            self.misses += 1
+            return None
+        matrix = np.stack([e.vector for _, e in candidates])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+        key, entry = candidates[best]
+        self.entries.move_to_end(key)
+        self.semantic_hits += 1
+        return entry
+
+    def _put(self, key, result, vector):
+        # Tag the entry with the version being served now, not whatever the last lookup saw
+        self._check_version()
+        self.entries[key] = _Entry(result.get("response", ""), result.get("thinking", ""), vector, time.time())
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    @staticmethod
+    def _unit(vector):
+        if vector is None:
+            return None
+        v = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else None
+
+    def _embed(self, text):
+        # Semantic matching is best effort: without an embedding we fall back to exact lookups
+        try:
+            embeddings = self.get_embeddings() if self.get_embeddings else None
+            return self._unit(embeddings.embed_query(text)) if embeddings is not None else None
+        except Exception as e:
+            log.warning("response cache embedding failed", error=str(e))
+            return None
+
+    async def _aembed(self, text):
+        try:
+            embeddings = self.get_embeddings() if self.get_embeddings else None
+            return self._unit(await embeddings.aembed_query(text)) if embeddings is not None else None
+        except Exception as e:
+            log.warning("response cache embedding failed", error=str(e))
+            return None
+
+    def lookup(self, query: str):
+        key = normalize_query(query)
+        entry = self._exact(key)
+        return entry if entry is not None else self._semantic(self._embed(query))
+
+    async def alookup(self, query: str):
+        key = normalize_query(query)
+        entry = self._exact(key)
+        return entry if entry is not None else self._semantic(await self._aembed(query))
+
+    def store(self, query: str, result: dict):
+        if not is_cacheable_result(result):
+            self.bypassed += 1
+            return
+        self._put(normalize_query(query), result, self._embed(query))
+
+    async def astore(self, query: str, result: dict):
+        if not is_cacheable_result(result):
+            self.bypassed += 1
+            return
+        self._put(normalize_query(query), result, await self._aembed(query))
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self.entries),
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "corpus_version": self.version,
+        }
+
+class PrecomputedAnswers:
+    """
+    Answers loaded from a batch job's JSON Lines output, keyed by normalised question.
+    The file's mtime and the corpus version are re-checked at most every `recheck` seconds;
+    the file is re-read when it changes, and answers for another corpus version are ignored.
+    """
+
+    def __init__(self, path: str = PRECOMPUTED_ANSWERS_PATH, version_fn=None,
+                 recheck: float = PRECOMPUTED_RECHECK_SECONDS):
+        self.path = path
+        self.version_fn = version_fn
+        self.recheck = recheck
+        self.answers = {}
+        self.mtime = None
+        self.version = None
+        self.checked_at = None
+        self.hits = 0
+
+    def _reload(self):
+        now = time.monotonic()
+        if self.checked_at is not None and now - self.checked_at < self.recheck:
+            return
+        self.checked_at = now
+        if self.version_fn is not None:
+            self.version = self.version_fn()
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            self.answers, self.mtime = {}, None
+            return
+        if mtime == self.mtime:
+            return
+        answers = {}
+        with open(self.path) as f:
+            for line in f:
+                record = json.loads(line) if line.strip() else {}
+                # Failed questions and calendar answers (time-dependent) aren't served
+                if record.get("type") == "answer" and record.get("cacheable") and not record.get("error"):
+                    answers[normalize_query(record["question"])] = record
+        self.answers, self.mtime = answers, mtime
+        log.info("precomputed answers loaded", path=self.path, answers=len(answers))
+
+    def lookup(self, query: str):
+        """Cache entry for `query`, or None."""
+        self._reload()
+        record = self.answers.get(normalize_query(query))
+        if record is None:
+            return None
+        if self.version_fn is not None and record.get("corpus_version") != self.version:
+            return None
+        self.hits += 1
+        response = record["response"]
+        if record.get("action") == "suggest_meeting":
+            response = f"{response}\n\n{MEETING_TRIGGER}"
+        return _Entry(response, record.get("thinking", ""), None, self.mtime)
+
+    def __len__(self):
+        self._reload()
+        return len(self.answers)
+
+    def stats(self) -> dict:
+        return {"answers": len(self), "hits": self.hits}
+
+def cached_state(state: dict, entry: _Entry, thinking: str = "Served from response cache") -> dict:
+    """Final agent state built from a cache entry (same shape agent.invoke returns)."""
+    return {
+        **state,
+        "messages": list(state.get("messages", [])) + [AIMessage(content=extract_action(entry.response)[0])],
+        "response": entry.response,
+        "thinking": thinking,
+    }
+
+class CachedAgent:
+    """
+    Wraps the compiled graph: invoke/ainvoke answer fresh single-turn questions from the
+    precomputed answers or the ResponseCache (either may be None) when possible.
+    Everything else (astream_events, multi-turn state) passes straight through to the graph.
+    """
+
+    def __init__(self, agent, cache: ResponseCache = None, precomputed: PrecomputedAnswers = None):
+        self.agent = agent
+        self.cache = cache
+        self.precomputed = precomputed
+
+    def __getattr__(self, name):
+        return getattr(self.agent, name)
+
+    def _precomputed(self, state, query):
+        entry = self.precomputed.lookup(query) if self.precomputed is not None else None
+        return cached_state(state, entry, "Served from precomputed answers") if entry is not None else None
+
+    def invoke(self, state, config=None, **kwargs):
+        query = cacheable_query(state)
+        if query is not None:
+            precomputed = self._precomputed(state, query)
+            if precomputed is not None:
+                return precomputed
+            entry = self.cache.lookup(query) if self.cache is not None else None
+            if entry is not None:
+                return cached_state(state, entry)
+        result = self.agent.invoke(state, config, **kwargs)
+        if query is not None and self.cache is not None:
+            self.cache.store(query, result)
+        return result
+
+    async def ainvoke(self, state, config=None, **kwargs):
+        cached = await self.alookup_cached(state)
+        if cached is not None:
+            return cached
+        result = await self.agent.ainvoke(state, config, **kwargs)
+        await self.astore_result(state, result)
+        return result
+
+    async def alookup_cached(self, state):
+        """Precomputed or cached final state for `state`, or None (also used by the streaming path)."""
+        query = cacheable_query(state)
+        if query is None:
+            return None
+        precomputed = self._precomputed(state, query)
+        if precomputed is not None:
+            return precomputed
+        entry = await self.cache.alookup(query) if self.cache is not None else None
+        return cached_state(state, entry) if entry is not None else None
+
+    async def astore_result(self, state, result):
+        query = cacheable_query(state)
+        if query is not None and result and self.cache is not None:
+            await self.cache.astore(query, result)
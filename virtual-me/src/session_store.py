@@ -0,0 +1,233 @@
+"""
+Server-side conversation sessions.
+
+Clients keep only a session token; the message history lives here between turns.
+The default backend is an in-process LRU with TTL. SESSION_BACKEND=sqlite stores
+sessions in a WAL-mode SQLite file so several uvicorn workers can share them;
+SESSION_BACKEND=checkpoint compiles the agent graph with the shared SQLite checkpointer
+(checkpointer.py) and keeps each session as its checkpoint thread (thread_id = session ID).
+With more than one worker (WEB_CONCURRENCY > 1) "checkpoint" is the default, since an
+in-process store would strand a session on one worker.
+
+Store methods block (SQLite); async callers run them with asyncio.to_thread. Expired and
+excess sessions are dropped by prune(), every SESSION_PRUNE_INTERVAL seconds
+(prune_sessions), not on each write.
+"""
+import os
+import json
+import time
+import asyncio
+import secrets
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from langchain_core.messages import RemoveMessage, messages_from_dict, messages_to_dict
+from langgraph.graph.message import REMOVE_ALL_MESSAGES
+from Process_document import DATA_DIR
+from structured_logging import get_logger
+
+log = get_logger("sessions")
+
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "checkpoint" if WEB_CONCURRENCY > 1 else "memory").lower()
+SESSION_TTL = float(os.getenv("SESSION_TTL", "86400"))
+SESSION_MAX_ENTRIES = int(os.getenv("SESSION_MAX_ENTRIES", "1000"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(DATA_DIR, "sessions.sqlite3"))
+SESSION_PRUNE_INTERVAL = float(os.getenv("SESSION_PRUNE_INTERVAL", "60"))
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(16)
+
+class InMemorySessionStore:
+    """Per-process LRU of session histories with a sliding TTL."""
+
+    def __init__(self, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str):
+        """Stored messages for the session, or None if unknown/expired."""
+        with self._lock:
+            item = self._sessions.get(session_id)
+            if item is None:
+                return None
+            updated_at, messages = item
+            if time.time() - updated_at > self.ttl:
+                del self._sessions[session_id]
+                return None
+            self._sessions[session_id] = (time.time(), messages)
+            self._sessions.move_to_end(session_id)
+            return list(messages)
+
+    def set(self, session_id: str, messages):
+        with self._lock:
+            self._sessions[session_id] = (time.time(), list(messages))
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > self.max_entries:
+                self._sessions.popitem(last=False)
+
+    def delete(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def prune(self):
+        """Drop expired sessions (the LRU bound is kept on every set)."""
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for session_id in [sid for sid, (updated_at, _) in self._sessions.items() if updated_at < cutoff]:
+                del self._sessions[session_id]
+
+    def stats(self) -> dict:
+        return {"backend": "memory", "sessions": len(self._sessions)}
+
+class SQLiteSessionStore:
+    """Sessions serialised with messages_to_dict in a shared SQLite file (TTL + LRU bounded)."""
+
+    def __init__(self, path: str = SESSION_DB_PATH, ttl: float = SESSION_TTL,
+                 max_entries: int = SESSION_MAX_ENTRIES):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " id TEXT PRIMARY KEY,"
+                " messages TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_updated_at ON sessions(updated_at)")
+
+    def get(self, session_id: str):
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT messages, updated_at FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] > self.ttl:
+                self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+                return None
+            self._conn.execute("UPDATE sessions SET updated_at = ? WHERE id = ?", (now, session_id))
+        return messages_from_dict(json.loads(row[0]))
+
+    def set(self, session_id: str, messages):
+        payload = json.dumps(messages_to_dict(list(messages)))
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (id, messages, updated_at) VALUES (?, ?, ?)",
+                (session_id, payload, time.time()),
+            )
+
+    def prune(self):
+        """Drop expired sessions, then the least recently used beyond max_entries."""
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (time.time() - self.ttl,))
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+            if count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM sessions WHERE id IN "
+                    "(SELECT id FROM sessions ORDER BY updated_at ASC LIMIT ?)",
+                    (count - self.max_entries,),
+                )
+
+    def delete(self, session_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM sessions").fetchone()
+        return {"backend": "sqlite", "sessions": count}
+
+class CheckpointSessionStore:
+    """
+    Sessions as the agent graph's checkpoint threads (thread_id = session ID). The graph
+    checkpoints its own steps; set() closes a turn by replacing the thread's messages with the
+    trimmed history (an update_state as the "respond" node), so the next turn starts from it.
+    bind() must be given the compiled graph before set() is used.
+    """
+
+    def __init__(self, saver=None, ttl: float = SESSION_TTL, max_entries: int = SESSION_MAX_ENTRIES):
+        from checkpointer import SQLiteCheckpointSaver
+        self.saver = saver or SQLiteCheckpointSaver()
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.graph = None
+
+    def bind(self, graph):
+        self.graph = graph
+
+    @staticmethod
+    def _config(session_id: str) -> dict:
+        return {"configurable": {"thread_id": session_id, "checkpoint_ns": ""}}
+
+    def get(self, session_id: str):
+        config = self._config(session_id)
+        latest = self.saver.get_tuple(config)
+        if latest is None:
+            return None
+        if time.time() - datetime.fromisoformat(latest.checkpoint["ts"]).timestamp() > self.ttl:
+            self.saver.delete_thread(session_id)
+            return None
+        if latest.metadata.get("source") == "update":
+            return list(latest.checkpoint["channel_values"].get("messages", []))
+        # The last turn didn't finish (error, client went away mid-stream): its steps are still in
+        # the thread, so roll it back to the last completed turn before the next one starts from it
+        completed = next(self.saver.list(config, filter={"source": "update"}, limit=1), None)
+        messages = list(completed.checkpoint["channel_values"].get("messages", [])) if completed else []
+        self.set(session_id, messages)
+        return messages
+
+    def set(self, session_id: str, messages):
+        self.graph.update_state(
+            self._config(session_id),
+            {"messages": [RemoveMessage(id=REMOVE_ALL_MESSAGES), *messages]},
+            as_node="respond",
+        )
+
+    def delete(self, session_id: str):
+        self.saver.delete_thread(session_id)
+
+    def prune(self):
+        self.saver.prune(self.ttl, self.max_entries)
+
+    def stats(self) -> dict:
+        return {"backend": "checkpoint", "sessions": self.saver.thread_count()}
+
+_store = None
+
+def get_session_store():
+    """Process-wide session store for the configured SESSION_BACKEND."""
+    global _store
+    if _store is None:
+        if SESSION_BACKEND == "checkpoint":
+            _store = CheckpointSessionStore()
+        elif SESSION_BACKEND == "sqlite":
+            _store = SQLiteSessionStore()
+        else:
+            _store = InMemorySessionStore()
+    return _store
+
+def graph_checkpointer():
+    """Checkpointer to compile the agent graph with, or None when sessions live outside the graph."""
+    store = get_session_store()
+    return store.saver if isinstance(store, CheckpointSessionStore) else None
+
+async def prune_sessions(interval: float = SESSION_PRUNE_INTERVAL):
+    """Prune the session store every `interval` seconds (runs for the worker's lifetime)."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(get_session_store().prune)
+        except Exception:
+            log.exception("session pruning failed")
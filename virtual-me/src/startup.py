@@ -0,0 +1,112 @@
+"""
+Cold-start lifecycle: a startup profile plus the warm-up run by main's lifespan hook.
+
+The worker starts accepting connections straight away; warm-up runs in the background
+and builds the agent, then opens each outbound connection once (one retrieval for the
+embedding API and vector store, one short LLM call, a calendar token) and preloads the
+local index pages. /health/live answers as soon as the process serves HTTP;
+/health/ready returns 503 until warm-up has finished, so traffic is only routed to warm
+workers. Chat requests that arrive earlier wait for it instead of racing it.
+
+The profile records the import phase (measured from main's first line) and every
+warm-up step in milliseconds; it is logged once and served at /health/startup.
+WARMUP_LLM=0 skips the LLM call (it costs a few tokens per cold start).
+"""
+import os
+import time
+import asyncio
+from contextlib import contextmanager
+from structured_logging import get_logger
+
+log = get_logger("startup")
+
+WARMUP_LLM = os.getenv("WARMUP_LLM", "1").lower() not in ("0", "false", "no")
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "60"))
+
+class StartupProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+        self.errors = {}
+        self.ready = False
+        self.finished = False
+        self.ready_at = None
+        self._task = None
+
+    def record(self, name: str, started: float):
+        self.phases[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    @contextmanager
+    def phase(self, name: str, required: bool = False):
+        """Time a step; a failing optional step is recorded and skipped, a required one re-raised."""
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.errors[name] = str(e)
+            log.warning("warm-up step failed", step=name, error=str(e))
+            if required:
+                raise
+        finally:
+            self.record(name, started)
+
+    def finish(self, ready: bool):
+        self.ready = ready
+        self.finished = True
+        self.ready_at = round((time.perf_counter() - self.started) * 1000, 1)
+        log.info("startup profile", pid=os.getpid(), ready=ready, total_ms=self.ready_at, **self.phases)
+
+    def start(self, get_agent) -> asyncio.Task:
+        """Run warm_up in the background on the running loop."""
+        self._task = asyncio.create_task(warm_up(get_agent))
+        return self._task
+
+    async def wait(self, timeout: float = WARMUP_TIMEOUT):
+        """Wait (up to `timeout`) for a warm-up running on this loop to finish, successfully or not."""
+        task = self._task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            return
+        await asyncio.wait({task}, timeout=timeout)
+
+    def report(self) -> dict:
+        return {
+            "ready": self.ready,
+            "finished": self.finished,
+            "ready_ms": self.ready_at,
+            "phases_ms": dict(self.phases),
+            "errors": dict(self.errors),
+        }
+
+profile = StartupProfile()
+
+async def warm_up(get_agent):
+    """Build the agent and open its outbound connections; marks the profile ready on success."""
+    import langgraph_agent as la
+    from session_store import get_session_store
+    from langchain_core.messages import HumanMessage
+
+    try:
+        with profile.phase("agent", required=True):
+            agent = await asyncio.to_thread(get_agent)
+        with profile.phase("session_store"):
+            await asyncio.to_thread(get_session_store)
+        with profile.phase("local_index"):
+            # Fault the memory-mapped embedding matrix in now rather than on the first search
+            matrix = getattr(la.vector_store, "matrix", None)
+            if matrix is not None:
+                await asyncio.to_thread(lambda: float(matrix.sum()))
+        if la.vector_store is not None:  # None when the corpus is served in context
+            with profile.phase("retrieval"):
+                # Embedding API + vector store round trip (TLS handshakes, index metadata)
+                await la.vector_store.asimilarity_search("warm-up", k=1)
+        if WARMUP_LLM:
+            with profile.phase("llm"):
+                await la.answer_llm.ainvoke([HumanMessage(content="Reply with OK.")])
+        if os.getenv("GCP_SERVICE_ACCOUNT_JSON"):
+            with profile.phase("calendar"):
+                from google_calender_tools import get_calendar_service
+                await asyncio.to_thread(get_calendar_service)
+        profile.finish(agent is not None)
+    except Exception:
+        log.exception("warm-up failed")
+        profile.finish(False)
@@ -0,0 +1,101 @@
+"""Incremental delivery of agent turns as UI frames (tokens, tool activity, final answer)."""
+from intent_router import NEEDS_RETRIEVAL
+from wire import dumps_json
+
+MEETING_TRIGGER = "[TRIGGER:MEETING_FLOW]"
+
+def extract_action(response_text: str):
+    """Strip the meeting trigger from a response and return (text, action)."""
+    if MEETING_TRIGGER in response_text:
+        return response_text.replace(MEETING_TRIGGER, "").strip(), "suggest_meeting"
+    return response_text, None
+
+def build_message_payload(result: dict, default_response: str = "I apologize, but I encountered an error.") -> dict:
+    """Build the final `message` frame sent to the frontend from a finished agent state."""
+    response_text, action = extract_action(result.get("response", default_response))
+    payload = {
+        "response": response_text,
+        "thinking": result.get("thinking", ""),
+        "type": "message"
+    }
+    if action:
+        payload["action"] = action
+    return payload
+
+def _chunk_text(chunk) -> str:
+    """Text carried by a streamed chat model chunk (Gemini may send a list of parts)."""
+    content = getattr(chunk, "content", "")
+    if isinstance(content, str):
+        return content
+    parts = []
+    for part in content or []:
+        if isinstance(part, str):
+            parts.append(part)
+        elif isinstance(part, dict) and part.get("type") == "text":
+            parts.append(part.get("text", ""))
+    return "".join(parts)
+
+class AgentTurnStream:
+    """
+    Runs one agent turn through the compiled graph's event API and yields frames as they happen:
+
+        {"type": "token", "content": "..."}            partial LLM output
+        {"type": "tool_start", "tool": "...", "input": {...}}
+        {"type": "tool_end", "tool": "..."}
+        {"type": "action", "action": "suggest_meeting"}
+        {"type": "message", "response": "...", ...}    same payload as the non-streaming path
+
+    The final graph state is available on `final_state` once iteration finishes.
+    """
+
+    def __init__(self, agent, state: dict, config: dict = None):
+        self.agent = agent
+        self.state = state
+        self.config = config
+        self.final_state = None
+
+    async def frames(self):
+        # Agents wrapped in a response cache can answer without running the graph
+        lookup = getattr(self.agent, "alookup_cached", None)
+        cached = await lookup(self.state) if lookup is not None else None
+
+        if cached is not None:
+            self.final_state = cached
+        else:
+            async for frame in self._graph_frames():
+                yield frame
+            store = getattr(self.agent, "astore_result", None)
+            if store is not None:
+                await store(self.state, self.final_state)
+
+        payload = build_message_payload(self.final_state or {})
+        if payload.get("action"):
+            yield {"type": "action", "action": payload["action"]}
+        yield payload
+
+    async def _graph_frames(self):
+        held = ""  # routed-answer tokens that may still turn out to be the NEEDS_RETRIEVAL fallback
+        async for event in self.agent.astream_events(self.state, config=self.config, version="v2"):
+            kind = event["event"]
+            if kind == "on_chat_model_stream":
+                text = _chunk_text(event["data"].get("chunk"))
+                if text and event.get("metadata", {}).get("langgraph_node") == "answer" and held is not None:
+                    held += text
+                    if NEEDS_RETRIEVAL.startswith(held.strip()):
+                        continue
+                    text, held = held, None
+                if text:
+                    yield {"type": "token", "content": text}
+            elif kind == "on_chain_end" and event["name"] == "answer":
+                held = ""
+            elif kind == "on_tool_start":
+                yield {"type": "tool_start", "tool": event["name"], "input": event["data"].get("input")}
+            elif kind == "on_tool_end":
+                yield {"type": "tool_end", "tool": event["name"]}
+            elif kind == "on_chain_end" and not event.get("parent_ids"):
+                # Root graph finished: its output is the full final state
+                self.final_state = event["data"].get("output") or {}
+
+def to_sse(frame: dict) -> str:
+    """Encode a frame as a Server-Sent-Events message."""
+    return f"event: {frame.get('type', 'message')}\ndata: {dumps_json(frame).decode()}\n\n"
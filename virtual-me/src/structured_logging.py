@@ -0,0 +1,91 @@
+"""
+Non-blocking structured logging.
+
+Log records are put on an in-memory queue by the calling thread (the event loop never
+waits on stderr) and written by a background QueueListener, one JSON object per line:
+
+    {"ts": "...", "level": "info", "logger": "main", "event": "ws message received", "chars": 42}
+
+LOG_FORMAT=text gives a human-readable line instead; LOG_LEVEL sets the threshold.
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()  # "json" | "text"
+ROOT_LOGGER = "virtual_me"
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname.lower(),
+            "logger": record.name.removeprefix(f"{ROOT_LOGGER}."),
+            "event": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        fields = " ".join(f"{k}={v}" for k, v in getattr(record, "fields", {}).items())
+        line = f"{record.levelname:<7} {record.name.removeprefix(f'{ROOT_LOGGER}.')}: {record.getMessage()}"
+        line = f"{line} {fields}" if fields else line
+        if record.exc_text:
+            line = f"{line}\n{record.exc_text}"
+        return line
+
+class _QueueHandler(QueueHandler):
+    """Keeps the record structured: only the message and traceback are rendered before queueing."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class StructuredLogger(logging.LoggerAdapter):
+    """`log.info("event", key=value, ...)`: keyword arguments become fields of the record."""
+
+    def process(self, msg, kwargs):
+        fields = {k: kwargs.pop(k) for k in list(kwargs) if k not in ("exc_info", "stack_info", "stacklevel", "extra")}
+        kwargs["extra"] = {**kwargs.get("extra", {}), "fields": fields}
+        return msg, kwargs
+
+_listener = None
+_configure_lock = threading.Lock()
+
+def configure_logging():
+    """Route the app's loggers through a queue to a background writer (idempotent)."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            return
+        records = queue.SimpleQueue()
+        stream = logging.StreamHandler(sys.stderr)
+        stream.setFormatter(TextFormatter() if LOG_FORMAT == "text" else JSONFormatter())
+        _listener = QueueListener(records, stream, respect_handler_level=False)
+        _listener.start()
+        atexit.register(_listener.stop)
+
+        root = logging.getLogger(ROOT_LOGGER)
+        root.setLevel(LOG_LEVEL)
+        root.addHandler(_QueueHandler(records))
+        root.propagate = False
+
+def get_logger(name: str) -> StructuredLogger:
+    configure_logging()
+    return StructuredLogger(logging.getLogger(f"{ROOT_LOGGER}.{name}"), {})
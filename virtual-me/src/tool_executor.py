@@ -0,0 +1,208 @@
+"""
+Tool stage of the agent graph: runs every tool call of one LLM response concurrently,
+each with its own timeout.
+
+A call that times out is answered with an error ToolMessage so the model can recover;
+the call itself is left to finish in the background (a blocking tool running in a thread
+can't be interrupted anyway). TOOL_TIMEOUT is the default per-call limit and
+TOOL_TIMEOUTS overrides it per tool, e.g. "retrieve_context=5,list_available_slots=10".
+
+Speculation holds retrievals started before the LLM has decided to call
+retrieve_context (SPECULATIVE_RETRIEVAL=1, see langgraph_agent.athink_node). When the
+model's retrieve_context call, without filters, asks for the user's message, part of it
+or the message with words added (one normalised query's words contain the other's), the
+tools stage answers it from the speculative result instead of searching again; the call
+is still reported to the callbacks like any tool run. A speculation the turn never used
+is cancelled when the turn releases its agent slot, whether it finished, failed or was
+cancelled.
+"""
+import os
+import asyncio
+import secrets
+from collections import OrderedDict
+from concurrent.futures import TimeoutError as FutureTimeout
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+from langchain_core.runnables.config import ContextThreadPoolExecutor, get_async_callback_manager_for_config
+from concurrency import on_turn_end
+from metrics import TOOL_CALLS, SPECULATIVE_RETRIEVALS
+from response_cache import normalize_query
+from structured_logging import get_logger
+
+log = get_logger("tools")
+
+TOOL_TIMEOUT = float(os.getenv("TOOL_TIMEOUT", "20"))
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "16"))
+SPECULATIVE_RETRIEVAL = os.getenv("SPECULATIVE_RETRIEVAL", "0").lower() in ("1", "true", "yes")
+SPECULATION_MAX_PENDING = 256
+
+def parse_timeouts(value: str) -> dict:
+    """"name=seconds,..." -> {name: seconds}"""
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, _, seconds = item.partition("=")
+        timeouts[name.strip()] = float(seconds)
+    return timeouts
+
+TOOL_TIMEOUTS = parse_timeouts(os.getenv("TOOL_TIMEOUTS", ""))
+
+# Timed-out calls still running; referenced here so they aren't garbage collected
+_background = set()
+
+class Speculation:
+    """Speculative retrieval tasks (and the query each searches), keyed by an ID the graph state carries from think to tools."""
+
+    def __init__(self, max_pending: int = SPECULATION_MAX_PENDING):
+        self.max_pending = max_pending
+        self._tasks = OrderedDict()
+
+    def start(self, coro, query: str) -> str:
+        """
+        Schedule `coro`, a search for `query`, on the running loop; returns its speculation ID.
+        The speculation is discarded when the current turn ends if nothing took it.
+        """
+        speculation_id = secrets.token_hex(8)
+        self._tasks[speculation_id] = (asyncio.ensure_future(coro), normalize_query(query))
+        on_turn_end(lambda: self.discard(speculation_id))
+        while len(self._tasks) > self.max_pending:
+            _, (task, _) = self._tasks.popitem(last=False)
+            task.cancel()
+        return speculation_id
+
+    def take(self, speculation_id: str):
+        """(task, normalised query) for `speculation_id` (removed from the table), or None."""
+        return self._tasks.pop(speculation_id, None) if speculation_id else None
+
+    def discard(self, speculation_id: str):
+        """Cancel a speculation the model didn't need."""
+        taken = self.take(speculation_id)
+        if taken is not None:
+            taken[0].cancel()
+            SPECULATIVE_RETRIEVALS.inc(outcome="discarded")
+
+    def stats(self) -> dict:
+        return {"pending": len(self._tasks)}
+
+speculation = Speculation()
+
+def _error_message(call: dict, text: str) -> ToolMessage:
+    return ToolMessage(content=text, name=call["name"], tool_call_id=call["id"], status="error")
+
+def _as_message(call: dict, output) -> ToolMessage:
+    if isinstance(output, ToolMessage):
+        return output
+    return ToolMessage(content=str(output), name=call["name"], tool_call_id=call["id"])
+
+class ParallelToolExecutor:
+    """
+    Graph node running the last AI message's tool calls concurrently. Returns the
+    ToolMessages in the order of the calls, like the prebuilt ToolNode.
+    """
+
+    def __init__(self, tools, timeout: float = TOOL_TIMEOUT, timeouts: dict = None, workers: int = TOOL_WORKERS):
+        self.tools = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.timeouts = dict(TOOL_TIMEOUTS if timeouts is None else timeouts)
+        self.workers = workers
+        self._pool = None
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.timeout)
+
+    @staticmethod
+    def _tool_calls(state) -> list:
+        message = state["messages"][-1]
+        return list(message.tool_calls) if isinstance(message, AIMessage) else []
+
+    def _timed_out(self, call: dict) -> ToolMessage:
+        TOOL_CALLS.inc(tool=call["name"], status="timeout")
+        log.warning("tool call timed out", tool=call["name"], timeout=self.timeout_for(call["name"]))
+        return _error_message(call, f"Error: {call['name']} timed out after {self.timeout_for(call['name']):g}s. "
+                                    "Tell the user it is taking too long and offer to try again.")
+
+    def _failed(self, call: dict, error: Exception) -> ToolMessage:
+        log.warning("tool call failed", tool=call["name"], error=str(error))
+        return _error_message(call, f"Error: {error!r}\n Please fix your mistakes.")
+
+    # --- sync path (graph.invoke)
+
+    def _run_one(self, call: dict, config: RunnableConfig):
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            return _error_message(call, f"Error: {call['name']} is not a valid tool, try one of {sorted(self.tools)}.")
+        return _as_message(call, tool.invoke({**call, "type": "tool_call"}, config))
+
+    def invoke(self, state, config: RunnableConfig) -> dict:
+        calls = self._tool_calls(state)
+        if self._pool is None:
+            self._pool = ContextThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="tool")
+        futures = [self._pool.submit(self._run_one, call, config) for call in calls]
+        messages = []
+        for call, future in zip(calls, futures):
+            try:
+                messages.append(future.result(timeout=self.timeout_for(call["name"])))
+            except FutureTimeout:
+                messages.append(self._timed_out(call))
+            except Exception as e:
+                messages.append(self._failed(call, e))
+        return {"messages": messages}
+
+    # --- async path (graph.ainvoke / astream_events)
+
+    @staticmethod
+    async def _reuse(call: dict, config: RunnableConfig, speculative):
+        """The speculative result for `call`, reported to the callbacks as a run of the tool."""
+        run_manager = await get_async_callback_manager_for_config(config).on_tool_start(
+            {"name": call["name"]}, str(call["args"]), name=call["name"], inputs=call["args"],
+            tool_call_id=call["id"])
+        try:
+            output = await speculative
+        except BaseException as e:
+            await run_manager.on_tool_error(e)
+            raise
+        await run_manager.on_tool_end(output, name=call["name"])
+        return output
+
+    @staticmethod
+    def _matches(call: dict, query: str) -> bool:
+        """An unfiltered retrieve_context call whose query words contain, or are contained in, the speculated query's."""
+        args = call["args"]
+        if call["name"] != "retrieve_context" or args.get("section") or args.get("technology"):
+            return False
+        words, speculated = set(normalize_query(str(args.get("query", ""))).split()), set(query.split())
+        return bool(words) and (words <= speculated or speculated <= words)
+
+    async def _arun_one(self, call: dict, config: RunnableConfig, speculative=None) -> ToolMessage:
+        if speculative is not None:
+            task = asyncio.ensure_future(self._reuse(call, config, speculative))
+        else:
+            tool = self.tools.get(call["name"])
+            if tool is None:
+                return _error_message(call, f"Error: {call['name']} is not a valid tool, try one of {sorted(self.tools)}.")
+            task = asyncio.ensure_future(tool.ainvoke({**call, "type": "tool_call"}, config))
+        done, _ = await asyncio.wait({task}, timeout=self.timeout_for(call["name"]))
+        if not done:
+            _background.add(task)
+            task.add_done_callback(_background.discard)
+            return self._timed_out(call)
+        try:
+            return _as_message(call, task.result())
+        except Exception as e:
+            return self._failed(call, e)
+
+    async def ainvoke(self, state, config: RunnableConfig) -> dict:
+        calls = self._tool_calls(state)
+        speculative, query = speculation.take(state.get("speculation_id")) or (None, None)
+        runs = []
+        for call in calls:
+            # The speculative search was for the raw user message: reuse it for queries close to it
+            if speculative is not None and self._matches(call, query):
+                runs.append(self._arun_one(call, config, speculative))
+                SPECULATIVE_RETRIEVALS.inc(outcome="used")
+                speculative = None
+            else:
+                runs.append(self._arun_one(call, config))
+        if speculative is not None:
+            speculative.cancel()
+            SPECULATIVE_RETRIEVALS.inc(outcome="discarded")
+        return {"messages": list(await asyncio.gather(*runs)), "speculation_id": ""}
@@ -1,41 +1,42 @@
 import os
-import json
 from pinecone import Pinecone as PineconeClient, ServerlessSpec
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
 from langchain_pinecone import Pinecone
 from dotenv import load_dotenv
+from local_index import save_local_index, LOCAL_INDEX_DIR, LOCAL_INDEX_QUANTIZATION
+from embedding_cache import get_embedding_cache
+from reduced_embeddings import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, gemini_embeddings
+from index_sync import MANIFEST_PATH, save_manifest
+from ingest import DEFAULT_SOURCES, INGEST_WORKERS, INGEST_BATCH_SIZE, ingest_to_index, embed_corpus
 
 # Load environment variables from .env file
 load_dotenv()
 
-def setup_vector_store():
-    """
-    Initializes embeddings, connects to Pinecone, and uploads processed
-    document chunks to the vector store.
+def report_cache_stats():
+    cache = get_embedding_cache()
+    if cache is not None:
+        stats = cache.stats()
+        print(f"Embedding cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries stored.")
+
+def setup_vector_store(rebuild: bool = False, sources=DEFAULT_SOURCES,
+                       workers: int = INGEST_WORKERS, batch_size: int = INGEST_BATCH_SIZE):
     """
-    # 1. Load the pre-processed chunks from the JSON file
-    chunks_path = os.path.join('data', 'processed_chunks.json')
-    try:
-        with open(chunks_path, 'r') as f:
-            chunks = json.load(f)
-        if not chunks:
-            print("Error: The 'processed_chunks.json' file is empty. Please run 'Process_document.py' first.")
-            return None
-        print(f"Loaded {len(chunks)} chunks from '{chunks_path}'")
-    except FileNotFoundError:
-        print(f"Error: The file '{chunks_path}' was not found. Please run 'src/Process_document.py' first to generate it.")
-        return None
+    Initializes embeddings, connects to Pinecone, and streams the source documents
+    through the ingestion pipeline into the vector store.
 
-    # 2. Initialize Google Gemini Embeddings
+    By default the index is synced incrementally: only chunks whose content changed are
+    embedded and upserted, and chunks that no longer exist are deleted. Pass rebuild=True
+    to delete and recreate the index from scratch (e.g. after an embedding model change).
+    """
+    # 1. Initialize Google Gemini Embeddings
     # This will automatically use the GOOGLE_API_KEY from your .env file
     try:
-        embeddings = GoogleGenerativeAIEmbeddings(model="models/gemini-embedding-001")
+        embeddings = gemini_embeddings()
     except Exception as e:
         print(f"Error initializing Gemini Embeddings: {e}")
         print("Please ensure your GOOGLE_API_KEY is set correctly in the .env file.")
         return None
 
-    # 3. Initialize Pinecone client
+    # 2. Initialize Pinecone client
     pinecone_api_key = os.getenv("PINECONE_API_KEY")
     pinecone_index_name = os.getenv("PINECONE_INDEX")
 
@@ -45,15 +46,23 @@ def setup_vector_store():
 
     pc = PineconeClient(api_key=pinecone_api_key)
 
-    # 4. Delete existing index if present (dimension may have changed)
+    # 3072 by default; EMBEDDING_DIMENSIONS truncates (changing it needs --rebuild)
+    embedding_dimension = EMBEDDING_DIMENSIONS
     existing_indexes = pc.list_indexes().names()
-    if pinecone_index_name in existing_indexes:
+
+    # 3. Delete existing index only when a full rebuild is requested
+    if rebuild and pinecone_index_name in existing_indexes:
         print(f"Deleting existing index '{pinecone_index_name}' to ensure clean rebuild...")
         pc.delete_index(pinecone_index_name)
+        save_manifest({"index": pinecone_index_name, "ids": {}}, MANIFEST_PATH)
         print("Deleted.")
+    elif pinecone_index_name in existing_indexes:
+        existing_dimension = pc.describe_index(pinecone_index_name).dimension
+        if existing_dimension != embedding_dimension:
+            print(f"Error: index '{pinecone_index_name}' has dimension {existing_dimension}, "
+                  f"expected {embedding_dimension}. Re-run with --rebuild.")
+            return None
 
-    # gemini-embedding-001 outputs 3072 dimensions by default
-    embedding_dimension = 3072 
     if pinecone_index_name not in pc.list_indexes().names():
         print(f"Creating new Pinecone index: '{pinecone_index_name}' with dimension {embedding_dimension}...")
         pc.create_index(
@@ -67,17 +76,43 @@ def setup_vector_store():
         )
         print("Index created successfully.")
 
-    # 5. Store documents in the vector DB
-    print("Uploading document chunks to Pinecone...")
-    vector_store = Pinecone.from_texts(
-        texts=chunks,
-        embedding=embeddings,
-        index_name=pinecone_index_name
-    )
-    print(f"Successfully stored {len(chunks)} embeddings in Pinecone.")
+    # 4. Stream chunks into the vector DB (unchanged chunks are skipped)
+    print("Ingesting document chunks into Pinecone...")
+    ingest_to_index(pc.Index(pinecone_index_name), pinecone_index_name, embeddings, sources,
+                    workers=workers, batch_size=batch_size)
+    vector_store = Pinecone(index_name=pinecone_index_name, embedding=embeddings)
+    report_cache_stats()
     return vector_store
 
+def build_local_index(index_dir: str = LOCAL_INDEX_DIR, sources=DEFAULT_SOURCES,
+                      workers: int = INGEST_WORKERS, batch_size: int = INGEST_BATCH_SIZE):
+    """
+    Embeds the source documents and writes them as an in-process index
+    (used when RETRIEVER_BACKEND=local), quantized per LOCAL_INDEX_QUANTIZATION.
+    """
+    try:
+        embeddings = gemini_embeddings()
+    except Exception as e:
+        print(f"Error initializing Gemini Embeddings: {e}")
+        return None
+
+    print("Embedding document chunks for the local index...")
+    texts, vectors, metadatas = embed_corpus(embeddings, sources, workers=workers, batch_size=batch_size)
+    if not texts:
+        print("Error: no chunks were produced from the given sources.")
+        return None
+    save_local_index(texts, vectors, EMBEDDING_MODEL, index_dir, metadatas=metadatas)
+    print(f"Successfully wrote {len(texts)} embeddings ({EMBEDDING_DIMENSIONS}-d, "
+          f"{LOCAL_INDEX_QUANTIZATION} search matrix) to '{index_dir}'.")
+    report_cache_stats()
+    return index_dir
+
 # This block allows the script to be run directly to set up the database
+# (same as `python src/ingest.py`, which also accepts source files and --target)
 if __name__ == "__main__":
-    setup_vector_store()
-
+    import sys
+    from ingest import main
+    argv = sys.argv[1:]
+    if "--local" in argv:
+        argv = [a for a in argv if a != "--local"] + ["--target", "local"]
+    main(argv)
@@ -0,0 +1,136 @@
+"""
+Wire formats for /ws/chat frames and message deltas.
+
+A websocket client that offers the "virtual-me.msgpack" subprotocol gets binary frames in
+both directions: one flag byte (0 = MessagePack, 1 = zstd-compressed MessagePack) followed
+by the payload. Frames of at least WIRE_COMPRESS_MIN_BYTES are compressed when that makes
+them smaller. Other clients keep JSON text frames (encoded with orjson). A compressed
+client frame must declare its decompressed size, at most WIRE_MAX_FRAME_BYTES; other frames
+are rejected (FrameTooLarge) and the connection is closed with 1009.
+
+Message deltas carry only the messages a turn added, in the compact role/content form
+that the `history` field of /api/chat accepts back:
+
+    {"role": "user" | "assistant" | "tool" | "system", "content": "...",
+     "tool_calls": [...], "tool_call_id": "...", "name": "..."}   (last three when set)
+"""
+import os
+import orjson
+import ormsgpack
+import zstandard
+from fastapi import WebSocket, WebSocketDisconnect
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+MSGPACK_SUBPROTOCOL = "virtual-me.msgpack"
+WIRE_COMPRESS_MIN_BYTES = int(os.getenv("WIRE_COMPRESS_MIN_BYTES", "1024"))
+WIRE_COMPRESSION_LEVEL = int(os.getenv("WIRE_COMPRESSION_LEVEL", "3"))
+# Largest decompressed client frame; uvicorn's default websocket message size limit
+WIRE_MAX_FRAME_BYTES = int(os.getenv("WIRE_MAX_FRAME_BYTES", str(16 * 1024 * 1024)))
+
+# Websocket close code for a message too big to process
+MESSAGE_TOO_BIG = 1009
+
+RAW = b"\x00"
+ZSTD = b"\x01"
+
+class FrameTooLarge(ValueError):
+    """A client frame that would decompress past the limit (or doesn't say how large it is)."""
+
+def _default(obj):
+    # Tool inputs and the like may hold values JSON/MessagePack can't encode natively
+    return str(obj)
+
+def dumps_json(obj) -> bytes:
+    return orjson.dumps(obj, default=_default)
+
+class JsonCodec:
+    """JSON text frames (the default protocol)."""
+
+    subprotocol = None
+
+    def encode(self, frame: dict) -> str:
+        return dumps_json(frame).decode()
+
+    def decode(self, data) -> dict:
+        return orjson.loads(data)
+
+    async def send(self, websocket: WebSocket, frame: dict):
+        await websocket.send_text(self.encode(frame))
+
+class MsgpackCodec(JsonCodec):
+    """Binary MessagePack frames with per-message zstd compression."""
+
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def __init__(self, compress_min_bytes: int = WIRE_COMPRESS_MIN_BYTES, level: int = WIRE_COMPRESSION_LEVEL,
+                 max_frame_bytes: int = WIRE_MAX_FRAME_BYTES):
+        self.compress_min_bytes = compress_min_bytes
+        self.max_frame_bytes = max_frame_bytes
+        self._compressor = zstandard.ZstdCompressor(level=level)
+        self._decompressor = zstandard.ZstdDecompressor()
+
+    def encode(self, frame: dict) -> bytes:
+        payload = ormsgpack.packb(frame, default=_default)
+        if self.compress_min_bytes and len(payload) >= self.compress_min_bytes:
+            compressed = self._compressor.compress(payload)
+            if len(compressed) < len(payload):
+                return ZSTD + compressed
+        return RAW + payload
+
+    def decode(self, data) -> dict:
+        if isinstance(data, str):
+            # Text frames stay JSON on every protocol
+            return orjson.loads(data)
+        flag, payload = data[:1], data[1:]
+        if flag == ZSTD:
+            payload = self._decompress(payload)
+        elif flag != RAW:
+            raise ValueError(f"unknown frame flag {flag!r}")
+        return ormsgpack.unpackb(payload)
+
+    def _decompress(self, payload: bytes) -> bytes:
+        # Check the declared size first: decompress() allocates it up front
+        try:
+            size = zstandard.get_frame_parameters(payload).content_size
+        except zstandard.ZstdError as e:
+            raise ValueError(f"invalid zstd frame: {e}") from None
+        if size == zstandard.CONTENTSIZE_UNKNOWN:
+            raise FrameTooLarge("compressed frame without a content size")
+        if size > self.max_frame_bytes:
+            raise FrameTooLarge(f"frame decompresses to {size} bytes (limit {self.max_frame_bytes})")
+        return self._decompressor.decompress(payload, max_output_size=self.max_frame_bytes)
+
+    async def send(self, websocket: WebSocket, frame: dict):
+        await websocket.send_bytes(self.encode(frame))
+
+def negotiate(websocket: WebSocket):
+    """Codec for the subprotocols the client offered; pass its .subprotocol to accept()."""
+    if MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", []):
+        return MsgpackCodec()
+    return JsonCodec()
+
+async def receive_frame(websocket: WebSocket, codec) -> dict:
+    """Next client frame, text or binary; raises WebSocketDisconnect when the client leaves."""
+    message = await websocket.receive()
+    if message["type"] == "websocket.disconnect":
+        raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+    data = message.get("bytes")
+    return codec.decode(data if data is not None else message.get("text", ""))
+
+_ROLES = ((HumanMessage, "user"), (AIMessage, "assistant"), (ToolMessage, "tool"), (SystemMessage, "system"))
+
+def compact_message(message) -> dict:
+    """Role/content dict for a LangChain message (accepted back as a history entry)."""
+    role = next((name for cls, name in _ROLES if isinstance(message, cls)), message.type)
+    item = {"role": role, "content": message.content}
+    if isinstance(message, AIMessage) and message.tool_calls:
+        item["tool_calls"] = [{"name": c["name"], "args": c["args"], "id": c["id"]} for c in message.tool_calls]
+    if isinstance(message, ToolMessage):
+        item["tool_call_id"] = message.tool_call_id
+        if message.name:
+            item["name"] = message.name
+    return item
+
+def message_delta(messages, previous_count: int) -> list:
+    """Compact form of the messages a turn appended to a history of `previous_count` messages."""
+    return [compact_message(m) for m in messages[previous_count:]]
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The app's modules are imported flat from src/, as main.py does
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
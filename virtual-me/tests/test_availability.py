@@ -0,0 +1,87 @@
+import time
+import threading
+from datetime import date, datetime, timezone
+
+import pytest
+
+from availability import AvailabilityCache, IntervalSet, work_window
+
+def at(hour, minute=0):
+    return datetime(2026, 3, 2, hour, minute, tzinfo=timezone.utc)
+
+def test_overlapping_and_touching_intervals_merge():
+    busy = IntervalSet([(at(10), at(11)), (at(10, 30), at(12)), (at(12), at(12, 30)), (at(14), at(15))])
+    assert busy.intervals == [(at(10), at(12, 30)), (at(14), at(15))]
+    # Empty intervals are ignored
+    busy.add(at(16), at(16))
+    assert len(busy.intervals) == 2
+
+def test_gaps_within_a_window():
+    busy = IntervalSet([(at(8), at(9, 30)), (at(11), at(12)), (at(16, 45), at(18))])
+    assert busy.gaps(at(9), at(17)) == [(at(9, 30), at(11)), (at(12), at(16, 45))]
+
+def test_free_slots_are_aligned_to_the_slot_grid():
+    start, end = work_window(date(2026, 3, 2))
+    busy = IntervalSet([(at(9), at(10, 10)), (at(11), at(15))])
+    assert busy.free_slots(start, end) == [at(10, 30), at(15), at(15, 30), at(16), at(16, 30)]
+    assert IntervalSet().free_slots(at(9), at(10), minutes=60) == [at(9)]
+    assert IntervalSet([(at(9), at(17))]).free_slots(start, end) == []
+
+def test_missing_days_are_fetched_in_one_request():
+    calls = []
+
+    def fetch_busy(time_min, time_max):
+        calls.append((time_min, time_max))
+        return [{"start": "2026-03-03T10:00:00Z", "end": "2026-03-03T11:00:00Z"}]
+
+    cache = AvailabilityCache(fetch_busy, ttl=60)
+    days = [date(2026, 3, 2), date(2026, 3, 3), date(2026, 3, 4)]
+    slots = cache.free_slots(days)
+    assert calls == [("2026-03-02T09:00:00Z", "2026-03-04T17:00:00Z")]
+    assert len(slots[date(2026, 3, 2)]) == 16 and len(slots[date(2026, 3, 3)]) == 14
+
+    cache.free_slots(days[1:])
+    assert len(calls) == 1 and cache.hits == 2
+
+def test_concurrent_misses_share_one_fetch():
+    calls, started, release = [], threading.Event(), threading.Event()
+
+    def fetch_busy(time_min, time_max):
+        calls.append((time_min, time_max))
+        started.set()
+        release.wait(5)
+        return [{"start": "2026-03-02T10:00:00Z", "end": "2026-03-02T11:00:00Z"}]
+
+    cache = AvailabilityCache(fetch_busy, ttl=60)
+    day = date(2026, 3, 2)
+    results = []
+    leader = threading.Thread(target=lambda: results.append(cache.free_slots([day])))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(cache.free_slots([day]))) for _ in range(3)]
+    for thread in followers:
+        thread.start()
+    deadline = time.monotonic() + 5
+    while cache.stats()["shared"] < 3 and time.monotonic() < deadline:
+        time.sleep(0.001)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+    assert len(calls) == 1
+    assert len(results) == 4 and all(len(r[day]) == 14 for r in results)
+
+def test_failed_fetch_reaches_waiters_and_is_retried():
+    calls = []
+
+    def fetch_busy(time_min, time_max):
+        calls.append(time_min)
+        if len(calls) == 1:
+            raise TimeoutError("calendar timed out")
+        return []
+
+    cache = AvailabilityCache(fetch_busy, ttl=60)
+    with pytest.raises(TimeoutError):
+        cache.free_slots([date(2026, 3, 2)])
+    # Nothing is left in flight, so the next call fetches again
+    assert len(cache.free_slots([date(2026, 3, 2)])[date(2026, 3, 2)]) == 16
+    assert len(calls) == 2
@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+
+import google_calender_tools as gct
+
+START = "2026-02-12T10:00:00Z"
+
+class Conflict(Exception):
+    resp = SimpleNamespace(status=409)
+
+class FakeEvents:
+    """events() of a calendar holding `existing` ({event ID: status})."""
+
+    def __init__(self, existing):
+        self.existing = existing
+        self.inserted = []
+
+    def insert(self, calendarId, body):
+        def execute():
+            if body["id"] in self.existing:
+                raise Conflict()
+            self.existing[body["id"]] = "tentative"
+            self.inserted.append(body["id"])
+        return SimpleNamespace(execute=execute)
+
+    def get(self, calendarId, eventId):
+        return SimpleNamespace(execute=lambda: {"id": eventId, "status": self.existing[eventId]})
+
+def _insert(monkeypatch, existing):
+    events = FakeEvents(existing)
+    monkeypatch.setattr(gct, "get_calendar_service", lambda: SimpleNamespace(events=lambda: events))
+    gct.insert_event({"summary": "Meeting"}, "Guest@example.com", START)
+    return events
+
+def test_retried_insert_does_not_create_a_second_event(monkeypatch):
+    first = gct.meeting_event_id("guest@example.com", START)
+    events = _insert(monkeypatch, {first: "tentative"})
+    assert events.inserted == []
+
+def test_cancelled_request_does_not_block_a_new_one(monkeypatch):
+    first = gct.meeting_event_id("guest@example.com", START)
+    events = _insert(monkeypatch, {first: "cancelled"})
+    assert events.inserted == [gct.meeting_event_id("guest@example.com", START, attempt=1)]
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from concurrency import AdmissionController, Overloaded, RateLimiter
+
+def test_rate_limiter_allows_a_burst_then_limits():
+    limiter = RateLimiter(rate=1, burst=3)
+    for _ in range(3):
+        limiter.check("client")
+    with pytest.raises(Overloaded) as excinfo:
+        limiter.check("client")
+    assert excinfo.value.reason == "rate_limited"
+    assert 0 < excinfo.value.retry_after <= 1
+    # Buckets are per client
+    limiter.check("other-client")
+
+def test_rate_limiter_disabled_and_bounded():
+    assert RateLimiter(rate=0, burst=1).acquire("client", cost=100) == 0.0
+    limiter = RateLimiter(rate=1, burst=1, max_clients=2)
+    for key in ("a", "b", "c"):
+        limiter.acquire(key)
+    assert limiter.stats()["clients"] == 2
+
+def test_admission_rejects_when_the_queue_is_full():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+
+        async def turn():
+            async with admission.slot():
+                await release.wait()
+
+        running = asyncio.create_task(turn())
+        while not admission.in_flight:
+            await asyncio.sleep(0)
+        queued = asyncio.create_task(turn())
+        while not admission.queued:
+            await asyncio.sleep(0)
+        assert admission.stats()["in_flight"] == 1 and admission.stats()["queued"] == 1
+        with pytest.raises(Overloaded) as excinfo:
+            async with admission.slot():
+                pass
+        assert excinfo.value.reason == "queue_full"
+        release.set()
+        await asyncio.gather(running, queued)
+        assert admission.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+def test_admission_times_out_queued_turns():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.01)
+        async with admission.slot():
+            with pytest.raises(Overloaded) as excinfo:
+                async with admission.slot():
+                    pass
+        assert excinfo.value.reason == "queue_timeout"
+        assert admission.stats()["queued"] == 0
+
+    asyncio.run(scenario())
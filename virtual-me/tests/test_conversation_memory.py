@@ -0,0 +1,78 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from conversation_memory import SUMMARY_ID, TOOL_STUB_CHARS, ConversationMemory, LLMSummarizer, count_tokens
+from resilience import Dependency
+
+def _turn(n, context_chars=2000):
+    return [
+        HumanMessage(f"question {n}"),
+        AIMessage("", tool_calls=[{"name": "retrieve_context", "args": {"query": f"q{n}"}, "id": f"call_{n}"}]),
+        ToolMessage("x" * context_chars, tool_call_id=f"call_{n}", name="retrieve_context"),
+        AIMessage(f"answer {n}"),
+    ]
+
+class RecordingSummarizer:
+    def __init__(self):
+        self.calls = []
+
+    def summarize(self, summary, messages):
+        self.calls.append(messages)
+        return f"{summary} {len(messages)} messages".strip()
+
+def test_current_turn_is_kept_whole_and_older_tool_output_stubbed():
+    messages = _turn(1) + _turn(2)
+    trimmed = ConversationMemory(token_budget=10_000).trim_history(messages)
+    assert len(trimmed) == len(messages)
+    assert len(trimmed[2].content) < 2000 and trimmed[2].content.startswith("x" * TOOL_STUB_CHARS)
+    assert trimmed[-2].content == "x" * 2000
+
+def test_oldest_turns_are_dropped_over_budget():
+    system = SystemMessage("You are Rishab's assistant.")
+    messages = [system] + _turn(1) + _turn(2) + _turn(3, context_chars=100)
+    memory = ConversationMemory(token_budget=count_tokens([system] + _turn(3, context_chars=100)) + 100)
+    trimmed = memory.trim_history(messages)
+    assert trimmed[0] is system
+    assert [m.content for m in trimmed if isinstance(m, HumanMessage)] == ["question 2", "question 3"]
+    assert count_tokens(trimmed) <= memory.token_budget
+
+def test_evicted_turns_are_folded_into_the_summary():
+    summarizer = RecordingSummarizer()
+    # Room for the current turn only
+    memory = ConversationMemory(token_budget=count_tokens(_turn(3, context_chars=100)) + 10, summarizer=summarizer)
+    trimmed = memory.trim_history(_turn(1) + _turn(2) + _turn(3, context_chars=100))
+    assert trimmed[0].id == SUMMARY_ID
+    assert [m.content for m in trimmed if isinstance(m, HumanMessage)] == ["question 3"]
+    assert len(summarizer.calls) == 1 and len(summarizer.calls[0]) == 8
+
+    # The next trim extends the same summary message instead of adding another one
+    trimmed = memory.trim_history(trimmed + _turn(4, context_chars=100))
+    assert sum(1 for m in trimmed if m.id == SUMMARY_ID) == 1
+    assert trimmed[0].content.endswith("8 messages 4 messages")
+
+def test_compact_records_tokens_saved():
+    memory = ConversationMemory(token_budget=10_000)
+    messages = _turn(1) + _turn(2)
+    memory.compact(messages)
+    stats = memory.stats()
+    assert stats["compactions"] == 1 and stats["tokens_saved_total"] > 0
+
+class UnreachableModel:
+    def __init__(self):
+        self.calls = 0
+
+    async def ainvoke(self, messages):
+        self.calls += 1
+        raise ConnectionError("model unreachable")
+
+def test_summarizer_failure_falls_back_to_truncation():
+    model = UnreachableModel()
+    summarizer = LLMSummarizer(model, Dependency("test", timeout=5, retries=1))
+    memory = ConversationMemory(token_budget=count_tokens(_turn(3, context_chars=100)) + 10, summarizer=summarizer)
+    trimmed = asyncio.run(memory.atrim_history(_turn(1) + _turn(2) + _turn(3, context_chars=100)))
+    # Retried under the dependency's policy, then the evicted turns were dropped without a summary
+    assert model.calls == 2
+    assert [m.content for m in trimmed if isinstance(m, HumanMessage)] == ["question 3"]
+    assert not any(m.id == SUMMARY_ID for m in trimmed)
+    assert memory.stats()["summary_failures"] == 1
@@ -0,0 +1,41 @@
+import asyncio
+
+from embedding_cache import CachedEmbeddings, EmbeddingCache
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls = 0
+
+    async def aembed_query(self, text):
+        self.calls += 1
+        return [float(len(text)), 1.0]
+
+    async def aembed_documents(self, texts):
+        self.calls += 1
+        return [[float(len(t)), 1.0] for t in texts]
+
+def test_async_lookups_hit_the_cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"))
+    client = CountingEmbeddings()
+    embeddings = CachedEmbeddings(client, cache, "test-model")
+    assert asyncio.run(embeddings.aembed_query("Where did he study?")) == [19.0, 1.0]
+    assert asyncio.run(embeddings.aembed_documents(["Where did he study?", "Skills"])) == [[19.0, 1.0], [6.0, 1.0]]
+    assert client.calls == 2
+    assert (cache.stats()["hits"], cache.stats()["misses"]) == (1, 2)
+
+def test_eviction_trims_to_the_low_water_mark(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=10, evict_to=0.5)
+    for n in range(10):
+        cache.put_many("m", [f"text {n}"], [[float(n)]])
+    assert cache.stats()["entries"] == 10
+    cache.put_many("m", ["text 10"], [[10.0]])
+    # The least recently used rows went, leaving room for the next writes
+    assert cache.stats()["entries"] == 5
+    assert cache.get_many("m", ["text 0", "text 10"]) == [None, [10.0]]
+
+def test_row_count_survives_reopening(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    EmbeddingCache(path, max_entries=4).put_many("m", ["a", "b", "c", "d"], [[1.0]] * 4)
+    cache = EmbeddingCache(path, max_entries=4, evict_to=0.5)
+    cache.put_many("m", ["e"], [[1.0]])
+    assert cache.stats()["entries"] == 2
@@ -0,0 +1,36 @@
+from index_sync import (InMemoryIndex, chunk_id, delete_stale, load_index_manifest, load_manifest,
+                        upsert_batch)
+
+CHUNKS = ["Project: Virtual Me\nA portfolio assistant.", "Skill Category: languages\nSkills: Python"]
+
+def test_chunk_ids_are_stable_and_sectioned():
+    assert chunk_id(CHUNKS[0]) == chunk_id(CHUNKS[0])
+    assert chunk_id(CHUNKS[0]).startswith("project-")
+    assert chunk_id(CHUNKS[0]) != chunk_id(CHUNKS[0] + " Updated.")
+
+def test_upsert_and_delete_keep_the_manifest_in_step(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    index, manifest = InMemoryIndex(), load_index_manifest("portfolio", path)
+    ids = [chunk_id(c) for c in CHUNKS]
+    upsert_batch(index, manifest, ids, CHUNKS, [[1.0, 0.0], [0.0, 1.0]], path)
+    assert set(index.vectors) == set(load_manifest(path)["ids"]) == set(ids)
+    assert index.vectors[ids[0]]["metadata"]["section"] == "project"
+
+    assert delete_stale(index, manifest, {ids[0]}, path) == 1
+    assert set(index.vectors) == set(load_manifest(path)["ids"]) == {ids[0]}
+
+def test_manifest_of_another_index_is_ignored(tmp_path):
+    path = str(tmp_path / "manifest.json")
+    manifest = load_index_manifest("portfolio", path)
+    upsert_batch(InMemoryIndex(), manifest, [chunk_id(CHUNKS[0])], CHUNKS[:1], [[1.0, 0.0]], path)
+    assert load_index_manifest("other-index", path)["ids"] == {}
+
+def test_in_memory_index_query_ranks_by_cosine():
+    index = InMemoryIndex()
+    index.upsert(vectors=[{"id": "a", "values": [1.0, 0.0], "metadata": {"text": "a", "section": "project"}},
+                          {"id": "b", "values": [0.6, 0.8], "metadata": {"text": "b", "section": "skills"}}])
+    matches = index.query([0.0, 1.0], top_k=2)["matches"]
+    assert [m["id"] for m in matches] == ["b", "a"]
+    assert [m["id"] for m in index.query([0.0, 1.0], filter={"section": {"$in": ["project"]}})["matches"]] == ["a"]
+    index.delete(ids=["b"])
+    assert index.describe_index_stats()["total_vector_count"] == 1
@@ -0,0 +1,83 @@
+import pytest
+
+from index_sync import InMemoryIndex, load_manifest, metadata_fingerprint
+from ingest import ingest_to_index, skip_indexed, tee_jsonl
+
+class CountingEmbeddings:
+    """Small deterministic vectors; remembers every text it was asked to embed."""
+
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(t)), 1.0, 0.0] for t in texts]
+
+def _ingest(tmp_path, index, sources):
+    embeddings = CountingEmbeddings()
+    result = ingest_to_index(index, "portfolio", embeddings, sources=[str(p) for p in sources], workers=2,
+                             batch_size=2, chunks_path=str(tmp_path / "chunks.jsonl"),
+                             manifest_path=str(tmp_path / "manifest.json"))
+    return result, embeddings
+
+def test_ingest_upserts_then_skips_unchanged_chunks(tmp_path):
+    first, second = tmp_path / "first.md", tmp_path / "second.md"
+    first.write_text("Built the ingestion pipeline.")
+    second.write_text("Wrote the calendar tools.")
+    index = InMemoryIndex()
+
+    result, embeddings = _ingest(tmp_path, index, [first, second])
+    assert (result["upserted"], result["deleted"]) == (2, 0)
+    assert len(index.vectors) == 2 and len(embeddings.embedded) == 2
+    assert set(load_manifest(str(tmp_path / "manifest.json"))["ids"]) == set(index.vectors)
+
+    result, embeddings = _ingest(tmp_path, index, [first, second])
+    assert (result["chunks"], result["upserted"], result["deleted"]) == (2, 0, 0)
+    assert embeddings.embedded == []
+
+def test_ingest_deletes_chunks_no_longer_in_the_sources(tmp_path):
+    first, second = tmp_path / "first.md", tmp_path / "second.md"
+    first.write_text("Built the ingestion pipeline.")
+    second.write_text("Wrote the calendar tools.")
+    index = InMemoryIndex()
+    _ingest(tmp_path, index, [first, second])
+
+    second.write_text("Rewrote the calendar tools.")
+    result, embeddings = _ingest(tmp_path, index, [first, second])
+    assert (result["upserted"], result["deleted"], result["total"]) == (1, 1, 2)
+    assert embeddings.embedded == ["Document: second\nRewrote the calendar tools."]
+    assert sorted(v["metadata"]["text"] for v in index.vectors.values()) == [
+        "Document: first\nBuilt the ingestion pipeline.",
+        "Document: second\nRewrote the calendar tools.",
+    ]
+
+def test_empty_run_does_not_wipe_the_index(tmp_path):
+    source = tmp_path / "first.md"
+    source.write_text("Built the ingestion pipeline.")
+    index = InMemoryIndex()
+    _ingest(tmp_path, index, [source])
+
+    result, _ = _ingest(tmp_path, index, [tmp_path / "missing.md"])
+    assert result["deleted"] == 0
+    assert len(index.vectors) == 1
+
+def test_metadata_change_is_re_upserted():
+    record = {"id": "abc", "section": "project", "title": "Virtual Me", "text": "..."}
+    manifest = {"ids": {"abc": metadata_fingerprint({"section": "project", "title": "Virtual Me"})}}
+    seen = set()
+    assert list(skip_indexed([record], manifest, seen)) == []
+    assert seen == {"abc"}
+
+    renamed = dict(record, title="Virtual Me v2")
+    assert list(skip_indexed([renamed], manifest, set())) == [renamed]
+
+def test_failed_run_leaves_no_temp_file(tmp_path):
+    path = tmp_path / "chunks.jsonl"
+
+    def failing():
+        yield {"id": "a"}
+        raise RuntimeError("embedding failed")
+
+    with pytest.raises(RuntimeError):
+        list(tee_jsonl(failing(), str(path)))
+    assert not path.exists() and not (tmp_path / "chunks.jsonl.tmp").exists()
@@ -0,0 +1,27 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from intent_router import IntentRouter
+
+ROUTER = IntentRouter({"skills": {"languages": ["Python"]}})
+
+def test_static_questions_are_routed():
+    assert ROUTER.classify("Where did he study?") == ("education", ["education"])
+    assert ROUTER.classify("What is his email?") == ("profile", ["profile"])
+    assert ROUTER.classify("Does he know Python?")[1] == ["skills"]
+
+def test_meeting_details_go_to_the_tool_loop():
+    for text in ["My email is test@example.com",
+                 "I want to discuss PyroPredict with Rishab. My email is test@example.com",
+                 "Sure, 10:00 on Feb 12 works. My email is test@example.com",
+                 "How about 3pm on Friday?"]:
+        assert ROUTER.classify(text) == ("scheduling", []), text
+    # A year alone is not a date to book
+    assert ROUTER.classify("Where did he study in 2021?")[1] == ["education"]
+
+def test_follow_ups_in_a_scheduling_flow_are_not_routed():
+    history = [HumanMessage("Is he free tomorrow?"),
+               AIMessage("", tool_calls=[{"name": "list_available_slots", "args": {}, "id": "call_1"}]),
+               ToolMessage("10:00, 10:30", tool_call_id="call_1", name="list_available_slots"),
+               AIMessage("He is free at 10:00. What would you like to discuss?")]
+    assert ROUTER.classify("His work on the ingestion pipeline", history) == ("scheduling", [])
+    assert ROUTER.classify("His work on the ingestion pipeline")[1] == ["experience"]
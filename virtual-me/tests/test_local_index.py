@@ -0,0 +1,95 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from local_index import LocalVectorIndex, quantize, save_local_index
+
+def _corpus(rows=200, dimension=32, seed=7):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(rows, dimension)).astype(np.float32)
+    return [f"chunk {i}" for i in range(rows)], vectors
+
+class FixedEmbeddings:
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector
+
+    async def aembed_query(self, text):
+        return self.vector
+
+def test_top_k_matches_brute_force_cosine(tmp_path):
+    texts, vectors = _corpus()
+    save_local_index(texts, vectors, "test-model", str(tmp_path))
+    index = LocalVectorIndex.load(None, str(tmp_path))
+    assert len(index) == len(texts) and index.model == "test-model"
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    rng = np.random.default_rng(1)
+    for query in rng.normal(size=(10, vectors.shape[1])):
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+        assert [row for row, _ in index.search_by_vector(query, k=5)] == list(expected)
+
+def test_k_larger_than_the_index(tmp_path):
+    texts, vectors = _corpus(rows=3)
+    save_local_index(texts, vectors, "test-model", str(tmp_path))
+    index = LocalVectorIndex.load(None, str(tmp_path), mmap=False)
+    hits = index.search_by_vector(vectors[1], k=10)
+    assert len(hits) == 3 and hits[0][0] == 1
+    assert abs(hits[0][1] - 1.0) < 1e-5
+
+def test_similarity_search_returns_documents(tmp_path):
+    texts, vectors = _corpus(rows=20)
+    save_local_index(texts, vectors, "test-model", str(tmp_path))
+    index = LocalVectorIndex.load(FixedEmbeddings(vectors[4]), str(tmp_path))
+    docs = index.similarity_search("anything", k=2)
+    assert docs[0].page_content == "chunk 4" and docs[0].metadata["score"] > docs[1].metadata["score"]
+    assert asyncio.run(index.asimilarity_search("anything", k=1))[0].page_content == "chunk 4"
+
+def test_int8_rows_round_trip_within_one_step():
+    _, vectors = _corpus()
+    matrix = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    compact, scales = quantize(matrix, "int8")
+    assert compact.dtype == np.int8 and scales.shape == (len(matrix),)
+    assert np.abs(compact.astype(np.float32) * scales[:, None] - matrix).max() <= scales.max()
+
+    half, no_scales = quantize(matrix, "float16")
+    assert half.dtype == np.float16 and no_scales is None
+    with pytest.raises(ValueError):
+        quantize(matrix, "int4")
+
+@pytest.mark.parametrize("quantization", ["float16", "int8"])
+def test_rescored_search_matches_exact_search(tmp_path, quantization):
+    texts, vectors = _corpus()
+    save_local_index(texts, vectors, "test-model", str(tmp_path), quantization=quantization)
+    exact = LocalVectorIndex.load(None, str(tmp_path), quantization="float32")
+    compact = LocalVectorIndex.load(None, str(tmp_path))
+    assert compact.matrix.dtype == np.dtype(quantization)
+    assert compact.nbytes < exact.nbytes
+
+    rng = np.random.default_rng(1)
+    for query in rng.normal(size=(10, vectors.shape[1])):
+        expected = exact.search_by_vector(query, k=5)
+        found = compact.search_by_vector(query, k=5)
+        assert [row for row, _ in found] == [row for row, _ in expected]
+        # Scores come from the float32 rows after re-scoring
+        assert np.allclose([s for _, s in found], [s for _, s in expected], atol=1e-5)
+
+def test_quantization_is_computed_at_load_time(tmp_path):
+    texts, vectors = _corpus(rows=20)
+    save_local_index(texts, vectors, "test-model", str(tmp_path))
+    index = LocalVectorIndex.load(None, str(tmp_path), quantization="int8")
+    assert index.matrix.dtype == np.int8 and index.exact is not None
+    assert index.search_by_vector(vectors[3], k=1)[0][0] == 3
+
+@pytest.mark.parametrize("quantization", ["float32", "int8"])
+def test_filtered_search_scores_only_matching_rows(tmp_path, quantization):
+    texts, vectors = _corpus(rows=20)
+    metadatas = [{"section": "project" if i % 2 else "experience"} for i in range(20)]
+    save_local_index(texts, vectors, "test-model", str(tmp_path), metadatas=metadatas, quantization=quantization)
+    index = LocalVectorIndex.load(None, str(tmp_path))
+    hits = index.search_by_vector(vectors[4], k=3, filter={"section": "project"})
+    assert len(hits) == 3 and all(row % 2 for row, _ in hits)
+    assert index.search_by_vector(vectors[4], k=3, filter={"section": "education"}) == []
@@ -0,0 +1,39 @@
+import pytest
+
+from metrics import Registry, _RunClock, TurnTimer
+
+def test_counter_and_histogram_render():
+    registry = Registry()
+    registry.counter("test_calls_total", "Calls").inc(tool="retrieve_context")
+    histogram = registry.histogram("test_seconds", "Latency", buckets=(0.1, 1.0))
+    histogram.observe(0.5, node="think")
+    lines = registry.render().splitlines()
+    assert 'test_calls_total{tool="retrieve_context"} 1' in lines
+    assert 'test_seconds_bucket{node="think",le="0.1"} 0' in lines
+    assert 'test_seconds_bucket{node="think",le="+Inf"} 1' in lines
+    assert 'test_seconds_count{node="think"} 1' in lines
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.counter("test_calls_total", "Calls")
+    counter.inc(tool='say "hi"\\now\nthen')
+    assert 'test_calls_total{tool="say \\"hi\\"\\\\now\\nthen"} 1' in registry.render().splitlines()
+
+def test_help_text_is_escaped():
+    registry = Registry()
+    registry.histogram("test_seconds", "Latency\nper call")
+    assert "# HELP test_seconds Latency\\nper call" in registry.render().splitlines()
+
+def test_run_clock_needs_observe():
+    with pytest.raises(TypeError):
+        _RunClock()
+
+def test_turn_timer_counts_tool_runs():
+    timer = TurnTimer()
+    timer.on_chain_start({}, {}, run_id="turn", name="LangGraph")
+    timer.on_tool_start({"name": "retrieve_context"}, "q", run_id="tool", parent_run_id="turn")
+    timer.on_tool_end("result", run_id="tool")
+    timer.on_chain_end({}, run_id="turn")
+    summary = timer.summary()
+    assert summary["tool_calls"] == 1
+    assert "retrieve_context" in summary["spans_ms"]
@@ -0,0 +1,105 @@
+import time
+import threading
+import asyncio
+
+import pytest
+
+from resilience import CircuitBreaker, CircuitOpen, Dependency, DependencyTimeout, Saturated, is_unavailable
+
+def test_breaker_opens_after_consecutive_failures_and_probes_once():
+    breaker = CircuitBreaker("test", failures=2, reset_after=0)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+    # reset_after has passed: one probe goes through, a second caller is refused
+    breaker.check()
+    assert breaker.state == "half_open"
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.failures == 0
+
+def test_open_breaker_refuses_calls():
+    breaker = CircuitBreaker("test", failures=1, reset_after=60)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpen) as excinfo:
+        breaker.check()
+    assert 0 < excinfo.value.retry_after <= 60
+
+def test_failed_probe_reopens_the_breaker():
+    breaker = CircuitBreaker("test", failures=1, reset_after=0)
+    breaker.record_failure()
+    breaker.check()
+    breaker.record_failure()
+    assert breaker.state == "open" and breaker.opened == 2
+
+def test_dependency_retries_transient_errors_only():
+    dependency = Dependency("test", timeout=5, retries=2)
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 2:
+            raise ConnectionError("reset")
+        return "ok"
+
+    assert asyncio.run(dependency.call(flaky)) == "ok"
+    assert len(calls) == 2
+
+    async def bad_request():
+        calls.append(1)
+        raise ValueError("400")
+
+    calls.clear()
+    with pytest.raises(ValueError):
+        asyncio.run(dependency.call(bad_request))
+    assert len(calls) == 1
+    assert dependency.breaker.state == "closed"
+
+def test_blocking_calls_time_out_at_the_deadline():
+    dependency = Dependency("test", timeout=0.05, retries=0)
+    with pytest.raises(TimeoutError):
+        dependency.call_sync(lambda: time.sleep(0.5))
+
+def test_dependency_does_not_repeat_when_told_not_to():
+    dependency = Dependency("test", timeout=5, retries=3)
+    calls = []
+
+    def failing():
+        calls.append(1)
+        raise ConnectionError("reset")
+
+    with pytest.raises(ConnectionError):
+        dependency.call_sync(failing, can_repeat=lambda: False)
+    assert len(calls) == 1
+
+def test_saturated_pool_fails_fast_without_opening_the_breaker():
+    dependency = Dependency("test", timeout=5, retries=0, breaker=CircuitBreaker("test", failures=1))
+    dependency.pool.workers = 1
+    release = threading.Event()
+    blocked = threading.Thread(target=dependency.call_sync, args=(release.wait,))
+    blocked.start()
+    while not dependency.pool.busy:
+        pass
+    try:
+        with pytest.raises(Saturated):
+            dependency.call_sync(lambda: "never runs")
+        assert dependency.breaker.state == "closed"
+        assert dependency.stats()["saturated"] == 1
+    finally:
+        release.set()
+        blocked.join()
+
+def test_only_dependency_failures_count_as_unavailable():
+    from google.api_core.exceptions import InvalidArgument
+    from langchain_google_genai.chat_models import ChatGoogleGenerativeAIError
+    assert is_unavailable(CircuitOpen("gemini", 30))
+    assert is_unavailable(DependencyTimeout("gemini deadline exceeded"))
+    assert is_unavailable(ConnectionError("reset"))
+    assert is_unavailable(InvalidArgument("bad request"))
+    assert is_unavailable(ChatGoogleGenerativeAIError("Invalid argument provided to Gemini"))
+    # Bugs in our own code are not answered around
+    assert not is_unavailable(KeyError("routed_intents"))
+    assert not is_unavailable(TypeError("unsupported operand"))
@@ -0,0 +1,106 @@
+import os
+import json
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from index_sync import corpus_version, save_manifest
+from response_cache import PrecomputedAnswers, ResponseCache, cacheable_query
+
+RESULT = {"response": "He studied at ...", "thinking": "Response generated",
+          "messages": [HumanMessage("Where did he study?"), AIMessage("He studied at ...")]}
+
+def write_manifest(path, ids, mtime):
+    save_manifest({"index": "test", "ids": {i: "education" for i in ids}}, str(path))
+    os.utime(path, (mtime, mtime))
+
+class KeywordEmbeddings:
+    """Questions that mention the same keyword embed to the same vector."""
+
+    def embed_query(self, text):
+        return [1.0, 0.0] if "study" in text or "university" in text else [0.0, 1.0]
+
+def test_exact_hit_ignores_case_and_punctuation():
+    cache = ResponseCache()
+    cache.store("Where did he study?", RESULT)
+    assert cache.lookup("where did he STUDY").response == RESULT["response"]
+    assert cache.stats()["exact_hits"] == 1
+
+def test_paraphrase_is_a_semantic_hit():
+    cache = ResponseCache(get_embeddings=KeywordEmbeddings)
+    cache.store("Where did he study?", RESULT)
+    assert cache.lookup("Which university did he go to?").response == RESULT["response"]
+    assert cache.lookup("What are his skills?") is None
+    assert (cache.stats()["semantic_hits"], cache.stats()["misses"]) == (1, 1)
+
+def test_scheduling_turns_are_not_cached():
+    cache = ResponseCache()
+    messages = [HumanMessage("Is he free tomorrow?"),
+                AIMessage("", tool_calls=[{"name": "list_available_slots", "args": {}, "id": "call_1"}]),
+                ToolMessage("10:00, 10:30", tool_call_id="call_1", name="list_available_slots"),
+                AIMessage("He is free at 10:00.")]
+    cache.store("Is he free tomorrow?", {**RESULT, "messages": messages})
+    assert cache.lookup("Is he free tomorrow?") is None
+    assert cache.stats()["bypassed"] == 1
+
+def test_only_fresh_questions_are_cacheable():
+    assert cacheable_query({"messages": [HumanMessage("Where did he study?")]}) == "Where did he study?"
+    assert cacheable_query(RESULT) is None
+    assert cacheable_query({"messages": [HumanMessage("  ")]}) is None
+
+def test_changed_corpus_version_clears_cache(tmp_path):
+    manifest = tmp_path / "index_manifest.json"
+    write_manifest(manifest, ["a", "b"], 1_000)
+    cache = ResponseCache(version_fn=lambda: corpus_version(str(manifest)))
+
+    cache.store("Where did he study?", RESULT)
+    assert cache.lookup("where did he study").response == RESULT["response"]
+
+    # Re-ingest: the manifest now lists another set of chunks
+    write_manifest(manifest, ["a", "c"], 2_000)
+    assert cache.lookup("Where did he study?") is None
+    assert cache.stats()["entries"] == 0
+
+def test_same_corpus_version_keeps_cache(tmp_path):
+    manifest = tmp_path / "index_manifest.json"
+    write_manifest(manifest, ["a", "b"], 1_000)
+    cache = ResponseCache(version_fn=lambda: corpus_version(str(manifest)))
+    cache.store("Where did he study?", RESULT)
+
+    write_manifest(manifest, ["b", "a"], 2_000)
+    assert cache.lookup("Where did he study?") is not None
+
+def test_missing_manifest_is_unversioned(tmp_path):
+    assert corpus_version(str(tmp_path / "missing.json")) == "unversioned"
+
+def test_precomputed_answers_need_the_served_version(tmp_path):
+    path = tmp_path / "precomputed.jsonl"
+    records = [
+        {"type": "answer", "question": "Where did he study?", "response": "At ...",
+         "cacheable": True, "corpus_version": "v1"},
+        {"type": "answer", "question": "Is he free tomorrow?", "response": "Yes", "cacheable": False,
+         "corpus_version": "v1"},
+    ]
+    path.write_text("".join(json.dumps(r) + "\n" for r in records))
+    version = {"current": "v1"}
+    answers = PrecomputedAnswers(str(path), version_fn=lambda: version["current"], recheck=0)
+
+    assert answers.lookup("where did he study").response == "At ..."
+    assert answers.lookup("Is he free tomorrow?") is None
+    version["current"] = "v2"
+    assert answers.lookup("Where did he study?") is None
+
+def test_precomputed_version_is_rechecked_at_most_every_interval(tmp_path):
+    path = tmp_path / "precomputed.jsonl"
+    path.write_text(json.dumps({"type": "answer", "question": "Where did he study?", "response": "At ...",
+                                "cacheable": True, "corpus_version": "v1"}) + "\n")
+    calls = []
+    answers = PrecomputedAnswers(str(path), version_fn=lambda: calls.append(1) or "v1", recheck=60)
+    for _ in range(5):
+        assert answers.lookup("Where did he study?") is not None
+    assert len(calls) == 1
+
+def test_degraded_results_are_not_cached():
+    cache = ResponseCache()
+    cache.store("Where did he study?", {**RESULT, "degraded": True})
+    assert cache.lookup("Where did he study?") is None
+    assert cache.stats()["bypassed"] == 1
@@ -0,0 +1,121 @@
+import time
+import asyncio
+from typing import Annotated, TypedDict
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, StateGraph
+from langgraph.graph.message import add_messages
+
+import main
+from checkpointer import SQLiteCheckpointSaver
+from session_store import CheckpointSessionStore, InMemorySessionStore, SQLiteSessionStore
+
+HISTORY = [HumanMessage("Where did he study?"), AIMessage("At ...")]
+
+class EchoState(TypedDict):
+    messages: Annotated[list, add_messages]
+
+def echo(state):
+    text = state["messages"][-1].content
+    if text == "fail":
+        raise RuntimeError("upstream down")
+    return {"messages": [AIMessage(f"re: {text}")]}
+
+def checkpoint_store(path):
+    """A CheckpointSessionStore bound to a one-node graph compiled with its saver (like get_agent)."""
+    store = CheckpointSessionStore(SQLiteCheckpointSaver(path))
+    workflow = StateGraph(EchoState)
+    workflow.add_node("respond", echo)
+    workflow.set_entry_point("respond")
+    workflow.add_edge("respond", END)
+    store.bind(workflow.compile(checkpointer=store.saver))
+    return store
+
+def run_turn(store, session_id, text):
+    history = store.get(session_id) or []
+    config = {"configurable": {"thread_id": session_id}}
+    result = store.graph.invoke({"messages": history + [HumanMessage(text)]}, config)
+    store.set(session_id, result["messages"][-2:])  # stands in for compact_history
+    return result
+
+def test_unknown_session_id_gets_a_fresh_one(monkeypatch):
+    monkeypatch.setattr(main, "get_session_store", lambda: InMemorySessionStore())
+    session_id, history = asyncio.run(main.load_session("chosen-by-the-client", []))
+    assert session_id != "chosen-by-the-client"
+    assert history == []
+
+def test_known_session_id_is_resumed(monkeypatch):
+    store = InMemorySessionStore()
+    store.set("existing", HISTORY)
+    monkeypatch.setattr(main, "get_session_store", lambda: store)
+    assert asyncio.run(main.load_session("existing", [])) == ("existing", HISTORY)
+
+def test_memory_store_expires_and_evicts():
+    store = InMemorySessionStore(ttl=0.05, max_entries=2)
+    for n in range(3):
+        store.set(f"s{n}", HISTORY)
+    assert store.get("s0") is None
+    assert store.get("s2") == HISTORY
+    time.sleep(0.06)
+    assert store.get("s2") is None
+
+def test_sqlite_store_round_trips_messages(tmp_path):
+    store = SQLiteSessionStore(str(tmp_path / "sessions.sqlite3"))
+    history = HISTORY + [ToolMessage("10:00", tool_call_id="call_1", name="list_available_slots")]
+    store.set("s", history)
+    loaded = store.get("s")
+    assert [type(m) for m in loaded] == [HumanMessage, AIMessage, ToolMessage]
+    assert loaded[-1].name == "list_available_slots"
+    store.delete("s")
+    assert store.get("s") is None
+
+def test_sqlite_store_is_shared_and_pruned(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    store = SQLiteSessionStore(path, max_entries=2)
+    for n in range(4):
+        store.set(f"s{n}", HISTORY)
+    # Another worker's connection sees the same sessions
+    assert SQLiteSessionStore(path).get("s3") == HISTORY
+    store.prune()
+    assert store.stats()["sessions"] == 2
+    assert store.get("s0") is None
+
+def test_memory_store_prunes_expired():
+    store = InMemorySessionStore(ttl=0.01)
+    store.set("old", HISTORY)
+    time.sleep(0.02)
+    store.prune()
+    assert store.stats()["sessions"] == 0
+
+def test_checkpoint_threads_are_shared_between_workers(tmp_path):
+    path = str(tmp_path / "checkpoints.sqlite3")
+    first, second = checkpoint_store(path), checkpoint_store(path)
+    run_turn(first, "s", "hello")
+    result = run_turn(second, "s", "again")
+    # The graph resumed the thread, and set() replaced its messages with the trimmed history
+    assert [m.content for m in result["messages"]] == ["hello", "re: hello", "again", "re: again"]
+    assert [m.content for m in first.get("s")] == ["again", "re: again"]
+    assert first.saver.thread_count() == 1
+    assert first.get("unknown") is None
+
+def test_unfinished_turn_is_rolled_back(tmp_path):
+    store = checkpoint_store(str(tmp_path / "checkpoints.sqlite3"))
+    run_turn(store, "s", "hello")
+    try:
+        run_turn(store, "s", "fail")
+    except RuntimeError:
+        pass
+    assert [m.content for m in store.get("s")] == ["hello", "re: hello"]
+    result = run_turn(store, "s", "again")
+    assert [m.content for m in result["messages"]] == ["hello", "re: hello", "again", "re: again"]
+
+def test_checkpoint_threads_expire(tmp_path):
+    store = checkpoint_store(str(tmp_path / "checkpoints.sqlite3"))
+    store.ttl = 0.01
+    run_turn(store, "s", "hello")
+    time.sleep(0.02)
+    assert store.get("s") is None
+    run_turn(store, "t", "hello")
+    time.sleep(0.02)
+    store.prune()
+    assert store.stats() == {"backend": "checkpoint", "sessions": 0}
@@ -0,0 +1,42 @@
+import asyncio
+
+from concurrency import agent_slot
+from tool_executor import ParallelToolExecutor, Speculation
+
+def retrieve(query, **filters):
+    return {"name": "retrieve_context", "args": {"query": query, **filters}, "id": "call_1"}
+
+def test_speculation_matches_queries_close_to_the_message():
+    message = "what did he build at pyropredict"
+    assert ParallelToolExecutor._matches(retrieve("PyroPredict"), message)
+    assert ParallelToolExecutor._matches(retrieve("What did he build at PyroPredict, Rishab?"), message)
+    assert not ParallelToolExecutor._matches(retrieve("education"), message)
+    assert not ParallelToolExecutor._matches(retrieve(""), message)
+    assert not ParallelToolExecutor._matches(retrieve("PyroPredict", section="project"), message)
+
+def test_unused_speculation_is_cancelled_when_the_turn_is():
+    speculation = Speculation()
+    started = asyncio.Event()
+
+    async def search():
+        await asyncio.sleep(10)
+
+    async def think():
+        # Graph nodes run in tasks of their own, like this one
+        speculation.start(search(), "where did he study")
+        started.set()
+        await asyncio.sleep(10)
+
+    async def turn():
+        async with agent_slot():
+            await asyncio.ensure_future(think())
+
+    async def scenario():
+        task = asyncio.ensure_future(turn())
+        await started.wait()
+        assert speculation.stats()["pending"] == 1
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        assert speculation.stats()["pending"] == 0
+
+    asyncio.run(scenario())
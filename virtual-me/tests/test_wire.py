@@ -0,0 +1,49 @@
+import pytest
+import zstandard
+from langchain_core.messages import AIMessage, HumanMessage
+
+from wire import RAW, ZSTD, FrameTooLarge, JsonCodec, MsgpackCodec, compact_message, message_delta
+
+FRAME = {"type": "message", "session_id": "abc", "messages": [{"role": "assistant", "content": "hello " * 400}]}
+
+def test_msgpack_round_trip_raw_and_compressed():
+    small = MsgpackCodec(compress_min_bytes=0)
+    data = small.encode(FRAME)
+    assert data[:1] == RAW and small.decode(data) == FRAME
+
+    codec = MsgpackCodec(compress_min_bytes=64)
+    data = codec.encode(FRAME)
+    assert data[:1] == ZSTD and len(data) < len(small.encode(FRAME))
+    assert codec.decode(data) == FRAME
+
+def test_text_frames_stay_json():
+    assert MsgpackCodec().decode('{"text": "hi"}') == {"text": "hi"}
+    codec = JsonCodec()
+    assert codec.decode(codec.encode(FRAME)) == FRAME
+
+def test_oversized_frames_are_rejected():
+    codec = MsgpackCodec(compress_min_bytes=64, max_frame_bytes=1024)
+    with pytest.raises(FrameTooLarge):
+        codec.decode(codec.encode(FRAME))
+
+    # A streamed frame doesn't declare its size up front
+    streamed = zstandard.ZstdCompressor().compressobj()
+    payload = streamed.compress(b"\x80" * 100) + streamed.flush()
+    with pytest.raises(FrameTooLarge):
+        codec.decode(ZSTD + payload)
+
+def test_malformed_frames_raise_value_error():
+    codec = MsgpackCodec()
+    with pytest.raises(ValueError):
+        codec.decode(b"\x07junk")
+    with pytest.raises(ValueError):
+        codec.decode(ZSTD + b"not zstd")
+
+def test_compact_message_roles():
+    assert compact_message(HumanMessage("hi"))["role"] == "user"
+    assert compact_message(AIMessage("hello"))["role"] == "assistant"
+
+def test_message_delta_is_what_the_turn_added():
+    history = [HumanMessage("hi"), AIMessage("hello")]
+    turn = history + [HumanMessage("skills?"), AIMessage("Python")]
+    assert [m["role"] for m in message_delta(turn, len(history))] == ["user", "assistant"]